@@ -2,6 +2,7 @@ import contextlib
 import sys
 
 import boa.explorer
+import boa.parallel
 from boa.contracts.base_evm_contract import BoaError
 from boa.contracts.vyper.vyper_contract import check_boa_error_matches
 from boa.dealer import deal
@@ -12,6 +13,7 @@ from boa.interpret import (
     from_etherscan,
     load,
     load_abi,
+    load_many,
     load_partial,
     load_vyi,
     loads,
@@ -15,6 +15,7 @@ from boa.contracts.base_evm_contract import (
 )
 from boa.contracts.call_trace import TraceSource
 from boa.util.abi import ABIError, Address, abi_decode, abi_encode, is_abi_encodable
+from boa.util.deferred import DeferredCall
 
 
 class ABIFunction:
@@ -134,6 +135,12 @@ class ABIFunction:
             contract=self.contract,
         )
 
+        if isinstance(computation, DeferredCall):
+            # inside env.batch_views()
+            return computation.future(self._marshal_to_python)
+        return self._marshal_to_python(computation)
+
+    def _marshal_to_python(self, computation):
         match self.contract.marshal_to_python(computation, self.return_type):
             case ():
                 return None
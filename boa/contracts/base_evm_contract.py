@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from functools import cached_property
 from typing import TYPE_CHECKING, Optional
 
 from eth.abc import ComputationAPI
@@ -105,18 +105,62 @@ def _handle_child_trace(computation, env, return_trace):
     return StackTrace(child_trace + return_trace)
 
 
-@dataclass
 class BoaError(Exception):
-    call_trace: TraceFrame
-    stack_trace: StackTrace
+    """
+    Error raised when a contract call or deployment fails.
+
+    Only the failed computation and the contract are captured when the
+    error is raised; the stack trace and call trace are built on first
+    access. Most errors in tests are caught (e.g. by `boa.reverts()`) and
+    never printed, so there is no need to pay for the traces up front.
+    """
+
+    # set if `args` was assigned to
+    _args: Optional[tuple] = None
+
+    def __init__(
+        self, computation: "titanoboa_computation", contract: _BaseEVMContract
+    ):
+        super().__init__(computation, contract)
+        self.computation = computation
+        self.contract = contract
 
     @classmethod
     def create(cls, computation: "titanoboa_computation", contract: _BaseEVMContract):
-        return cls(computation.call_trace, contract.stack_trace(computation))
+        return cls(computation, contract)
+
+    @cached_property
+    def call_trace(self) -> TraceFrame:
+        return self.computation.call_trace
+
+    @cached_property
+    def stack_trace(self) -> StackTrace:
+        return self.contract.stack_trace(self.computation)
+
+    @property
+    def args(self) -> tuple:
+        # `args` has always been `(call_trace, stack_trace)`; keep it that
+        # way, the traces are just built on access now.
+        if self._args is None:
+            return (self.call_trace, self.stack_trace)
+        return self._args
+
+    @args.setter
+    def args(self, value) -> None:
+        self._args = tuple(value)
+
+    def __reduce__(self):
+        # the computation and contract can't be pickled, send the traces
+        # (which drop their own handles to them when pickled)
+        state = {"call_trace": self.call_trace, "stack_trace": self.stack_trace}
+        return _unpickle_boa_error, (type(self), state)
+
+    def __repr__(self):
+        # the default Exception repr would repr the contract, which
+        # can be arbitrarily expensive
+        contract_name = getattr(self.contract, "contract_name", None)
+        return f"{type(self).__name__}({contract_name})"
 
-    # perf TODO: don't materialize the stack trace until we need it,
-    # i.e. BoaError ctor only takes what is necessary to construct the
-    # stack trace but does not require the actual stack trace itself.
     def __str__(self):
         frame = self.stack_trace.last_frame
         if hasattr(frame, "vm_error"):
@@ -132,3 +176,12 @@ class BoaError(Exception):
         call_tree = str(self.call_trace)
         ledge = "=" * 72
         return f"\n{ledge}\n{call_tree}\n{ledge}\n\n{ret}"
+
+
+def _unpickle_boa_error(cls, state):
+    ret = cls.__new__(cls)
+    ret.computation = None
+    ret.contract = None
+    # seed the cached traces
+    ret.__dict__.update(state)
+    return ret
@@ -97,13 +97,21 @@ class TraceFrame:
         text = f"{' ' * self.depth * 4}{self.text}"
         return "\n".join(chain((text,), (str(child) for child in self.children)))
 
-    @property
+    def __getstate__(self):
+        # the computation and the source (which holds on to the contract)
+        # can't be pickled. resolve what they are needed for instead.
+        for name in ("address", "gas_used", "input_data", "selector", "output"):
+            getattr(self, name)
+        _ = self.is_error, self.text
+        return {**self.__dict__, "computation": None, "source": None}
+
+    @cached_property
     def text(self):
         if self.source:
             text = self.source.format(self.input_data, self.output, self.is_error)
         else:
             text = f"Unknown contract {self.address}"
-            if self.computation.msg.data != b"":
+            if self.selector != b"":
                 text += ".0x" + self.selector.hex()
 
         ret = f"[{self.gas_used}] {text}"
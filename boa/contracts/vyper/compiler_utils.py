@@ -1,4 +1,9 @@
+import io
+import pickle
 import textwrap
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional
 
 import vyper.ast as vy_ast
 import vyper.semantics.analysis as analysis
@@ -9,11 +14,14 @@ from vyper.codegen.function_definitions import (
 )
 from vyper.codegen.ir_node import IRnode
 from vyper.codegen.module import _runtime_reachable_functions
-from vyper.compiler.settings import anchor_settings
+from vyper.compiler import CompilerData
+from vyper.compiler.settings import OptimizationLevel, Settings, anchor_settings
 from vyper.exceptions import InvalidType
 from vyper.ir import compile_ir, optimizer
 from vyper.semantics.analysis.constant_folding import ConstantFolder
 from vyper.semantics.analysis.utils import get_exact_type_from_node
+from vyper.semantics.types.function import ContractFunctionT
+from vyper.semantics.types.module import ModuleT
 
 from boa.contracts.vyper.ir_executor import executor_from_ir
 
@@ -38,7 +46,8 @@ def compile_vyper_function(vyper_function, contract):
     contract. This is useful for vyper `eval` and internal functions, where
     the runtime bytecode must be changed to add more runtime functionality
     (such as eval, and calling internal functions)
-    (performance note: this function is very very slow!)
+    (only the wrapper itself is compiled, the assembly of the rest of the
+    contract is cached by the contract's `_linker`.)
     """
 
     compiler_data = contract.compiler_data
@@ -65,38 +74,257 @@ def compile_vyper_function(vyper_function, contract):
 
         # use a dummy method id
         ir = ["with", _METHOD_ID_VAR, 0, ir]
+        ir = optimizer.optimize(IRnode.from_list(ir))
 
-        # first mush it with the rest of the IR in the contract to ensure
-        # all labels are present, and then optimize all together
-        # (use unoptimized IR, ir_executor can't handle optimized selector tables)
-        _, contract_runtime = contract.unoptimized_ir
-        ir_list = ["seq", ir, contract_runtime]
-        reachable = func_t.reachable_internal_functions
+        linker = contract._linker
+        functions = linker.missing_functions(func_t)
+        assembly = linker.link(ir, functions)
 
-        already_compiled = _runtime_reachable_functions(module_t, contract)
-        missing_functions = reachable.difference(already_compiled)
-        # TODO: cache function compilations or something
-        for f in missing_functions:
-            assert f.ast_def is not None
-            contract.ensure_id(f)
-            ir_list.append(
-                generate_ir_for_internal_function(f.ast_def, module_t, False).func_ir
-            )
-
-        ir = IRnode.from_list(ir_list)
-        ir = optimizer.optimize(ir)
-
-        assembly = compile_ir.compile_to_assembly(ir)
         bytecode, source_map = compile_ir.assembly_to_evm(assembly)
         bytecode += contract.data_section
         typ = func_t.return_type
 
-        # generate the IR executor
-        ir_executor = executor_from_ir(ir, compiler_data)
+        # the IR executor is only needed in fast mode, generate it lazily
+        ir_executor = _LazyExecutor(lambda: linker.executor(ir, functions))
+
+        return ast, ir_executor, bytecode, source_map, typ
+
+
+def _compile_fragment(ir):
+    # compile a piece of the runtime to assembly. the assembly is not
+    # optimized, since the optimizer would prune labels which are only
+    # referenced from other fragments.
+    return compile_ir.compile_to_assembly(ir, optimize=OptimizationLevel.NONE)
+
+
+class Linker:
+    """
+    Caches the assembly of a contract's runtime and of internal functions
+    which are not part of the runtime (i.e., only reachable from wrapper
+    functions), so that wrapper functions can be spliced in front of
+    them without recompiling the whole contract.
+    """
+
+    def __init__(self, contract):
+        self.contract = contract
+        # func_t => optimized IR and assembly
+        self._functions: dict = {}
+        # resolved path => node id => AST node
+        self._nodes: dict = {}
+
+    @cached_property
+    def runtime_ir(self):
+        # use unoptimized IR, ir_executor can't handle optimized selector tables
+        _, contract_runtime = self.contract.unoptimized_ir
+        return optimizer.optimize(contract_runtime)
+
+    @cached_property
+    def runtime_assembly(self):
+        return _compile_fragment(self.runtime_ir)
+
+    def missing_functions(self, func_t):
+        contract = self.contract
+        module_t = contract.module_t
+        already_compiled = _runtime_reachable_functions(module_t, contract)
+        missing = func_t.reachable_internal_functions.difference(already_compiled)
+        # sort for a deterministic layout
+        return sorted(missing, key=lambda f: f._function_id or 0)
+
+    def _function(self, func_t):
+        if func_t not in self._functions:
+            contract = self.contract
+            assert func_t.ast_def is not None
+            contract.ensure_id(func_t)
+            func_ir = generate_ir_for_internal_function(
+                func_t.ast_def, contract.module_t, False
+            ).func_ir
+            func_ir = optimizer.optimize(func_ir)
+            self._functions[func_t] = (func_ir, _compile_fragment(func_ir))
+        return self._functions[func_t]
+
+    def link(self, wrapper_ir, functions):
+        assembly = _compile_fragment(wrapper_ir) + self.runtime_assembly
+        for func_t in functions:
+            _, func_assembly = self._function(func_t)
+            assembly += func_assembly
+        return assembly
+
+    def full_ir(self, wrapper_ir, functions):
+        ir_list = [wrapper_ir, self.runtime_ir]
+        ir_list.extend(self._function(func_t)[0] for func_t in functions)
+        return IRnode.from_list(["seq", *ir_list])
+
+    def executor(self, wrapper_ir, functions):
+        compiler_data = self.contract.compiler_data
+        with anchor_settings(compiler_data.settings):
+            ir = self.full_ir(wrapper_ir, functions)
+            return executor_from_ir(ir, compiler_data)
+
+    @cached_property
+    def modules(self):
+        # resolved path => module, for the contract and everything it
+        # imports. used to resolve AST nodes in cached wrappers.
+        ret = {}
+
+        def visit(module):
+            if module.resolved_path in ret:
+                return
+            ret[module.resolved_path] = module
+            for stmt in module.get_children((vy_ast.Import, vy_ast.ImportFrom)):
+                typ = stmt._metadata["import_info"].typ
+                # modules are wrapped in a ModuleInfo
+                typ = getattr(typ, "module_t", typ)
+                node = getattr(typ, "_module", None) or getattr(typ, "decl_node", None)
+                if isinstance(node, vy_ast.Module):
+                    visit(node)
+
+        visit(self.contract.compiler_data.annotated_vyper_module)
+        return ret
+
+    def node(self, resolved_path, node_id):
+        if resolved_path not in self._nodes:
+            module = self.modules[resolved_path]
+            nodes = [module, *module.get_descendants()]
+            self._nodes[resolved_path] = {n.node_id: n for n in nodes}
+        return self._nodes[resolved_path][node_id]
+
+
+class _LazyExecutor:
+    def __init__(self, build):
+        self._build = build
+
+    @cached_property
+    def _executor(self):
+        return self._build()
+
+    def exec(self, computation):
+        return self._executor.exec(computation)
+
+
+class _CannotPersist(Exception):
+    pass
+
+
+class _NodePickler(pickle.Pickler):
+    # pickle AST nodes and types of the contract by reference, so that the
+    # wrapper artifact doesn't drag along the whole (analyzed) contract.
+    # the wrapper itself is pickled by value.
+    def __init__(self, file, wrapper_module, modules):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._wrapper_module = wrapper_module
+        self._modules = modules
+
+    def _node_id(self, node):
+        module = node.module_node
+        if self._modules.get(module.resolved_path) is not module:
+            raise _CannotPersist(node)
+        return (module.resolved_path, node.node_id)
+
+    def persistent_id(self, obj):
+        if isinstance(obj, ModuleT):
+            kind, node = "type", obj._module
+        elif isinstance(obj, ContractFunctionT) and obj.decl_node is not None:
+            kind, node = "func_type", obj.decl_node
+        elif isinstance(obj, vy_ast.VyperNode):
+            kind, node = "node", obj
+        else:
+            return None
+        module = node.module_node
+        # nodes of the wrapper (and detached nodes, e.g. from constant
+        # folding) are pickled by value
+        if module is None or module is self._wrapper_module:
+            return None
+        return (kind, *self._node_id(node))
+
+
+class _NodeUnpickler(pickle.Unpickler):
+    def __init__(self, file, linker):
+        super().__init__(file)
+        self._linker = linker
+
+    def persistent_load(self, pid):
+        kind, resolved_path, node_id = pid
+        node = self._linker.node(resolved_path, node_id)
+        if kind == "type":
+            return node._metadata["type"]
+        if kind == "func_type":
+            return node._metadata["func_type"]
+        return node
+
+
+@dataclass
+class WrapperArtifact:
+    """
+    What gets stored in the disk cache for an eval or internal function
+    wrapper: the bytecode, plus the analyzed wrapper, source map and return
+    type, pickled with the AST nodes and types of the contract replaced by
+    references, which are resolved against the contract when loading. The
+    IR executor is not stored, it is regenerated on demand.
+    """
 
+    # without the data section, which depends on the deployment
+    bytecode: bytes
+    data: bytes
+
+    @classmethod
+    def from_compiled(cls, compiled, contract) -> Optional["WrapperArtifact"]:
+        ast, _, bytecode, source_map, typ = compiled
+        bytecode = bytecode[: len(bytecode) - len(contract.data_section)]
+
+        f = io.BytesIO()
+        pickler = _NodePickler(f, ast.module_node, contract._linker.modules)
+        try:
+            pickler.dump((ast, source_map, typ))
+        except _CannotPersist:
+            return None
+        return cls(bytecode, f.getvalue())
+
+    def to_compiled(self, contract, compile_fn):
+        unpickler = _NodeUnpickler(io.BytesIO(self.data), contract._linker)
+        ast, source_map, typ = unpickler.load()
+
+        bytecode = self.bytecode + contract.data_section
+        # the IR executor is only needed in fast mode, get it by
+        # compiling the wrapper for real
+        ir_executor = _LazyExecutor(lambda: compile_fn()[1]._executor)
         return ast, ir_executor, bytecode, source_map, typ
 
 
+def _cached_compile(contract, key, compile_fn):
+    """
+    Look up the result of `compile_fn` (see `compile_vyper_function`) in
+    the disk cache. `key` identifies the wrapper within the contract.
+    """
+    # set by boa.interpret.compiler_data when the disk cache is enabled
+    cache = getattr(contract.compiler_data, "_boa_disk_cache", None)
+    # injected functions change the namespace wrappers are analyzed in
+    if cache is None or hasattr(contract, "inject"):
+        return compile_fn()
+    disk_cache, contract_key = cache
+
+    compiled = None
+
+    def get_artifact():
+        nonlocal compiled
+        compiled = compile_fn()
+        return WrapperArtifact.from_compiled(compiled, contract)
+
+    cache_key = str((contract_key, key, ARTIFACT_VERSION))
+    artifact = disk_cache.caching_lookup(cache_key, get_artifact)
+    if compiled is not None:
+        # cache miss, we have just compiled it
+        return compiled
+    if artifact is None:
+        # the wrapper couldn't be persisted
+        return compile_fn()
+    try:
+        return artifact.to_compiled(contract, compile_fn)
+    except (KeyError, pickle.UnpicklingError):
+        # the AST of the contract doesn't match, e.g. the contract
+        # was not loaded through boa.interpret
+        return compile_fn()
+
+
 def generate_bytecode_for_internal_fn(fn):
     """Wraps internal fns with an external fn and generated bytecode"""
     contract = fn.contract
@@ -125,12 +353,23 @@ def generate_bytecode_for_internal_fn(fn):
 def __boa_private_{fn_name}__({fn_sig}){return_sig}:
     {fn_call}
     """
-    return compile_vyper_function(wrapper_code, contract)
+    return _cached_compile(
+        contract, wrapper_code, lambda: compile_vyper_function(wrapper_code, contract)
+    )
 
 
 def generate_bytecode_for_arbitrary_stmt(source_code, contract):
     """Wraps arbitrary stmts with external fn and generates bytecode"""
+    # the wrapper depends on the type of the statement, so key the
+    # cache on the statement itself
+    return _cached_compile(
+        contract,
+        ("eval", source_code),
+        lambda: _generate_bytecode_for_arbitrary_stmt(source_code, contract),
+    )
 
+
+def _generate_bytecode_for_arbitrary_stmt(source_code, contract):
     ast = parse_to_ast(source_code)
 
     ast = ast.body[0]
@@ -157,3 +396,91 @@ def generate_bytecode_for_arbitrary_stmt(source_code, contract):
     """
     )
     return compile_vyper_function(wrapper_code, contract)
+
+
+def get_source_map(compiler_data, runtime=True):
+    """
+    Source map of the runtime (or deployment) bytecode. Assembling is
+    expensive, so the result is memoized on the CompilerData.
+    """
+    source_maps = getattr(compiler_data, "_boa_source_maps", None)
+    if source_maps is None:
+        source_maps = compiler_data._boa_source_maps = {}
+
+    if runtime not in source_maps:
+        with anchor_settings(compiler_data.settings):
+            if runtime:
+                assembly = compiler_data.assembly_runtime
+            else:
+                assembly = compiler_data.assembly
+            _, source_maps[runtime] = compile_ir.assembly_to_evm(assembly)
+
+    return source_maps[runtime]
+
+
+# bump this when the layout of CompilerArtifact changes
+ARTIFACT_VERSION = 1
+
+
+@dataclass
+class CompilerArtifact:
+    """
+    What gets stored in the disk cache for a compiled contract: what is
+    needed to create a deployer, plus the analyzed module and the source
+    maps, pickled separately so they are only loaded when needed. IR and
+    assembly are not stored, they are regenerated on demand.
+    """
+
+    settings: Settings
+    bytecode: bytes
+    bytecode_runtime: bytes
+    storage_layout: dict
+    analysis: bytes
+
+    @classmethod
+    def from_compiler_data(cls, compiler_data):
+        source_maps = {
+            runtime: get_source_map(compiler_data, runtime) for runtime in (True, False)
+        }
+        # the source maps point into the AST, pickle them together
+        analysis = (compiler_data._annotate, source_maps)
+        return cls(
+            settings=compiler_data.settings,
+            bytecode=compiler_data.bytecode,
+            bytecode_runtime=compiler_data.bytecode_runtime,
+            storage_layout=compiler_data.storage_layout,
+            analysis=pickle.dumps(analysis, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+
+    def to_compiler_data(self, file_input, input_bundle):
+        return _CachedCompilerData(self, file_input, input_bundle)
+
+
+class _CachedCompilerData(CompilerData):
+    # CompilerData restored from a CompilerArtifact
+    def __init__(self, artifact, file_input, input_bundle):
+        super().__init__(file_input, input_bundle, artifact.settings)
+        self._artifact = artifact
+
+        self.__dict__.update(
+            settings=artifact.settings,
+            bytecode=artifact.bytecode,
+            bytecode_runtime=artifact.bytecode_runtime,
+            storage_layout=artifact.storage_layout,
+        )
+
+    @cached_property
+    def _analysis(self):
+        return pickle.loads(self._artifact.analysis)
+
+    @cached_property
+    def _annotate(self):
+        return self._analysis[0]
+
+    @cached_property
+    def vyper_module(self):
+        return self._annotate[1]
+
+    @cached_property
+    def _boa_source_maps(self):
+        return self._analysis[1]
@@ -27,18 +27,16 @@ class ByteAddressableStorage:
 
     def __getitem__(self, subscript):
         if isinstance(subscript, slice):
-            ret = b""
             start = subscript.start or 0
             stop = subscript.stop
-            i = self.key + start // 32
-            while i < self.key + ceil32(stop) // 32:
-                ret += self.evm.get_storage_slot(self.address, i)
-                i += 1
+            first_slot = start // 32
+            n = ceil32(stop) // 32 - first_slot
+            ret = self.evm.get_storage_slots(self.address, self.key + first_slot, n)
 
             start_ofst = floor32(start)
             start -= start_ofst
             stop -= start_ofst
-            return memoryview(ret[start:stop])
+            return memoryview(ret)[start:stop]
         else:  # pragma: no cover
             raise Exception("Must slice {self}")
 
@@ -5,7 +5,7 @@
 import contextlib
 import copy
 import warnings
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import cached_property
 from pathlib import Path
 from typing import Any, Optional
@@ -43,12 +43,15 @@ from boa.contracts.call_trace import TraceSource
 from boa.contracts.vyper.ast_utils import get_fn_ancestor_from_node, reason_at
 from boa.contracts.vyper.compiler_utils import (
     _METHOD_ID_VAR,
+    Linker,
     compile_vyper_function,
     generate_bytecode_for_arbitrary_stmt,
     generate_bytecode_for_internal_fn,
+    get_source_map,
 )
 from boa.contracts.vyper.decoder_utils import (
     ByteAddressableStorage,
+    _Struct,
     decode_vyper_object,
 )
 from boa.contracts.vyper.event import Event, RawEvent
@@ -56,10 +59,10 @@ from boa.contracts.vyper.ir_executor import executor_from_ir
 from boa.environment import Env
 from boa.profiling import cache_gas_used_for_computation
 from boa.util.abi import Address, abi_decode, abi_encode
+from boa.util.deferred import DeferredCall
 from boa.util.eip5202 import generate_blueprint_bytecode
 from boa.util.lrudict import lrudict
 from boa.vm.gas_meters import ProfilingGasMeter
-from boa.vm.utils import to_bytes, to_int
 
 # error messages for external calls
 EXTERNAL_CALL_ERRORS = ("external call failed", "returndatasize too small")
@@ -240,25 +243,73 @@ class DevReason:
         return f"<{self.reason_type}: {self.reason_str}>"
 
 
+class RevertTable:
+    """
+    Lookup tables for matching reverts against a source map: compiler
+    error messages and AST nodes by PC, and dev reasons by source
+    location. There is one table per source map, shared by all contracts
+    using it, so dev reason comments are only extracted once.
+    """
+
+    def __init__(self, source_map: dict):
+        self.source_map = source_map
+        self.error_map = source_map.get("error_map", {})
+        self.ast_map = source_map["pc_raw_ast_map"]
+        self._dev_reasons: dict = {}
+
+    def find_error_meta(self, trace: list[int]) -> Optional[str]:
+        # the last pc is usually the one we are looking for
+        for pc in reversed(trace):
+            if pc in self.error_map:
+                return self.error_map[pc]
+        return None
+
+    def find_source_of(self, trace: list[int]) -> Optional[vy_ast.VyperNode]:
+        for pc in reversed(trace):
+            if pc in self.ast_map:
+                return self.ast_map[pc]
+        return None
+
+    def dev_reason_of(self, node: Optional[vy_ast.VyperNode]) -> Optional[DevReason]:
+        if node is None:
+            return None
+        k = (node.full_source_code, node.lineno, node.end_lineno)
+        if k not in self._dev_reasons:
+            self._dev_reasons[k] = DevReason.at_source_location(*k)
+        return self._dev_reasons[k]
+
+
+_revert_tables: lrudict = lrudict(256)
+
+
+def get_revert_table(source_map: dict) -> RevertTable:
+    # keyed by identity; the table holds a reference to the source map,
+    # so the id cannot be reused while the entry is alive.
+    k = id(source_map)
+    try:
+        return _revert_tables[k]
+    except KeyError:
+        ret = _revert_tables[k] = RevertTable(source_map)
+        return ret
+
+
 @dataclass
 class ErrorDetail:
     vm_error: VMError
     contract_repr: str  # string representation of the contract for the error
     error_detail: str  # compiler provided error detail
     dev_reason: DevReason
-    frame_detail: FrameDetail
     ast_source: vy_ast.VyperNode
+    # handles for decoding the frame locals on demand. decoding memory is
+    # expensive and the locals are only needed when the error is printed.
+    _contract: Any = field(repr=False, compare=False)
+    _computation: Any = field(repr=False, compare=False)
 
     @classmethod
     def from_computation(cls, contract, computation):
         error_detail = contract.find_error_meta(computation)
         ast_source = contract.find_source_of(computation)
-        reason = None
-        if ast_source is not None:
-            reason = DevReason.at_source_location(
-                ast_source.full_source_code, ast_source.lineno, ast_source.end_lineno
-            )
-        frame_detail = contract.debug_frame(computation)
+        reason = contract._revert_table(computation).dev_reason_of(ast_source)
 
         contract_repr = computation._contract_repr_before_revert or repr(contract)
         return cls(
@@ -266,10 +317,21 @@ class ErrorDetail:
             contract_repr=contract_repr,
             error_detail=error_detail,
             dev_reason=reason,
-            frame_detail=frame_detail,
             ast_source=ast_source,
+            _contract=contract,
+            _computation=computation,
         )
 
+    @cached_property
+    def frame_detail(self) -> Optional[FrameDetail]:
+        return self._contract.debug_frame(self._computation)
+
+    def __getstate__(self):
+        # the contract and computation can't be pickled, decode the
+        # frame locals while we still have them
+        _ = self.frame_detail
+        return {**self.__dict__, "_contract": None, "_computation": None}
+
     @property
     def pretty_vm_reason(self):
         err = self.vm_error
@@ -365,25 +427,6 @@ def check_boa_error_matches(error, *args, **kwargs):
         )
 
 
-# using sha3 preimages, take a storage key and undo
-# hashes to get the sequence of hashes ("path") that gave us this image.
-def unwrap_storage_key(sha3_db, k):
-    path = []
-
-    def unwrap(k):
-        k_bytes = to_bytes(k)
-        if k_bytes in sha3_db:
-            preimage = sha3_db[k_bytes]
-            slot, k = preimage[:32], preimage[32:]
-
-            unwrap(slot)
-
-        path.append(k)
-
-    unwrap(k)
-    return path
-
-
 def setpath(lens, path, val):
     for i, k in enumerate(path):
         if i == len(path) - 1:
@@ -392,12 +435,28 @@ def setpath(lens, path, val):
             lens = lens.setdefault(k, {})
 
 
+# copy the containers in a decoded value. the leaves (ints, bytes, str,
+# addresses) are immutable and can be shared, so this is much cheaper
+# than copy.deepcopy() for large HashMaps.
+def _copy_decoded(val):
+    if isinstance(val, _Struct):
+        return _Struct(val.struct_name, {k: _copy_decoded(v) for k, v in val.items()})
+    if isinstance(val, dict):
+        return {k: _copy_decoded(v) for k, v in val.items()}
+    if isinstance(val, (list, tuple)):
+        return type(val)(_copy_decoded(v) for v in val)
+    return val
+
+
 class StorageVar:
     def __init__(self, contract, slot, typ):
         self.contract = contract
         self.addr = self.contract._address
         self.slot = slot
         self.typ = typ
+        # (storage generation, alias generation, truncate_limit)
+        #   => decoded value
+        self._cache: Optional[tuple[Any, Any]] = None
 
     def _decode(self, slot, typ, truncate_limit=None):
         n = typ.memory_bytes_required
@@ -413,34 +472,43 @@ class StorageVar:
         except KeyError:  # not found, return the input
             return maybe_address
 
+    # decode the HashMap keys in a storage key path. returns the keys
+    # and the type of the value they point to.
+    def _decode_path(self, path):
+        keys = []
+        ty = self.typ
+        for p in path:
+            k = decode_vyper_object(memoryview(p), ty.key_type)
+            # decode aliases as needed/possible
+            if isinstance(ty.key_type, AddressT):
+                k = self._dealias(k)
+            keys.append(k)
+            ty = ty.value_type
+        return keys, ty
+
     def get(self, truncate_limit=None):
+        env = self.contract.env
+        generation = env.evm.storage_generation(self.addr)
+        # HashMap keys are dealiased, so the value also depends on the aliases
+        cache_key = (generation, env._alias_generation, truncate_limit)
+        if self._cache is None or self._cache[0] != cache_key:
+            self._cache = (cache_key, self._get(truncate_limit))
+        # the decoded value is made of plain dicts and lists, which callers
+        # are free to modify. hand out a copy rather than the cached value.
+        return _copy_decoded(self._cache[1])
+
+    def _get(self, truncate_limit):
         if isinstance(self.typ, HashMapT):
             ret = {}
-            for k in self.contract.env.sstore_trace.get(self.addr, {}):
-                path = unwrap_storage_key(self.contract.env.sha3_trace, k)
-                if to_int(path[0]) != self.slot:
-                    continue
-
-                path = path[1:]  # drop the slot
-                path_t = []
-
-                ty = self.typ
-                for i, p in enumerate(path):
-                    path[i] = decode_vyper_object(memoryview(p), ty.key_type)
-                    path_t.append(ty.key_type)
-                    ty = ty.value_type
-
+            storage_index = self.contract.env.storage_index
+            account = self.addr.canonical_address
+            for k, path in storage_index.keys_of(account, self.slot).items():
+                keys, ty = self._decode_path(path)
                 val = self._decode(k, ty, truncate_limit)
 
                 # set val only if value is nonzero
                 if val:
-                    # decode aliases as needed/possible
-                    dealiased_path = []
-                    for p, t in zip(path, path_t):
-                        if isinstance(t, AddressT):
-                            p = self._dealias(p)
-                        dealiased_path.append(p)
-                    setpath(ret, dealiased_path, val)
+                    setpath(ret, keys, val)
 
             return ret
 
@@ -597,9 +665,7 @@ class VyperContract(_BaseVyperContract):
 
     @cached_property
     def _deployment_source_map(self):
-        with anchor_settings(self.compiler_data.settings):
-            _, source_map = compile_ir.assembly_to_evm(self.compiler_data.assembly)
-            return source_map
+        return get_source_map(self.compiler_data, runtime=False)
 
     # manually set the runtime bytecode, instead of using deploy
     def _set_bytecode(self, bytecode: bytes) -> None:
@@ -638,6 +704,24 @@ class VyperContract(_BaseVyperContract):
     def at(self, address):
         return self.deployer.at(address)
 
+    # name of the storage variable at `slot`, e.g. `balances[0x1234...]`
+    def _storage_slot_label(self, slot: int) -> Optional[str]:
+        account = self.address.canonical_address
+        root, path = self.env.storage_index.path_of(account, slot) or (slot, ())
+        for name, var in vars(self._storage).items():
+            if len(path) > 0:
+                if var.slot == root and isinstance(var.typ, HashMapT):
+                    keys, _ = var._decode_path(path)
+                    return name + "".join(f"[{k}]" for k in keys)
+                continue
+
+            n = var.typ.storage_size_in_words
+            if var.slot <= slot < var.slot + n:
+                if n == 1:
+                    return name
+                return f"{name}<slot +{slot - var.slot}>"
+        return None
+
     def _get_fn_from_computation(self, computation):
         node = self.find_source_of(computation)
         return get_fn_ancestor_from_node(node)
@@ -676,35 +760,43 @@ class VyperContract(_BaseVyperContract):
     # TODO: maybe rename to `ast_map`
     @property
     def source_map(self):
-        if self._source_map is None:
-            with anchor_settings(self.compiler_data.settings):
-                assembly = self.compiler_data.assembly_runtime
-                _, self._source_map = compile_ir.assembly_to_evm(assembly)
-        return self._source_map
+        if self._source_map is not None:
+            # overridden by _anchor_source_map
+            return self._source_map
+        return get_source_map(self.compiler_data)
+
+    def handle_error(self, computation):
+        # BoaError inspects the computation lazily, possibly after an
+        # `_anchor_source_map()` context has exited. pin the source map
+        # which was in effect when the error happened.
+        computation._boa_source_map = self.source_map
+        super().handle_error(computation)
+
+    def _source_map_for(self, computation):
+        source_map = getattr(computation, "_boa_source_map", None)
+        if source_map is not None:
+            return source_map
+        return self.source_map
+
+    def _revert_table(self, computation) -> RevertTable:
+        return get_revert_table(self._source_map_for(computation))
 
     def find_error_meta(self, computation):
         if hasattr(computation, "vyper_error_msg"):
             # this is set by ir executor currently.
             return computation.vyper_error_msg
 
-        code_stream = computation.code
-        error_map = self.source_map.get("error_map", {})
-        for pc in reversed(code_stream._trace):
-            if pc in error_map:
-                return error_map[pc]
-        return None
+        table = self._revert_table(computation)
+        return table.find_error_meta(computation.code._trace)
 
     def find_source_of(self, computation):
         if hasattr(computation, "vyper_source_pos"):
             # this is set by ir executor currently.
-            return self.source_map.get(computation.vyper_source_pos)
+            source_map = self._source_map_for(computation)
+            return source_map.get(computation.vyper_source_pos)
 
-        code_stream = computation.code
-        ast_map = self.source_map["pc_raw_ast_map"]
-        for pc in reversed(code_stream._trace):
-            if pc in ast_map:
-                return ast_map[pc]
-        return None
+        table = self._revert_table(computation)
+        return table.find_source_of(computation.code._trace)
 
     def trace_source(self, computation) -> Optional["VyperTraceSource"]:
         if (node := self.find_source_of(computation)) is None:
@@ -775,7 +867,16 @@ class VyperContract(_BaseVyperContract):
 
         return Event(log_id, self._address, event_t, decoded_topics, args)
 
-    def marshal_to_python(self, computation, vyper_typ):
+    def marshal_to_python(
+        self, computation, vyper_typ, return_abi_type: Optional[str] = None
+    ):
+        """
+        Convert the output of a contract call to a Python object.
+        :param computation: the computation object returned by `execute_code`
+        :param vyper_typ: the vyper type of the return value.
+        :param return_abi_type: the ABI type of the return value, if already
+            known. Derived from `vyper_typ` otherwise.
+        """
         self._computation = computation  # for further inspection
 
         if computation.is_error:
@@ -793,8 +894,9 @@ class VyperContract(_BaseVyperContract):
         if len(computation.beneficiaries) > 0:
             return None
 
-        return_typ = calculate_type_for_external_return(vyper_typ)
-        ret = abi_decode(return_typ.abi_type.selector_name(), computation.output)
+        if return_abi_type is None:
+            return_abi_type = _return_abi_type(vyper_typ)
+        ret = abi_decode(return_abi_type, computation.output)
 
         # unwrap the tuple if needed
         if not isinstance(vyper_typ, TupleT):
@@ -805,8 +907,7 @@ class VyperContract(_BaseVyperContract):
     def stack_trace(self, computation=None):
         computation = computation or self._computation
         ret = StackTrace([ErrorDetail.from_computation(self, computation)])
-        error_detail = self.find_error_meta(computation)
-        if error_detail not in EXTERNAL_CALL_ERRORS + CREATE_ERRORS:
+        if ret.last_frame.error_detail not in EXTERNAL_CALL_ERRORS + CREATE_ERRORS:
             return ret
         return _handle_child_trace(computation, self.env, ret)
 
@@ -830,6 +931,10 @@ class VyperContract(_BaseVyperContract):
     def override_vyper_namespace(self):
         # ensure self._vyper_namespace is computed
         contract_members = self._vyper_namespace["self"].typ.members
+        # override_global_namespace assumes the global namespace has been
+        # initialized, which is not the case if nothing has been analyzed
+        # in this process yet (e.g. everything was loaded from cache).
+        vy_ns.get_namespace()
         try:
             to_keep = set(contract_members.keys())
             with vy_ns.override_global_namespace(self._vyper_namespace):
@@ -878,6 +983,10 @@ class VyperContract(_BaseVyperContract):
         with anchor_settings(settings):
             return generate_ir_for_module(self.module_t)
 
+    @cached_property
+    def _linker(self):
+        return Linker(self)
+
     @cached_property
     def ir_executor(self):
         _, ir_runtime = self.unoptimized_ir
@@ -1016,9 +1125,63 @@ class VyperFunction:
 
         return _method_id, args_abi_type
 
+    @property
+    def _call_plan(self) -> "_CallPlan":
+        # the plan only needs rebuilding if the contract is moved to
+        # another address or env. it doesn't depend on the code at the
+        # address, which is looked up by the env on each call.
+        plan = self.__dict__.get("_plan")
+        if (
+            plan is None
+            or plan.to_address is not self.contract._address
+            or plan.env is not self.env
+        ):
+            plan = self._plan = self._make_call_plan()
+        return plan
+
+    def _make_call_plan(self) -> "_CallPlan":
+        # everything else is fixed once the function is created (injected
+        # functions set their overrides in `__init__`)
+        func_t = self.func_t
+
+        # getattr(x, attr, None) swallows exceptions. use explicit hasattr+getattr
+        override_bytecode = None
+        ir_executor = None
+        source_map = None
+        if hasattr(self, "_override_bytecode"):
+            override_bytecode = self._override_bytecode
+            # the source map is overridden together with the bytecode
+            source_map = self._source_map
+        if hasattr(self, "_ir_executor"):
+            ir_executor = self._ir_executor
+
+        n_kwargs = func_t.n_total_args - func_t.n_positional_args
+        signatures = tuple(self.args_abi_type(n) for n in range(n_kwargs + 1))
+
+        return_type = func_t.return_type
+        return_abi_type = None
+        if return_type is not None:
+            return_abi_type = _return_abi_type(return_type)
+
+        return _CallPlan(
+            to_address=self.contract._address,
+            env=self.env,
+            n_pos_args=func_t.n_positional_args,
+            n_total_args=func_t.n_total_args,
+            signatures=signatures,
+            has_method_id=not (func_t.is_constructor or func_t.is_fallback),
+            is_modifying=func_t.is_mutable,
+            return_type=return_type,
+            return_abi_type=return_abi_type,
+            override_bytecode=override_bytecode,
+            ir_executor=ir_executor,
+            source_map=source_map,
+        )
+
     def prepare_calldata(self, *args, **kwargs):
-        n_total_args = self.func_t.n_total_args
-        n_pos_args = self.func_t.n_positional_args
+        plan = self._call_plan
+        n_pos_args = plan.n_pos_args
+        n_total_args = plan.n_total_args
 
         if not n_pos_args <= len(args) <= n_total_args:
             expectation_str = f"expected between {n_pos_args} and {n_total_args}"
@@ -1029,50 +1192,80 @@ class VyperFunction:
                 f"({expectation_str}, got {len(args)})"
             )
 
-        # align the kwargs with the signature
-        # sig_kwargs = self.func_t.default_args[: len(kwargs)]
-
         total_non_base_args = len(kwargs) + len(args) - n_pos_args
+        if total_non_base_args < len(plan.signatures):
+            method_id, args_abi_type = plan.signatures[total_non_base_args]
+        else:
+            method_id, args_abi_type = self.args_abi_type(total_non_base_args)
 
-        args = [getattr(arg, "address", arg) for arg in args]
-
-        method_id, args_abi_type = self.args_abi_type(total_non_base_args)
+        # note: contracts passed as arguments are converted to their
+        # address by the encoder
         encoded_args = abi_encode(args_abi_type, args)
 
-        if self.func_t.is_constructor or self.func_t.is_fallback:
+        if not plan.has_method_id:
             return encoded_args
 
         return method_id + encoded_args
 
     def __call__(self, *args, value=0, gas=None, sender=None, **kwargs):
+        plan = self._call_plan
         calldata_bytes = self.prepare_calldata(*args, **kwargs)
 
-        # getattr(x, attr, None) swallows exceptions. use explicit hasattr+getattr
-        ir_executor = None
-        if hasattr(self, "_ir_executor"):
-            ir_executor = self._ir_executor
-
-        override_bytecode = None
-        if hasattr(self, "_override_bytecode"):
-            override_bytecode = self._override_bytecode
+        if plan.source_map is None:
+            # perf: the contract's own source map is used by default,
+            # no need to anchor it.
+            return self._execute(plan, calldata_bytes, value, gas, sender)
+
+        with self.contract._anchor_source_map(plan.source_map):
+            return self._execute(plan, calldata_bytes, value, gas, sender)
+
+    def _execute(self, plan, calldata_bytes, value, gas, sender):
+        contract = self.contract
+        computation = plan.env.execute_code(
+            to_address=plan.to_address,
+            sender=sender,
+            data=calldata_bytes,
+            value=value,
+            gas=gas,
+            is_modifying=plan.is_modifying,
+            override_bytecode=plan.override_bytecode,
+            ir_executor=plan.ir_executor,
+            contract=contract,
+        )
 
-        # note: this anchor doesn't do anything on the default implementation.
-        # the source map is overridden in subclasses
-        with self.contract._anchor_source_map(self._source_map):
-            computation = self.env.execute_code(
-                to_address=self.contract._address,
-                sender=sender,
-                data=calldata_bytes,
-                value=value,
-                gas=gas,
-                is_modifying=self.func_t.is_mutable,
-                override_bytecode=override_bytecode,
-                ir_executor=ir_executor,
-                contract=self.contract,
+        typ, return_abi_type = plan.return_type, plan.return_abi_type
+        if isinstance(computation, DeferredCall):
+            # inside env.batch_views()
+            return computation.future(
+                lambda c: contract.marshal_to_python(c, typ, return_abi_type)
             )
+        return contract.marshal_to_python(computation, typ, return_abi_type)
+
+
+@dataclass(frozen=True)
+class _CallPlan:
+    """
+    The parts of a `VyperFunction` call which don't depend on the
+    arguments, precomputed so that calls skip the type lookups.
+    """
+
+    to_address: Optional[Address]
+    env: Env
+    n_pos_args: int
+    n_total_args: int
+    # (method id, args abi type), indexed by the number of kwargs
+    signatures: tuple[tuple[bytes, str], ...]
+    has_method_id: bool  # False for constructors and fallbacks
+    is_modifying: bool
+    return_type: Any
+    return_abi_type: Optional[str]
+    override_bytecode: Optional[bytes]
+    ir_executor: Any
+    source_map: Optional[dict]  # anchored during the call, if overridden
+
 
-            typ = self.func_t.return_type
-            return self.contract.marshal_to_python(computation, typ)
+def _return_abi_type(vyper_typ) -> str:
+    return calculate_type_for_external_return(vyper_typ).abi_type.selector_name()
 
 
 class VyperInternalFunction(VyperFunction):
@@ -1163,6 +1356,14 @@ class _InjectVyperFunction(VyperFunction):
 _typ_cache = {}
 
 
+def _reduce_vyper_object(self):
+    # the wrapper classes are created dynamically and can't be found by
+    # pickle, so pickle the underlying value (e.g. to send results
+    # between processes in `boa.parallel.map()`).
+    (vt,) = type(self).__bases__
+    return vt, (vt(self),)
+
+
 def vyper_object(val, vyper_type):
     # make a thin wrapper around whatever type val is,
     # and tag it with _vyper_type metadata
@@ -1175,7 +1376,8 @@ def vyper_object(val, vyper_type):
 
     if vt not in _typ_cache:
         # ex. class int_wrapper(int): pass
-        _typ_cache[vt] = type(f"{vt.__name__}_wrapper", (vt,), {})
+        attrs = {"__reduce__": _reduce_vyper_object}
+        _typ_cache[vt] = type(f"{vt.__name__}_wrapper", (vt,), attrs)
 
     t = _typ_cache[type(val)]
 
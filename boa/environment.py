@@ -7,15 +7,17 @@ The entry point for managing the execution environment.
 import contextlib
 import random
 import warnings
-from typing import Any, Optional, TypeAlias
+from typing import Any, Callable, Iterable, Optional, TypeAlias
 
 import eth.constants as constants
 from eth_typing import Address as PYEVM_Address  # it's just bytes.
 
 from boa.rpc import RPC, EthereumRPC
+from boa.state_diff import Exploration, StateDiff
 from boa.util.abi import Address
 from boa.vm.gas_meters import GasMeter, NoGasMeter, ProfilingGasMeter
 from boa.vm.py_evm import PyEVM
+from boa.vm.storage_index import StorageIndex
 
 # make mypy happy
 _AddressType: TypeAlias = Address | str | bytes | PYEVM_Address
@@ -31,6 +33,9 @@ class Env:
         self._gas_price = None
 
         self._aliases = {}
+        # bumped on every change to the aliases, for caches of decoded
+        # values which contain aliased addresses
+        self._alias_generation = 0
 
         # TODO differentiate between origin and sender
         self.eoa = self.generate_address("eoa")
@@ -38,8 +43,8 @@ class Env:
         self._contracts = {}
         self._code_registry = {}
 
-        self.sha3_trace: dict = {}
-        self.sstore_trace: dict = {}
+        self.storage_index = StorageIndex()
+        self._state_diffs: list[StateDiff] = []
 
         self._gas_tracker = 0
 
@@ -47,6 +52,18 @@ class Env:
 
         self.evm = PyEVM(self, fast_mode_enabled, fork_try_prefetch_state)
 
+    # these used to be plain dicts, kept for compatibility.
+    @property
+    def sha3_trace(self) -> dict:
+        """Recent sha3 preimages, preimage => image. Read-only."""
+        preimages = self.storage_index.preimages
+        return {preimage: image for (image, preimage) in preimages.items()}
+
+    @property
+    def sstore_trace(self) -> dict:
+        """The storage keys written, per account. Read-only."""
+        return self.storage_index.touched_accounts()
+
     def set_random_seed(self, seed=None):
         self._random = random.Random(seed)
 
@@ -79,8 +96,7 @@ class Env:
         # we usually want to reset the trace data structures
         # but sometimes don't, give caller the option.
         if reset_traces:
-            self.sha3_trace = {}
-            self.sstore_trace = {}
+            self.storage_index = StorageIndex()
 
         self.evm.fork_rpc(rpc, block_identifier, **kwargs)
 
@@ -111,7 +127,9 @@ class Env:
 
     # set balance of address in py-evm
     def set_balance(self, addr, value):
-        self.evm.set_balance(Address(addr), value)
+        addr = Address(addr)
+        self._trace_account(addr.canonical_address)
+        self.evm.set_balance(addr, value)
 
     # get balance of address in py-evm
     def get_balance(self, addr):
@@ -139,6 +157,7 @@ class Env:
 
     def alias(self, address, name):
         self._aliases[Address(address).canonical_address] = name
+        self._alias_generation += 1
 
     def lookup_alias(self, address):
         return self._aliases[Address(address).canonical_address]
@@ -165,6 +184,65 @@ class Env:
         finally:
             self.evm.revert(snapshot_id)
 
+    @contextlib.contextmanager
+    def state_diff(self):
+        """
+        Record the changes to account balances, nonces, code and storage
+        made inside the with statement. Yields a `StateDiff`, which is
+        filled in when the with statement exits.
+        """
+        diff = StateDiff(self)
+        self._state_diffs.append(diff)
+        try:
+            yield diff
+        finally:
+            self._state_diffs.remove(diff)
+            diff._finalize()
+
+    def explore(
+        self, candidates: Iterable[Callable[[], Any]], processes: Optional[int] = None
+    ) -> list[Exploration]:
+        """
+        Run each candidate (a callable taking no arguments) starting from
+        the current state, and collect its result or error along with
+        the state diff it produced. The state is reset between candidates
+        and after the last one.
+        :param candidates: The candidates to run
+        :param processes: If given, spread the candidates over this many
+            forked processes. Results (and errors) must be picklable.
+        """
+        candidates = list(candidates)
+
+        if processes is not None and processes > 1:
+            from boa.parallel import _fork_map
+
+            ret: list[Any] = [None] * len(candidates)
+            for i, ok, value in _fork_map(self._explore_one, candidates, processes):
+                if not ok:
+                    raise value
+                ret[i] = value
+            return ret
+
+        # snapshot the patched vm values once instead of anchoring
+        # every candidate
+        patch_snapshot = self.evm.patch.snapshot()
+        try:
+            return [self._explore_one(c) for c in candidates]
+        finally:
+            self.evm.patch.restore(patch_snapshot)
+
+    def _explore_one(self, candidate: Callable[[], Any]) -> Exploration:
+        snapshot_id = self.evm.snapshot()
+        try:
+            with self.state_diff() as diff:
+                try:
+                    result, error = candidate(), None
+                except Exception as e:
+                    result, error = None, e
+        finally:
+            self.evm.revert(snapshot_id)
+        return Exploration(result, error, diff)
+
     @contextlib.contextmanager
     def sender(self, address):
         tmp = self.eoa
@@ -216,6 +294,8 @@ class Env:
         sender = self._get_sender(sender)
 
         if override_address is None:
+            # the sender nonce is incremented outside of any message
+            self._trace_account(sender.canonical_address)
             target_address = self.evm.generate_create_address(sender)
         else:
             target_address = Address(override_address)
@@ -346,13 +426,37 @@ class Env:
         return self.evm.get_code(Address(address))
 
     def set_code(self, address: _AddressType, code: bytes) -> None:
-        self.evm.set_code(Address(address), code)
+        address = Address(address)
+        self._trace_account(address.canonical_address)
+        self.evm.set_code(address, code)
+
+    # hooks for the SHA3 and SSTORE tracers (and the fast mode executor)
+    def _trace_sha3_preimage(self, preimage: bytes, image: bytes) -> None:
+        self.storage_index.record_sha3(preimage, image)
+
+    def _trace_sstore(self, account: PYEVM_Address, slot: int) -> None:
+        self.storage_index.record_sstore(account, slot)
+        self.evm.touch_storage(account)
+        for diff in self._state_diffs:
+            diff._record_slot(account, slot)
+
+    def _trace_account(self, account: PYEVM_Address) -> None:
+        for diff in self._state_diffs:
+            diff._record_account(account)
+
+    def _trace_message(self, msg) -> None:
+        if self._state_diffs:
+            self._trace_account(msg.sender)
+            self._trace_account(msg.storage_address)
 
     def get_storage(self, address: _AddressType, slot: int) -> int:
         return self.evm.get_storage(Address(address), slot)
 
     def set_storage(self, address: _AddressType, slot: int, value: int) -> None:
-        self.evm.set_storage(Address(address), slot, value)
+        address = Address(address)
+        for diff in self._state_diffs:
+            diff._record_slot(address.canonical_address, slot)
+        self.evm.set_storage(address, slot, value)
 
     # function to time travel
     def time_travel(
@@ -24,9 +24,10 @@ from boa.integrations.jupyter.constants import (
     SHARED_MEMORY_LENGTH,
     TRANSACTION_TIMEOUT_MESSAGE,
 )
-from boa.network import NetworkEnv
+from boa.network import Capabilities, NetworkEnv
 from boa.rpc import RPC, RPCError
 from boa.util.abi import Address
+from boa.util.ttl_cache import TTLCache
 
 try:
     from google.colab.output import eval_js as colab_eval_js
@@ -159,6 +160,12 @@ class BrowserEnv(NetworkEnv):
 
     def __init__(self, address=None, **kwargs):
         super().__init__(self._rpc, **kwargs)
+        # javascript calls need to happen on the main thread
+        self.tx_settings.overlap_simulation = False
+        # the wallet can switch chains under the same rpc identifier,
+        # don't share chain metadata with other envs or across runs.
+        self._cache = TTLCache()
+        self.capabilities = Capabilities(self._rpc, self._cache)
         self.signer = BrowserSigner(address, self._rpc)
         self._update_signer()
 
@@ -179,6 +186,10 @@ class BrowserEnv(NetworkEnv):
             "wallet_switchEthereumChain",
             [{"chainId": chain_id if isinstance(chain_id, str) else hex(chain_id)}],
         )
+        self._cache.invalidate()
+        for attr in ("_tracer", "_rpc_has_snapshot"):
+            self.__dict__.pop(attr, None)
+        self.capabilities = Capabilities(self._rpc, self._cache)
         self._reset_fork()
 
 
@@ -1,10 +1,12 @@
+import pickle
 import sys
 import textwrap
+from concurrent.futures import ProcessPoolExecutor
 from importlib.abc import MetaPathFinder
 from importlib.machinery import SourceFileLoader
 from importlib.util import spec_from_loader
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Union
+from typing import Any, Optional, Union
 
 import vvm
 import vyper
@@ -12,20 +14,14 @@ from packaging.version import Version
 from vvm.utils.versioning import _pick_vyper_version, detect_version_specifier_set
 from vyper.ast.parse import parse_to_ast
 from vyper.cli.vyper_compile import get_search_paths
-from vyper.compiler.input_bundle import (
-    ABIInput,
-    CompilerInput,
-    FileInput,
-    FilesystemInputBundle,
-)
+from vyper.compiler.input_bundle import FileInput, FilesystemInputBundle
 from vyper.compiler.phases import CompilerData
 from vyper.compiler.settings import Settings, anchor_settings
 from vyper.semantics.analysis.module import analyze_module
-from vyper.semantics.types.module import ModuleT
-from vyper.utils import sha256sum
 
 from boa.contracts.abi.abi_contract import ABIContractFactory
 from boa.contracts.vvm.vvm_contract import VVMDeployer
+from boa.contracts.vyper.compiler_utils import ARTIFACT_VERSION, CompilerArtifact
 from boa.contracts.vyper.vyper_contract import (
     VyperBlueprint,
     VyperContract,
@@ -35,10 +31,13 @@ from boa.environment import Env
 from boa.explorer import Etherscan, get_etherscan
 from boa.rpc import json
 from boa.util.abi import Address
-from boa.util.disk_cache import DiskCache
-
-if TYPE_CHECKING:
-    from vyper.semantics.analysis.base import ImportInfo
+from boa.util.disk_cache import CacheStats, DiskCache
+from boa.util.fingerprint import (  # noqa: F401
+    get_module_fingerprint,
+    get_source_fingerprint,
+    hash_input,
+)
+from boa.util.lrudict import lrudict
 
 _Contract = Union[VyperContract, VyperBlueprint]
 
@@ -46,6 +45,21 @@ _Contract = Union[VyperContract, VyperBlueprint]
 _disk_cache = None
 _search_path = None
 
+# in-process cache of analyzed modules, so that loading the same module
+# again (e.g. under a different name) skips semantic analysis. entries
+# are pickled: CompilerData annotates (and codegen mutates) the AST in
+# place, so each CompilerData gets its own copy.
+_analysis_cache: lrudict = lrudict(128)
+
+
+# note: call this before codegen, which mutates the annotated AST.
+def _cache_analysis(analysis_key, compiler_data):
+    if analysis_key in _analysis_cache:
+        return
+    with anchor_settings(compiler_data.settings):
+        annotated = compiler_data._annotate
+    _analysis_cache[analysis_key] = pickle.dumps(annotated, pickle.HIGHEST_PROTOCOL)
+
 
 def set_search_path(path: list[str]):
     global _search_path
@@ -65,6 +79,12 @@ def disable_cache():
     set_cache_dir(None)
 
 
+def get_cache_stats() -> Optional[CacheStats]:
+    if _disk_cache is None:
+        return None
+    return _disk_cache.stats
+
+
 set_cache_dir()  # enable caching, by default!
 
 
@@ -99,37 +119,6 @@ class BoaLoader(SourceFileLoader):
 sys.meta_path.append(BoaImporter())
 
 
-def hash_input(compiler_input: CompilerInput) -> str:
-    if isinstance(compiler_input, FileInput):
-        return compiler_input.sha256sum
-    if isinstance(compiler_input, ABIInput):
-        return sha256sum(str(compiler_input.abi))
-    raise RuntimeError(f"bad compiler input {compiler_input}")
-
-
-# compute a fingerprint for a module which changes if any of its
-# dependencies change
-# TODO consider putting this in its own module
-def get_module_fingerprint(
-    module_t: ModuleT, seen: dict["ImportInfo", str] = None
-) -> str:
-    seen = seen or {}
-    fingerprints = []
-    for stmt in module_t.import_stmts:
-        import_info = stmt._metadata["import_info"]
-        if id(import_info) not in seen:
-            if isinstance(import_info.typ, ModuleT):
-                fingerprint = get_module_fingerprint(import_info.typ, seen)
-            else:
-                fingerprint = hash_input(import_info.compiler_input)
-            seen[id(import_info)] = fingerprint
-        fingerprint = seen[id(import_info)]
-        fingerprints.append(fingerprint)
-    fingerprints.append(module_t._module.source_sha256sum)
-
-    return sha256sum("".join(fingerprints))
-
-
 def compiler_data(
     source_code: str,
     contract_name: str | None,
@@ -151,27 +140,48 @@ def compiler_data(
 
     settings = Settings(**kwargs)
     ret = CompilerData(file_input, input_bundle, settings)
+
+    fingerprint = get_source_fingerprint(file_input, search_paths)
+    if fingerprint is None:
+        # couldn't resolve the imports from the sources alone, fall
+        # back to the (slow) path which runs semantic analysis.
+        with anchor_settings(ret.settings):
+            module_t = ret.annotated_vyper_module._metadata["type"]
+        fingerprint = get_module_fingerprint(module_t)
+
+    analysis_key = str((fingerprint, resolved_path, kwargs))
+    if analysis_key in _analysis_cache:
+        # seed the result of CompilerData._annotate (which annotates
+        # CompilerData.vyper_module in place)
+        ret.__dict__["_annotate"] = pickle.loads(_analysis_cache[analysis_key])
+        ret.__dict__["vyper_module"] = ret._annotate[1]
+
     if _disk_cache is None:
+        _cache_analysis(analysis_key, ret)
         return ret
 
-    with anchor_settings(ret.settings):
-        # note that this actually parses and analyzes all dependencies,
-        # even if they haven't changed. an optimization would be to
-        # somehow convince vyper (in ModuleAnalyzer) to get the module_t
-        # from the cache.
-        module_t = ret.annotated_vyper_module._metadata["type"]
-    fingerprint = get_module_fingerprint(module_t)
-
-    def get_compiler_data():
+    def get_artifact():
+        _cache_analysis(analysis_key, ret)
         with anchor_settings(ret.settings):
             # force compilation to happen so DiskCache will cache the compiled artifact:
             _ = ret.bytecode, ret.bytecode_runtime
-        return ret
+            return CompilerArtifact.from_compiler_data(ret)
 
     assert isinstance(deployer, type) or deployer is None
     deployer_id = repr(deployer)  # a unique str identifying the deployer class
-    cache_key = str((contract_name, filename, fingerprint, kwargs, deployer_id))
-    return _disk_cache.caching_lookup(cache_key, get_compiler_data)
+    # note: contract_name doesn't affect the compiled artifact, and neither
+    # does how the path is spelled, so that e.g. `load()` and `load_many()`
+    # share entries.
+    cache_key = str((resolved_path, fingerprint, kwargs, deployer_id, ARTIFACT_VERSION))
+    artifact = _disk_cache.caching_lookup(cache_key, get_artifact)
+
+    if "bytecode" not in ret.__dict__:
+        # disk cache hit
+        ret = artifact.to_compiler_data(file_input, input_bundle)
+
+    # eval and internal function wrappers are cached alongside the contract
+    ret._boa_disk_cache = (_disk_cache, cache_key)
+    return ret
 
 
 def load(filename: str | Path, *args, **kwargs) -> _Contract:  # type: ignore
@@ -245,6 +255,12 @@ def loads_partial(
     dedent: bool = True,
     compiler_args: dict = None,
 ) -> VyperDeployer:
+    return _loads_partial(source_code, name, filename, dedent, compiler_args)
+
+
+def _loads_partial(
+    source_code, name, filename, dedent, compiler_args, deployer_class=None
+):
     if filename is None:
         filename = "<unknown>"
 
@@ -261,7 +277,8 @@ def loads_partial(
 
     compiler_args = compiler_args or {}
 
-    deployer_class = _get_default_deployer_class()
+    if deployer_class is None:
+        deployer_class = _get_default_deployer_class()
     data = compiler_data(source_code, name, filename, deployer_class, **compiler_args)
     return deployer_class(data, filename=filename)
 
@@ -273,6 +290,83 @@ def load_partial(filename: str, compiler_args=None):
         )
 
 
+def load_many(
+    filenames: list[str | Path], compiler_args: dict = None, max_workers: int = None
+) -> list[VyperDeployer]:
+    """
+    Like `load_partial`, for many files at once. Files which are not in
+    the disk cache yet are compiled in parallel in a process pool, and
+    the results are shared via the disk cache.
+    """
+    filenames = [str(f) for f in filenames]
+    precompile_many(filenames, compiler_args, max_workers)
+
+    deployer_class = _get_default_deployer_class()
+    ret = []
+    for filename in filenames:
+        with open(filename) as f:
+            source_code = f.read()
+        # mostly cache hits now. files which failed to compile in a worker
+        # are recompiled here, so that the error is raised in this process.
+        ret.append(
+            _loads_partial(
+                source_code, filename, filename, True, compiler_args, deployer_class
+            )
+        )
+    return ret
+
+
+def precompile_many(
+    filenames: list[str | Path], compiler_args: dict = None, max_workers: int = None
+) -> None:
+    """
+    Compile many files in parallel in a process pool, and store the results
+    in the disk cache without loading them. Compilation errors are ignored,
+    they are raised when the files are loaded. Does nothing if the disk
+    cache is disabled.
+    """
+    filenames = [str(f) for f in filenames]
+    deployer_class = _get_default_deployer_class()
+    _precompile_many(filenames, compiler_args, deployer_class, max_workers)
+
+
+def _precompile_many(filenames, compiler_args, deployer_class, max_workers=None):
+    # without a disk cache, there is no way to share the results
+    if _disk_cache is None or len(filenames) < 2:
+        return
+
+    cache_dir = str(_disk_cache.cache_dir)
+    n = len(filenames)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        list(
+            executor.map(
+                _precompile,
+                filenames,
+                [compiler_args] * n,
+                [deployer_class] * n,
+                [cache_dir] * n,
+                [_search_path] * n,
+            )
+        )
+
+
+def _precompile(filename, compiler_args, deployer_class, cache_dir, search_path):
+    # runs in a worker process. compile the file, which writes the
+    # result to the disk cache.
+    set_cache_dir(cache_dir)
+    set_search_path(search_path)
+    try:
+        with open(filename) as f:
+            source_code = f.read()
+        _loads_partial(
+            source_code, filename, filename, True, compiler_args, deployer_class
+        )
+        return True
+    except Exception:
+        # the parent process will recompile it and report the error
+        return False
+
+
 def _loads_partial_vvm(source_code: str, version: Version, filename: str):
     global _disk_cache
 
@@ -1,13 +1,19 @@
 # an Environment which interacts with a real (prod or test) chain
 import contextlib
+import ipaddress
+import os
 import time
 import warnings
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from functools import cached_property
+from hashlib import sha256
 from math import ceil
+from typing import Any, Optional
+from urllib.parse import urlparse
 
 from eth_account import Account
-from requests.exceptions import HTTPError
+from requests.exceptions import HTTPError, RequestException
 
 from boa.deployments import Deployment, get_deployments_db
 from boa.environment import Env, _AddressType
@@ -22,7 +28,10 @@ from boa.rpc import (
     trim_dict,
 )
 from boa.util.abi import Address
+from boa.util.deferred import DeferredCall, ViewFuture  # noqa: F401
+from boa.util.ttl_cache import TTLCache
 from boa.verifiers import get_verification_bundle
+from boa.vm.gas_meters import NoGasMeter, ProfilingGasMeter
 
 
 class TraceObject:
@@ -54,6 +63,129 @@ class _EstimateGasFailed(Exception):
     pass
 
 
+class _RemoteComputation:
+    # stands in for the local computation of a call which was
+    # only run on the node
+    is_error = False
+    beneficiaries: list = []
+    children: list = []
+
+    def __init__(self, output):
+        self.output = output
+
+    @property
+    def _log_entries(self):
+        return []
+
+    def get_raw_log_entries(self):
+        return self._log_entries
+
+
+class _TraceComputation(_RemoteComputation):
+    # stands in for the local computation of a mined transaction which
+    # was not simulated. fields are built lazily from the receipt and
+    # the debug_traceTransaction result.
+    def __init__(self, receipt, trace, rpc=None, create_address=None):
+        self._receipt = receipt
+        self._trace = trace
+        self._rpc = rpc
+        self._create_address = create_address
+
+    @cached_property
+    def output(self):
+        if self._create_address is not None:
+            # for deployments, the output is the runtime code
+            args = [self._create_address, self._receipt["blockNumber"]]
+            return to_bytes(self._rpc.fetch("eth_getCode", args))
+        if self._trace is None:
+            return b""
+        return self._trace.returndata_bytes
+
+    @cached_property
+    def _log_entries(self):
+        # py-evm log format is (log_id, address, topics, data)
+        return [
+            (
+                to_int(log["logIndex"]),
+                Address(log["address"]).canonical_address,
+                tuple(to_int(topic) for topic in log["topics"]),
+                to_bytes(log["data"]),
+            )
+            for log in self._receipt.get("logs", [])
+        ]
+
+    def get_gas_used(self):
+        return to_int(self._receipt["gasUsed"])
+
+
+# the computation for a batched view call, once the node has answered
+def _view_computation(computation, output):
+    if computation is None:
+        return _RemoteComputation(output)
+    if computation.output != output:
+        warnings.warn(
+            "local fork did not match node! this indicates state got out "
+            "of sync with the network or a bug in titanoboa!",
+            stacklevel=2,
+        )
+        # just return whatever the node had.
+        computation.output = output
+    return computation
+
+
+# state of a NetworkEnv.batch_views() context
+class _ViewBatch:
+    def __init__(self, simulate):
+        self.simulate = simulate
+        self.calls: list[DeferredCall] = []
+
+    def add(self, args, computation):
+        call = DeferredCall(args, computation)
+        self.calls.append(call)
+        return call
+
+
+@dataclass
+class _PendingDeploy:
+    local_address: Address
+    contract: Any
+    sender: str
+    broadcast_ts: float
+
+
+@dataclass
+class _PendingTxn:
+    tx_hash: str
+    tx_data: dict
+    deploy: Optional[_PendingDeploy] = None
+
+
+# state of a NetworkEnv.pipeline() context
+@dataclass
+class _Pipeline:
+    # next nonce per sender
+    nonces: dict = field(default_factory=dict)
+    # fee fields, estimated once per pipeline
+    fees: Optional[dict] = None
+    # transactions in flight, in broadcast order
+    pending: list = field(default_factory=list)
+
+
+# addresses whose state was (possibly) changed by a mined transaction
+def _receipt_addresses(receipt):
+    ret = {receipt["from"]}
+    for key in ("to", "contractAddress"):
+        if receipt.get(key) is not None:
+            ret.add(receipt[key])
+    for log in receipt.get("logs", []):
+        ret.add(log["address"])
+    return ret
+
+
+# returns the accounts changed by a transaction, as {"pre": .., "post": ..}
+_STATE_DIFF_TRACER = {"tracer": "prestateTracer", "tracerConfig": {"diffMode": True}}
+
+
 @dataclass
 class TransactionSettings:
     # when calculating the base fee, the number of blocks N ahead
@@ -68,6 +200,33 @@ class TransactionSettings:
     # amount of time to wait, in seconds before giving up on a transaction
     poll_timeout: float = 240.0
 
+    # opt-in: after each transaction, move the local fork to the new block
+    # and only refetch the accounts touched by the transaction, instead of
+    # re-forking from scratch. note state changed by other transactions
+    # in the meantime is not refetched! by default, always re-fork.
+    incremental_repin: bool = False
+
+    # in pipeline mode, gas limits are estimated from the local simulation
+    # and multiplied by this margin.
+    gas_estimate_margin: float = 1.25
+
+    # request fees, nonce and gas estimate from the node in a background
+    # thread while the local simulation runs.
+    overlap_simulation: bool = True
+
+    # how much to simulate on the local fork:
+    # - "full": simulate every call and deployment locally (default).
+    # - "on_estimate_failure": only simulate when the node reports that
+    #   the call fails (to get a stack trace). otherwise results are
+    #   taken from the node's trace and receipt.
+    # - "trace_only": never simulate, failures are raised as RPC errors.
+    # calls are always simulated in pipeline mode, with gas profiling or
+    # coverage enabled, or if the node doesn't have debug_traceTransaction.
+    # after a transaction which wasn't simulated, the accounts to refetch
+    # are taken from the node's state diff (or the fork is reset, if the
+    # node can't produce one).
+    simulation: str = "full"
+
 
 @dataclass
 class ExternalAccount:
@@ -83,15 +242,68 @@ class ExternalAccount:
         return {"hash": txhash}
 
 
+# chain metadata (chain id, opcode support, tracer support) doesn't change
+# under a given RPC, cache it for this long. fees are cached per block.
+CHAIN_INFO_TTL = 3600
+FEE_TTL = 12
+
+# shared across NetworkEnv instances, and persisted so that repeated
+# scripts against the same chain can skip the warm-up round trips.
+_network_cache = TTLCache("~/.cache/titanoboa/network.json")
+
+
+def set_network_cache_file(path: Optional[str]):
+    """
+    Set the file used to persist chain metadata between runs. `None`
+    keeps the cache in memory only. Affects NetworkEnvs created afterwards.
+    """
+    global _network_cache
+    _network_cache = TTLCache(path)
+
+
+def _cache_key(rpc: RPC, *parts) -> str:
+    # hash the identifier, rpc urls can contain api keys
+    rpc_id = sha256(rpc.identifier.encode()).hexdigest()[:16]
+    return ":".join([rpc_id, *map(str, parts)])
+
+
+# whether chain metadata for this RPC can be persisted across runs. a
+# local dev node (anvil, hardhat) can be restarted with a different
+# chain under the same URL, and an RPC without a URL (e.g. a browser
+# wallet) can switch chains, so only remote nodes qualify.
+def _is_persistable(rpc: RPC) -> bool:
+    url = urlparse(rpc.identifier)
+    if url.scheme not in ("http", "https", "ws", "wss") or not url.hostname:
+        return False
+    host = url.hostname
+    try:
+        return ipaddress.ip_address(host).is_global
+    except ValueError:
+        # a host name
+        return host != "localhost" and not host.endswith(".localhost")
+
+
 class Capabilities:
     """
     Describes the capabilities of a chain (right now, EVM opcode support)
     """
 
-    def __init__(self, rpc):
+    def __init__(self, rpc, cache: Optional[TTLCache] = None):
         self._rpc = rpc
+        self._cache = cache
 
     def _get_capability(self, hex_bytecode):
+        if self._cache is None:
+            return self._probe(hex_bytecode)
+        key = _cache_key(self._rpc, "capability", hex_bytecode)
+        return self._cache.get_or_compute(
+            key,
+            CHAIN_INFO_TTL,
+            lambda: self._probe(hex_bytecode),
+            persist=_is_persistable(self._rpc),
+        )
+
+    def _probe(self, hex_bytecode):
         try:
             self._rpc.fetch("eth_call", [{"to": None, "data": hex_bytecode}])
             return True
@@ -179,16 +391,34 @@ class NetworkEnv(Env):
         self._gas_price = None
 
         self.tx_settings = TransactionSettings()
-        self.capabilities = Capabilities(rpc)
+        self._pipeline: Optional[_Pipeline] = None
+        self._view_batch: Optional[_ViewBatch] = None
+
+        self._executor_obj: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._cache = _network_cache
+        self.capabilities = Capabilities(rpc, self._cache)
         self._suppress_debug_tt = False
 
+    def _cached(self, name, fn, ttl=CHAIN_INFO_TTL, persist=True):
+        key = _cache_key(self._rpc, name)
+        persist = persist and _is_persistable(self._rpc)
+        return self._cache.get_or_compute(key, ttl, fn, persist=persist)
+
     @cached_property
     def _rpc_has_snapshot(self):
+        def probe():
+            try:
+                snapshot_id = self._rpc.fetch("evm_snapshot", [])
+                self._rpc.fetch("evm_revert", [snapshot_id])
+                return True
+            except RPCError:
+                return False
+
         try:
-            snapshot_id = self._rpc.fetch("evm_snapshot", [])
-            self._rpc.fetch("evm_revert", [snapshot_id])
-            return True
-        except (RPCError, HTTPError):
+            return self._cached("has_snapshot", probe)
+        except RequestException:
+            # could be transient, so it isn't cached
             return False
 
     # OVERRIDES
@@ -239,15 +469,26 @@ class NetworkEnv(Env):
             return self._gas_price
         return to_int(self._rpc.fetch("eth_gasPrice", []))
 
-    def get_eip1559_fee(self) -> tuple[str, str, str, str]:
-        # returns: base_fee, max_fee, max_priority_fee
+    def _fetch_eip1559_fee(self) -> list[str]:
         reqs = [
             ("eth_getBlockByNumber", ["latest", False]),
             ("eth_maxPriorityFeePerGas", []),
-            ("eth_chainId", []),
         ]
-        block_info, max_priority_fee, chain_id = self._rpc.fetch_multi(reqs)
-        base_fee = block_info["baseFeePerGas"]
+        block_info, max_priority_fee = self._rpc.fetch_multi(reqs)
+        return [block_info["baseFeePerGas"], max_priority_fee]
+
+    def get_eip1559_fee(self) -> tuple[str, str, str, str]:
+        # returns: base_fee, max_fee, max_priority_fee
+        # the fork is re-pinned after every transaction, so the pinned
+        # block number tells us when the fee data is stale.
+        block_number = self.evm.patch.block_number
+        base_fee, max_priority_fee = self._cached(
+            f"eip1559_fee:{block_number}",
+            self._fetch_eip1559_fee,
+            ttl=FEE_TTL,
+            persist=False,
+        )
+        chain_id = self._chain_id
 
         # Each block increases the base fee by 1/8 at most.
         # here we have the next block's base fee, compute a cap for the
@@ -260,7 +501,18 @@ class NetworkEnv(Env):
 
     def get_static_fee(self) -> tuple[str, str]:
         # non eip-1559 transaction
-        return tuple(self._rpc.fetch_multi([("eth_gasPrice", []), ("eth_chainId", [])]))
+        block_number = self.evm.patch.block_number
+        gas_price = self._cached(
+            f"gas_price:{block_number}",
+            lambda: self._rpc.fetch("eth_gasPrice", []),
+            ttl=FEE_TTL,
+            persist=False,
+        )
+        return gas_price, self._chain_id
+
+    @property
+    def _chain_id(self) -> str:
+        return self._cached("chain_id", lambda: self._rpc.fetch("eth_chainId", []))
 
     def _check_sender(self, address: Address):
         if address is None:
@@ -280,13 +532,31 @@ class NetworkEnv(Env):
         is_modifying=True,
         ir_executor=None,  # maybe just have **kwargs to collect extra kwargs
     ):
-        if is_modifying:
+        sender = self._check_sender(self._get_sender(sender))
+
+        hexdata = to_hex(data)
+
+        if not self._should_simulate(is_modifying):
+            return self._execute_code_on_node(
+                to_address, sender, gas, value, data, is_modifying, contract
+            )
+
+        prepared = None
+        if is_modifying and self._pipeline is None:
             # reset to latest block for code simulation
-            self._reset_fork()
+            self._repin_fork()
+            prepared = self._prepare_txn_async(
+                from_=sender, to=to_address, value=value, gas=gas, data=hexdata
+            )
+
+        if is_modifying and self._pipeline is not None:
+            self._sync_pipeline_nonce(sender)
+
+        if not is_modifying and self._defer_view_without_simulation():
+            args = self._eth_call_args(sender, to_address, gas, value, hexdata)
+            return self._view_batch.add(args, None)
 
         # call execute_code for tracing side effects
-        # note: we could get a perf improvement if we ran this in
-        # the background while waiting on RPC network calls
         computation = super().execute_code(
             to_address=to_address,
             sender=sender,
@@ -297,14 +567,31 @@ class NetworkEnv(Env):
             contract=contract,
         )
 
-        sender = self._check_sender(self._get_sender(sender))
+        if is_modifying and self._pipeline is not None:
+            # the node would most likely revert as well, don't send it
+            if computation.is_error:
+                return computation
 
-        hexdata = to_hex(data)
+            self._send_txn(
+                from_=sender,
+                to=to_address,
+                value=value,
+                gas=gas,
+                data=hexdata,
+                computation=computation,
+            )
+            # the local result is all we have for now
+            return computation
 
         if is_modifying:
             try:
                 txdata, receipt, trace = self._send_txn(
-                    from_=sender, to=to_address, value=value, gas=gas, data=hexdata
+                    from_=sender,
+                    to=to_address,
+                    value=value,
+                    gas=gas,
+                    data=hexdata,
+                    prepared=prepared,
                 )
             except _EstimateGasFailed:
                 # no need to actually run the txn.
@@ -327,16 +614,17 @@ class NetworkEnv(Env):
                         f"panic: local computation succeeded but node didnt: {trace}"
                     )
 
+        elif self._pipeline is not None:
+            # the node doesn't know about the transactions in flight, so
+            # the local result is the best we have.
+            return computation
+
+        elif self._view_batch is not None:
+            args = self._eth_call_args(sender, to_address, gas, value, hexdata)
+            return self._view_batch.add(args, computation)
+
         else:
-            args = fixup_dict(
-                {
-                    "from": sender,
-                    "to": to_address,
-                    "gas": gas,
-                    "value": value,
-                    "data": hexdata,
-                }
-            )
+            args = self._eth_call_args(sender, to_address, gas, value, hexdata)
             returnvalue = self._rpc.fetch("eth_call", [args, "latest"])
             output = to_bytes(returnvalue)
             # we don't need to do the check for computation.is_error
@@ -359,12 +647,162 @@ class NetworkEnv(Env):
 
         return computation
 
+    def _should_simulate(self, needs_trace):
+        policy = self.tx_settings.simulation
+        if policy not in ("full", "on_estimate_failure", "trace_only"):
+            raise ValueError(f"unknown simulation policy: {policy}")
+        if policy == "full" or self._pipeline is not None:
+            return True
+        # these need the local computation
+        if self._coverage_enabled or self.get_gas_meter_class() == ProfilingGasMeter:
+            return True
+        # without a trace, we don't know the return value
+        return needs_trace and self._tracer is None
+
+    # execute_code, but only on the node. the computation is built
+    # from the node's results.
+    def _execute_code_on_node(
+        self, to_address, sender, gas, value, data, is_modifying, contract
+    ):
+        hexdata = to_hex(data)
+
+        def _simulate_error(e):
+            # get the stack trace from a local simulation
+            if self.tx_settings.simulation == "trace_only":
+                raise e
+            computation = super(NetworkEnv, self).execute_code(
+                to_address=to_address,
+                sender=sender,
+                gas=gas,
+                value=value,
+                data=data,
+                is_modifying=is_modifying,
+                contract=contract,
+            )
+            if not computation.is_error:
+                # out of sync with the node
+                raise e
+            return computation
+
+        if not is_modifying:
+            args = self._eth_call_args(sender, to_address, gas, value, hexdata)
+            if self._view_batch is not None:
+                return self._view_batch.add(args, None)
+            try:
+                returnvalue = self._rpc.fetch("eth_call", [args, "latest"])
+            except RPCError as e:
+                return _simulate_error(e)
+            return _RemoteComputation(to_bytes(returnvalue))
+
+        self._repin_fork()
+        try:
+            _, receipt, trace = self._send_txn(
+                from_=sender,
+                to=to_address,
+                value=value,
+                gas=gas,
+                data=hexdata,
+                simulated=False,
+            )
+        except _EstimateGasFailed as e:
+            return _simulate_error(e.__cause__)
+
+        return _TraceComputation(receipt, trace)
+
+    def _eth_call_args(self, sender, to_address, gas, value, hexdata):
+        return fixup_dict(
+            {
+                "from": sender,
+                "to": to_address,
+                "gas": gas,
+                "value": value,
+                "data": hexdata,
+            }
+        )
+
+    @contextlib.contextmanager
+    def batch_views(self, simulate=False):
+        """
+        Context manager which collects view function calls, and sends
+        them to the node as a single JSON-RPC batch of `eth_call`s when
+        the context exits. Inside the context, view functions return a
+        `ViewFuture`, whose `.result()` is available after the context
+        exits. All calls in the batch are made against the same block.
+
+        :param simulate: Also run the calls against the local fork (for
+            tracing side effects). By default they only run on the node.
+        """
+        if self._view_batch is not None:
+            # nested, the outer context does the work
+            yield
+            return
+
+        self._view_batch = _ViewBatch(simulate)
+        try:
+            yield
+        finally:
+            batch, self._view_batch = self._view_batch, None
+            self._flush_view_batch(batch)
+
+    def _defer_view_without_simulation(self):
+        if self._view_batch is None or self._view_batch.simulate:
+            return False
+        # the node's answer is the best we have while pipelining, and
+        # gas profiling needs the local computation.
+        if self._pipeline is not None:
+            return False
+        return self.get_gas_meter_class() != ProfilingGasMeter
+
+    def _flush_view_batch(self, batch):
+        if len(batch.calls) == 0:
+            return
+
+        # pin a block so that all the calls see the same state
+        block_id = self._rpc.fetch("eth_blockNumber", [])
+        payloads = [("eth_call", [call.args, block_id]) for call in batch.calls]
+
+        try:
+            outputs = self._rpc.fetch_multi(payloads)
+            errors = [None] * len(outputs)
+        except RPCError:
+            # at least one of the calls failed. find out which, by
+            # sending them individually.
+            outputs, errors = [], []
+            for method, params in payloads:
+                try:
+                    outputs.append(self._rpc.fetch(method, params))
+                    errors.append(None)
+                except RPCError as e:
+                    outputs.append(None)
+                    errors.append(e)
+
+        for call, output, error in zip(batch.calls, outputs, errors):
+            if error is None:
+                call.resolve(_view_computation(call.computation, to_bytes(output)))
+            else:
+                call.fail(error)
+
     # OVERRIDES
     def deploy(
         self, sender=None, gas=None, value=0, bytecode=b"", contract=None, **kwargs
     ):
-        # reset to latest block for simulation
-        self._reset_fork()
+        if trim_dict(kwargs):
+            raise TypeError(f"invalid kwargs to execute_code: {kwargs}")
+        sender = self._check_sender(self._get_sender(sender))
+        hexbytecode = to_hex(bytecode)
+
+        if not self._should_simulate(needs_trace=False):
+            return self._deploy_on_node(sender, gas, value, bytecode, contract)
+
+        prepared = None
+        if self._pipeline is None:
+            # reset to latest block for simulation
+            self._repin_fork()
+            prepared = self._prepare_txn_async(
+                from_=sender, value=value, gas=gas, data=hexbytecode
+            )
+        else:
+            self._sync_pipeline_nonce(sender)
 
         # simulate the deployment
         local_address, computation = super().deploy(
@@ -373,17 +811,23 @@ class NetworkEnv(Env):
         if computation.is_error:
             return local_address, computation
 
-        if trim_dict(kwargs):
-            raise TypeError(f"invalid kwargs to execute_code: {kwargs}")
-        bytecode = to_hex(bytecode)
-        sender = self._check_sender(self._get_sender(sender))
-
         broadcast_ts = time.time()
 
         txdata, receipt, trace = self._send_txn(
-            from_=sender, value=value, gas=gas, data=bytecode
+            from_=sender,
+            value=value,
+            gas=gas,
+            data=hexbytecode,
+            computation=computation,
+            prepared=prepared,
         )
 
+        if receipt is None:
+            # pipelined, we check the address once the receipt is in.
+            deploy = _PendingDeploy(local_address, contract, sender, broadcast_ts)
+            self._pipeline.pending[-1].deploy = deploy
+            return local_address, computation
+
         create_address = Address(receipt["contractAddress"])
 
         if trace is not None and computation.output != trace.returndata_bytes:
@@ -401,6 +845,54 @@ class NetworkEnv(Env):
 
         print(f"contract deployed at {create_address}")
 
+        self._record_deployment(
+            contract, create_address, sender, broadcast_ts, txdata, receipt
+        )
+
+        return create_address, computation
+
+    # deploy, but only on the node. the computation is built from the
+    # node's results.
+    def _deploy_on_node(self, sender, gas, value, bytecode, contract):
+        self._repin_fork()
+        broadcast_ts = time.time()
+        try:
+            txdata, receipt, trace = self._send_txn(
+                from_=sender,
+                value=value,
+                gas=gas,
+                data=to_hex(bytecode),
+                simulated=False,
+            )
+        except _EstimateGasFailed as e:
+            if self.tx_settings.simulation == "trace_only":
+                raise e.__cause__
+            # get the stack trace from a local simulation
+            local_address, computation = super().deploy(
+                sender=sender,
+                gas=gas,
+                value=value,
+                bytecode=bytecode,
+                contract=contract,
+            )
+            if not computation.is_error:
+                # out of sync with the node
+                raise e.__cause__
+            return local_address, computation
+
+        create_address = Address(receipt["contractAddress"])
+        print(f"contract deployed at {create_address}")
+
+        self._record_deployment(
+            contract, create_address, sender, broadcast_ts, txdata, receipt
+        )
+
+        computation = _TraceComputation(receipt, trace, self._rpc, create_address)
+        return create_address, computation
+
+    def _record_deployment(
+        self, contract, create_address, sender, broadcast_ts, txdata, receipt
+    ):
         if (deployments_db := get_deployments_db()) is not None:
             contract_name = getattr(contract, "contract_name", None)
             if (filename := getattr(contract, "filename", None)) is not None:
@@ -434,20 +926,7 @@ class NetworkEnv(Env):
             )
             deployments_db.insert_deployment(deployment_data)
 
-        return create_address, computation
-
-    @cached_property
-    def _tracer(self):
-        def _warn_no_tracer():
-            warnings.warn(
-                "debug_traceTransaction not available! "
-                "titanoboa will try hard to interact with the network, but "
-                "this means that titanoboa is not able to do certain "
-                "safety checks at runtime. it is recommended to switch "
-                "to a node or provider with debug_traceTransaction.",
-                stacklevel=3,
-            )
-
+    def _probe_tracer(self):
         try:
             txn_hash = "0x" + "00" * 32
             # alchemy only can do callTracer, plus it has lowest
@@ -464,15 +943,28 @@ class NetworkEnv(Env):
             # note on error codes:
             # -32600 is alchemy unpaid tier error message
             # -32601 is infura error message (if i recall correctly)
-            _warn_no_tracer()
-            return None
-
-        except HTTPError:
-            _warn_no_tracer()
             return None
 
         return call_tracer
 
+    @cached_property
+    def _tracer(self):
+        try:
+            tracer = self._cached("tracer", self._probe_tracer)
+        except RequestException:
+            # could be transient, so it isn't cached
+            tracer = None
+        if tracer is None:
+            warnings.warn(
+                "debug_traceTransaction not available! "
+                "titanoboa will try hard to interact with the network, but "
+                "this means that titanoboa is not able to do certain "
+                "safety checks at runtime. it is recommended to switch "
+                "to a node or provider with debug_traceTransaction.",
+                stacklevel=2,
+            )
+        return tracer
+
     def suppress_debug_tt(self, new_value=True):
         self._suppress_debug_tt = new_value
 
@@ -510,26 +1002,107 @@ class NetworkEnv(Env):
             cache_file=None,
         )
 
-    def _send_txn(self, from_, to=None, gas=None, value=None, data=None):
-        tx_data = fixup_dict(
-            {"from": from_, "to": to, "gas": gas, "value": value, "data": data}
-        )
+    # cheaper version of _reset_fork which keeps the fork, but moves it
+    # to the new block and refetches state written since the last pin.
+    def _repin_fork(self, block_identifier="latest", touched_addresses=()):
+        if not self.tx_settings.incremental_repin:
+            return self._reset_fork(block_identifier)
 
+        touched = [Address(a).canonical_address for a in touched_addresses]
+        self.evm.repin_fork(block_identifier, touched)
+
+    def _repin_after_txn(self, tx_hash, receipt, simulated):
+        block_number = receipt["blockNumber"]
+        if not self.tx_settings.incremental_repin:
+            return self._reset_fork(block_number)
+
+        touched = _receipt_addresses(receipt)
+
+        if not simulated:
+            # nothing was written locally, and accounts changed by internal
+            # calls which didn't log aren't in the receipt. get them from
+            # the node's state diff, or re-fork if it can't give us one.
+            diff = self._state_diff(tx_hash)
+            if diff is None:
+                return self._reset_fork(block_number)
+            touched.update(diff.get("pre", {}), diff.get("post", {}))
+
+        self._repin_fork(block_number, touched)
+
+    def _state_diff(self, tx_hash):
+        if self._tracer is None:
+            return None
+        try:
+            return self._rpc.fetch_uncached(
+                "debug_traceTransaction", [tx_hash, _STATE_DIFF_TRACER]
+            )
+        except (HTTPError, RPCError):
+            return None
+
+    def _get_fee_fields(self):
         try:
             # eip-1559 txn
             (base_fee, max_priority_fee, max_fee, chain_id) = self.get_eip1559_fee()
-            tx_data["maxPriorityFeePerGas"] = max_priority_fee
-            tx_data["maxFeePerGas"] = max_fee
-            tx_data["chainId"] = chain_id
+            return {
+                "maxPriorityFeePerGas": max_priority_fee,
+                "maxFeePerGas": max_fee,
+                "chainId": chain_id,
+            }
         except (RPCError, KeyError) as e:
             warnings.warn(
                 "No EIP-1559 transaction available, falling back to legacy",
-                stacklevel=3,
+                stacklevel=4,
             )
-            warnings.warn(str(e), stacklevel=3)
+            warnings.warn(str(e), stacklevel=4)
             gas_price, chain_id = self.get_static_fee()
-            tx_data["gasPrice"] = gas_price
-            tx_data["chainId"] = chain_id
+            return {"gasPrice": gas_price, "chainId": chain_id}
+
+    def _send_txn(
+        self,
+        from_,
+        to=None,
+        gas=None,
+        value=None,
+        data=None,
+        computation=None,
+        prepared=None,
+        simulated=True,
+    ):
+        if self._pipeline is not None:
+            tx_data = fixup_dict(
+                {"from": from_, "to": to, "gas": gas, "value": value, "data": data}
+            )
+            return self._send_txn_pipelined(tx_data, computation)
+
+        if prepared is not None:
+            # raises _EstimateGasFailed if estimation failed
+            tx_data = prepared.result()
+        else:
+            tx_data = self._prepare_txn(from_, to, gas, value, data)
+
+        tx_hash = self._broadcast_txn(tx_data)
+
+        receipt = self._rpc.wait_for_tx_receipt(tx_hash, self.tx_settings.poll_timeout)
+        if receipt.get("status") != "0x1":
+            raise Exception(f"txn failed: {receipt}")
+
+        trace = self._debug_tt(tx_hash)
+
+        print(f"{tx_hash} mined in block {receipt['blockHash']}!")
+
+        # the block was mined, reset state
+        self._repin_after_txn(tx_hash, receipt, simulated)
+
+        t_obj = TraceObject(trace) if trace is not None else None
+        return tx_data, receipt, t_obj
+
+    # get fees, nonce and gas limit for a transaction from the node
+    def _prepare_txn(self, from_, to=None, gas=None, value=None, data=None):
+        tx_data = fixup_dict(
+            {"from": from_, "to": to, "gas": gas, "value": value, "data": data}
+        )
+
+        tx_data.update(self._get_fee_fields())
 
         tx_data["nonce"] = self._get_nonce(from_)
 
@@ -544,6 +1117,27 @@ class NetworkEnv(Env):
                     raise _EstimateGasFailed() from e
                 raise e from e
 
+        return tx_data
+
+    # run _prepare_txn in the background (so that it can overlap with
+    # the local simulation). returns a future, or None if disabled.
+    def _prepare_txn_async(self, **kwargs):
+        if not self.tx_settings.overlap_simulation:
+            return None
+        return self._executor.submit(self._prepare_txn, **kwargs)
+
+    @property
+    def _executor(self):
+        # threads don't survive os.fork(), make a new executor in the child
+        if self._executor_pid != os.getpid():
+            self._executor_obj = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="boa-network"
+            )
+            self._executor_pid = os.getpid()
+        return self._executor_obj
+
+    def _broadcast_txn(self, tx_data):
+        from_ = tx_data["from"]
         if from_ not in self._accounts:
             raise ValueError(f"Account not available: {from_}")
         account = self._accounts[from_]
@@ -562,25 +1156,145 @@ class NetworkEnv(Env):
 
         # TODO real logging
         print(f"tx broadcasted: {tx_hash}")
+        return tx_hash
 
-        receipt = self._rpc.wait_for_tx_receipt(tx_hash, self.tx_settings.poll_timeout)
-        if receipt.get("status") != "0x1":
-            raise Exception(f"txn failed: {receipt}")
+    @contextlib.contextmanager
+    def pipeline(self):
+        """
+        Context manager which broadcasts transactions without waiting
+        for them to be mined. Nonces are managed locally, fees are
+        estimated once, and gas is estimated from the local simulation.
+        Contract calls and deployments return the local result right
+        away; view functions are also answered from local state, since
+        the node does not know about the transactions in flight.
+
+        On exit, waits for all receipts (polling for them in batches),
+        records deployments and re-syncs the local fork. Transactions
+        are sent in order, so if one fails, the ones after it may have
+        been mined anyway; an exception is raised for the first failed
+        transaction.
+
+        If the block raises, the transactions already broadcast are still
+        waited for, but a failure while doing so is only warned about so
+        that it doesn't hide the original exception.
+        """
+        if self._pipeline is not None:
+            # nested, the outer context does the work
+            yield
+            return
 
-        trace = self._debug_tt(tx_hash)
+        pipeline = self._pipeline = _Pipeline()
+        try:
+            yield
+        except Exception:
+            self._pipeline = None
+            try:
+                self._flush_pipeline(pipeline)
+            except Exception as e:
+                warnings.warn(f"Failed to flush pipeline: {e}", stacklevel=3)
+            raise
+        finally:
+            # on KeyboardInterrupt and friends, don't wait for receipts
+            self._pipeline = None
+
+        self._flush_pipeline(pipeline)
+
+    # the first time we see a sender in a pipeline, pick up its pending
+    # nonce (which the local fork doesn't know about).
+    def _sync_pipeline_nonce(self, sender):
+        nonces = self._pipeline.nonces
+        if sender in nonces:
+            return
+        nonce = to_int(self._rpc.fetch("eth_getTransactionCount", [sender, "pending"]))
+        nonces[sender] = nonce
+        self.evm.vm.state.set_nonce(Address(sender).canonical_address, nonce)
+
+    def _send_txn_pipelined(self, tx_data, computation):
+        pipeline = self._pipeline
+        from_ = tx_data["from"]
+
+        if pipeline.fees is None:
+            pipeline.fees = self._get_fee_fields()
+        tx_data.update(pipeline.fees)
+
+        tx_data["nonce"] = to_hex(pipeline.nonces[from_])
+        pipeline.nonces[from_] += 1
+        if "to" in tx_data:
+            # the local simulation doesn't bump the nonce for calls
+            # (deploys already did in generate_create_address)
+            self.evm.vm.state.increment_nonce(Address(from_).canonical_address)
+
+        if "gas" not in tx_data:
+            tx_data["gas"] = to_hex(self._local_gas_estimate(tx_data, computation))
+
+        tx_hash = self._broadcast_txn(tx_data)
+        pipeline.pending.append(_PendingTxn(tx_hash, tx_data))
+
+        return tx_data, None, None
+
+    # eth_estimateGas runs against the node's state, which doesn't have
+    # the transactions in flight yet, so use the local simulation instead
+    def _local_gas_estimate(self, tx_data, computation):
+        if computation._gas_meter_class == NoGasMeter:
+            # no local gas usage to go by, have to ask the node
+            return to_int(self._rpc.fetch("eth_estimateGas", [tx_data, "pending"]))
+
+        data = to_bytes(tx_data.get("data", "0x"))
+        is_create = "to" not in tx_data
+
+        zeros = data.count(0)
+        intrinsic_gas = 21000 + 4 * zeros + 16 * (len(data) - zeros)
+        if is_create:
+            intrinsic_gas += 32000 + 2 * ceil(len(data) / 32)
+
+        gas_used = intrinsic_gas + computation.get_gas_used()
+        gas = ceil(gas_used * self.tx_settings.gas_estimate_margin)
+        return min(gas, self.evm.get_gas_limit())
+
+    def _flush_pipeline(self, pipeline):
+        if len(pipeline.pending) == 0:
+            return
+
+        tx_hashes = [p.tx_hash for p in pipeline.pending]
+        receipts = self._rpc.wait_for_tx_receipts(
+            tx_hashes, self.tx_settings.poll_timeout
+        )
 
-        print(f"{tx_hash} mined in block {receipt['blockHash']}!")
+        failed = None
+        touched = set()
+        for p, receipt in zip(pipeline.pending, receipts):
+            touched.update(_receipt_addresses(receipt))
+            print(f"{p.tx_hash} mined in block {receipt['blockHash']}!")
+
+            if receipt.get("status") != "0x1":
+                failed = failed or receipt
+                continue
+
+            if p.deploy is not None:
+                deploy = p.deploy
+                create_address = Address(receipt["contractAddress"])
+                if deploy.local_address != create_address:
+                    failed = failed or receipt
+                    continue
+                print(f"contract deployed at {create_address}")
+                self._record_deployment(
+                    deploy.contract,
+                    create_address,
+                    deploy.sender,
+                    deploy.broadcast_ts,
+                    p.tx_data,
+                    receipt,
+                )
 
-        # the block was mined, reset state
-        self._reset_fork(block_identifier=receipt["blockNumber"])
+        last_block = max(to_int(r["blockNumber"]) for r in receipts)
+        self._repin_fork(to_hex(last_block), touched)
 
-        t_obj = TraceObject(trace) if trace is not None else None
-        return tx_data, receipt, t_obj
+        if failed is not None:
+            raise Exception(f"txn failed: {failed}")
 
     def get_chain_id(self) -> int:
         """Get the current chain ID of the network as an integer."""
-        chain_id = self._rpc.fetch("eth_chainId", [])
-        return int(chain_id, 16)
+        return int(self._chain_id, 16)
 
     def set_balance(self, address, value):
         raise NotImplementedError("Cannot use set_balance in network mode")
@@ -0,0 +1,203 @@
+"""
+Run work in forked copies of the current process. Children share the
+parent state (the Env, deployed contracts, compiled code) copy-on-write.
+"""
+
+import os
+import pickle
+import signal
+import sys
+import threading
+import warnings
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+
+def _after_fork():
+    # file descriptors are shared with the parent process, fix up
+    # anything which holds on to them.
+    from boa.vm.fork import CachingRPC
+
+    CachingRPC._after_fork()
+
+
+def _dumps(msg: tuple[int, bool, Any]) -> bytes:
+    try:
+        return pickle.dumps(msg)
+    except Exception as e:
+        i, ok, value = msg
+        if ok:
+            err = RuntimeError(f"result could not be pickled ({e!r}): {value!r}")
+        else:
+            # e.g. an exception which holds on to a socket or a lock
+            err = RuntimeError(f"{type(value).__name__}: {value}")
+        return pickle.dumps((i, False, err))
+
+
+def _worker(fn, items, conn):
+    _after_fork()
+    while (i := conn.recv()) is not None:
+        try:
+            msg = (i, True, fn(items[i]))
+        except Exception as e:
+            msg = (i, False, e)
+        conn.send_bytes(_dumps(msg))
+
+
+def _background_threads() -> list[threading.Thread]:
+    # threads don't survive os.fork(). if one of them holds a lock (e.g.
+    # the NetworkEnv executor or the DiskCache gc thread), it is never
+    # released in the child.
+    current = threading.current_thread()
+    return [t for t in threading.enumerate() if t is not current and t.is_alive()]
+
+
+def _serial_map(
+    fn: Callable[[Any], Any], items: Sequence[Any]
+) -> Iterator[tuple[int, bool, Any]]:
+    """
+    Like `_fork_map` with a single worker, but in the current process.
+    The env is rolled back afterwards, so changes made by `fn` are not
+    visible to the caller either.
+    """
+    import boa
+
+    with boa.env.anchor():
+        for i, item in enumerate(items):
+            try:
+                msg = (i, True, fn(item))
+            except Exception as e:
+                msg = (i, False, e)
+            yield msg
+
+
+def _fork_map(
+    fn: Callable[[Any], Any], items: Sequence[Any], workers: int
+) -> Iterator[tuple[int, bool, Any]]:
+    """
+    Apply `fn` to each of `items` in `workers` forked processes. Yields
+    `(index, ok, value)` as results arrive, where `value` is the return
+    value of `fn`, or the exception it raised if `ok` is False.
+
+    Items are handed out one at a time as workers become free, so uneven
+    workloads are balanced between the workers.
+    """
+    workers = max(1, min(workers, len(items)))
+    pending = iter(range(len(items)))
+
+    # don't duplicate buffered output in the children
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    conns: dict[Connection, int] = {}
+    try:
+        for _ in range(workers):
+            parent_conn, child_conn = Pipe()
+            pid = os.fork()
+            if pid == 0:  # pragma: no cover (runs in the child)
+                status = 0
+                try:
+                    for conn in conns:
+                        conn.close()
+                    parent_conn.close()
+                    _worker(fn, items, child_conn)
+                except BaseException:
+                    status = 1
+                    # note: doesn't propagate, os._exit() below wins
+                    raise
+                finally:
+                    child_conn.close()
+                    os._exit(status)
+
+            child_conn.close()
+            conns[parent_conn] = pid
+            parent_conn.send(next(pending))
+
+        while len(conns) > 0:
+            # wait() returns the objects it was given
+            for conn in wait(list(conns)):  # type: ignore[assignment]
+                try:
+                    msg = pickle.loads(conn.recv_bytes())
+                except EOFError:
+                    pid = conns.pop(conn)
+                    conn.close()
+                    _, status = os.waitpid(pid, 0)
+                    if status != 0:
+                        raise RuntimeError(f"worker {pid} died (status {status})")
+                    continue
+
+                # hand out the next item (or tell the worker to exit)
+                # before yielding, so it isn't idle while we are.
+                conn.send(next(pending, None))
+                yield msg
+
+    finally:
+        # consumer stopped early, or a worker died
+        for conn, pid in conns.items():
+            conn.close()
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+
+
+def map(
+    fn: Callable[[Any], Any],
+    inputs: Iterable[Any],
+    workers: Optional[int] = None,
+    ordered: bool = True,
+) -> Iterator[Any]:
+    """
+    Apply `fn` to each of `inputs` in forked worker processes, and yield
+    the results as they are streamed back.
+
+    Each worker starts from a copy of the current process, so `fn` can
+    use the current env and any contracts deployed in it. Changes made
+    by `fn` are only visible inside its worker; they are not merged back
+    into the parent, and a worker runs several inputs one after another
+    in the same env.
+
+    :param fn: The function to apply. Its results (and errors) must be
+        picklable.
+    :param inputs: The inputs to `fn`
+    :param workers: The number of worker processes. Defaults to
+        `os.cpu_count()`.
+    :param ordered: If True, yield results in the order of `inputs`.
+        Otherwise, yield them in the order they complete.
+
+    Forking is only safe while the current process is single-threaded:
+    a lock held by another thread at the time of the fork stays locked
+    forever in the children. If other threads are running (e.g. the
+    `NetworkEnv` executor used by `overlap_simulation`), a warning is
+    emitted and `inputs` are processed one after another in the current
+    process instead, inside an `env.anchor()`.
+    """
+    inputs = list(inputs)
+    if len(inputs) == 0:
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if threads := _background_threads():
+        names = ", ".join(t.name for t in threads)
+        msg = f"other threads are running ({names}), not forking"
+        warnings.warn(msg, stacklevel=2)
+        results = _serial_map(fn, inputs)
+    else:
+        results = _fork_map(fn, inputs, workers)
+
+    # results which arrived ahead of their turn
+    buffered: dict[int, Any] = {}
+    next_ix = 0
+
+    for i, ok, value in results:
+        if not ok:
+            raise value
+
+        if not ordered:
+            yield value
+            continue
+
+        buffered[i] = value
+        while next_ix in buffered:
+            yield buffered.pop(next_ix)
+            next_ix += 1
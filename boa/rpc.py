@@ -1,8 +1,12 @@
+import random
+import threading
 import time
+from collections import defaultdict
 from typing import Any
 from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 
 try:
     import ujson as json
@@ -11,6 +15,50 @@ except ImportError:  # pragma: no cover
 
 TIMEOUT = 60  # default timeout for http requests in seconds
 
+# max number of pooled connections to the RPC host
+DEFAULT_POOL_SIZE = 32
+
+# most providers reject batches larger than this (alchemy, infura: 1000,
+# others as low as 100). can be overridden per RPC.
+DEFAULT_MAX_BATCH_SIZE = 100
+
+# methods which some providers can't handle in a batch (alchemy can't
+# batch debug_traceTransaction), always send these on their own.
+_UNBATCHABLE_PREFIXES = ("debug_", "trace_", "evm_", "anvil_", "hardhat_")
+
+# http statuses which mean we are being throttled or the node is
+# temporarily unavailable. these are safe to retry.
+_RETRYABLE_HTTP_STATUS = (429, 502, 503, 504)
+
+# json-rpc error codes providers use for rate limiting
+# -32005: "limit exceeded" (infura, alchemy, geth)
+# -32007: "request limit reached" (quicknode)
+# 429: "too many requests" (alchemy)
+_RETRYABLE_RPC_CODES = (-32005, -32007, 429)
+
+# http status some providers send when a batch is too large
+_PAYLOAD_TOO_LARGE = 413
+
+# json-rpc errors which providers send for the whole batch when it is too
+# large, as (code, lowercase message fragment):
+# -32600 "batch too large" (geth, erigon, reth)
+# -32600 "batch size limit exceeded" (alchemy, nethermind)
+# -32600 "batch size too large" (infura)
+# -32000 "batch limit exceeded" (older erigon)
+_BATCH_TOO_LARGE_ERRORS = (
+    (-32600, "batch too large"),
+    (-32600, "batch size"),
+    (-32000, "batch limit"),
+)
+
+# methods which must not be resent if we don't know whether the node got
+# them (e.g. the connection dropped): resending a transaction which went
+# through fails with "already known" or a nonce error.
+_NON_IDEMPOTENT_METHODS = ("eth_sendRawTransaction", "eth_sendTransaction")
+
+# http statuses which don't tell us whether the request was processed
+_AMBIGUOUS_HTTP_STATUS = (502, 504)
+
 
 # some utility functions
 
@@ -56,6 +104,147 @@ class RPCError(Exception):
         return cls(message=data["message"], code=data["code"])
 
 
+class RetrySettings:
+    """
+    Retry policy for transient RPC errors (rate limiting, node hiccups).
+    Retries use "full jitter" exponential backoff: the n-th retry sleeps a
+    random amount between 0 and min(max_backoff, base_backoff * 2**n).
+    """
+
+    def __init__(self, max_retries=8, base_backoff=0.25, max_backoff=30.0):
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+    def backoff(self, attempt: int) -> float:
+        cap = min(self.max_backoff, self.base_backoff * 2**attempt)
+        return random.uniform(0, cap)
+
+
+# latency histogram bucket upper bounds, in seconds
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class MethodStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total_latency = 0.0
+        # one counter per bucket, plus one for "more than the last bucket"
+        self.latency_histogram = [0] * (len(_LATENCY_BUCKETS) + 1)
+
+    def record_latency(self, latency: float):
+        self.total_latency += latency
+        for i, bound in enumerate(_LATENCY_BUCKETS):
+            if latency <= bound:
+                self.latency_histogram[i] += 1
+                return
+        self.latency_histogram[-1] += 1
+
+    @property
+    def mean_latency(self) -> float:
+        if self.calls == 0:
+            return 0.0
+        return self.total_latency / self.calls
+
+    def __repr__(self):
+        return (
+            f"<calls={self.calls} errors={self.errors} retries={self.retries} "
+            f"mean_latency={self.mean_latency * 1000:.1f}ms "
+            f"sent={self.bytes_sent}B received={self.bytes_received}B>"
+        )
+
+
+class RPCMetrics:
+    """
+    Per-method request metrics for an RPC. Requests which were part of a
+    batch are each counted under their own method, with the latency of
+    the whole batch and an even share of its bytes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.methods: dict[str, MethodStats] = defaultdict(MethodStats)
+        self.batches = 0
+        self.throttled = 0
+
+    def record(self, methods, latency, bytes_sent, bytes_received):
+        n = len(methods)
+        with self._lock:
+            if n > 1:
+                self.batches += 1
+            for method in methods:
+                stats = self.methods[method]
+                stats.calls += 1
+                stats.record_latency(latency)
+                stats.bytes_sent += bytes_sent // n
+                stats.bytes_received += bytes_received // n
+
+    def record_retry(self, methods):
+        with self._lock:
+            for method in methods:
+                self.methods[method].retries += 1
+
+    def record_error(self, methods):
+        with self._lock:
+            for method in methods:
+                self.methods[method].errors += 1
+
+    def record_throttle(self):
+        with self._lock:
+            self.throttled += 1
+
+    def __repr__(self):
+        lines = [f"{k}: {v}" for k, v in sorted(self.methods.items())]
+        lines.append(f"(batches={self.batches}, throttled={self.throttled})")
+        return "\n".join(lines)
+
+
+class _AdaptiveLimiter:
+    """
+    Limit on the number of in-flight requests which learns the provider's
+    limits: additive increase on success, multiplicative decrease when
+    we get throttled (AIMD, like TCP congestion control).
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def __exit__(self, *args):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify()
+
+    def on_throttle(self):
+        with self._cond:
+            self.limit = max(1.0, self.limit / 2)
+
+
+def _is_batch_too_large(err: RPCError) -> bool:
+    message = str(err).lower()
+    return any(
+        err.code == code and fragment in message
+        for (code, fragment) in _BATCH_TOO_LARGE_ERRORS
+    )
+
+
 class RPC:
     """
     Base class for RPC implementations.
@@ -92,14 +281,170 @@ class RPC:
                 raise ValueError(f"Timed out waiting for ({tx_hash})")
             time.sleep(poll_latency)
 
+    # wait for several transactions at once, polling for the outstanding
+    # receipts in a single batch. returns the receipts in order.
+    def wait_for_tx_receipts(self, tx_hashes, timeout: float, poll_latency=0.25):
+        start = time.time()
+        receipts: dict[str, Any] = {}
+
+        while True:
+            pending = [h for h in tx_hashes if h not in receipts]
+            if len(pending) == 0:
+                return [receipts[h] for h in tx_hashes]
+
+            payloads = [("eth_getTransactionReceipt", [h]) for h in pending]
+            for tx_hash, receipt in zip(pending, self.fetch_multi(payloads)):
+                if receipt is not None:
+                    receipts[tx_hash] = receipt
+
+            if len(receipts) == len(tx_hashes):
+                continue
+            if time.time() + poll_latency > start + timeout:
+                pending = [h for h in tx_hashes if h not in receipts]
+                raise ValueError(f"Timed out waiting for ({', '.join(pending)})")
+            time.sleep(poll_latency)
+
+
+class _PendingRequest:
+    __slots__ = ("method", "params", "result", "error", "done")
+
+    def __init__(self, method, params):
+        self.method = method
+        self.params = params
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class _BatchCoalescer:
+    """
+    Coalesces concurrent `fetch()` calls from multiple threads into
+    JSON-RPC batches. The first caller to arrive becomes the "leader":
+    it waits `window` seconds for other callers to pile up, and then
+    sends everything which has accumulated in batches of at most
+    `max_batch_size`. There is no background thread, so this is
+    safe to use across `os.fork()`.
+    """
+
+    def __init__(self, rpc: "EthereumRPC", window: float):
+        self._rpc = rpc
+        self._window = window
+        self._lock = threading.Lock()
+        self._pending: list[_PendingRequest] = []
+        self._has_leader = False
+
+    def submit(self, method, params):
+        req = _PendingRequest(method, params)
+        with self._lock:
+            self._pending.append(req)
+            is_leader = not self._has_leader
+            self._has_leader = True
+
+        if is_leader:
+            time.sleep(self._window)
+            self._drain()
+
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                n = self._rpc.max_batch_size
+                batch, self._pending = self._pending[:n], self._pending[n:]
+                if len(batch) == 0:
+                    self._has_leader = False
+                    return
+
+            try:
+                if len(batch) == 1:
+                    (req,) = batch
+                    results = [self._rpc._fetch_single(req.method, req.params)]
+                    errors = {}
+                else:
+                    payloads = [(req.method, req.params) for req in batch]
+                    results, errors = self._rpc._fetch_batch_results(payloads)
+                # requests which failed on their own only fail their caller
+                for i, (req, result) in enumerate(zip(batch, results)):
+                    req.result = result
+                    req.error = errors.get(i)
+            except Exception as e:
+                # the batch as a whole failed
+                for req in batch:
+                    req.error = e
+            finally:
+                for req in batch:
+                    req.done.set()
+
 
 class EthereumRPC(RPC):
-    def __init__(self, url: str):
+    """
+    An RPC which talks JSON-RPC to a node over http(s).
+
+    :param url: the node url
+    :param pool_size: max number of pooled connections to the node
+    :param max_batch_size: max number of requests in a single JSON-RPC
+        batch. larger `fetch_multi()` calls are split up.
+    :param batch_window: if set, concurrent `fetch()` calls from multiple
+        threads are coalesced into a single batch if they arrive within
+        `batch_window` seconds of each other.
+    :param http2: use an HTTP/2 connection (requires `httpx[http2]`)
+    :param retry_settings: retry policy for rate limiting / transient errors
+
+    Request metrics are available on `rpc.metrics`. If the provider
+    rejects a batch for being too large, it is split up and
+    `max_batch_size` is halved for future requests. It grows back by one
+    after each successful full batch, up to just below the smallest
+    batch size which was rejected.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        batch_window: float | None = None,
+        http2: bool = False,
+        retry_settings: RetrySettings | None = None,
+    ):
         self._rpc_url = url
-        self._session = requests.Session()
+        self.max_batch_size = max_batch_size
+        # largest batch size which wasn't rejected for being too large
+        self._batch_size_ceiling = max_batch_size
+        self.retry_settings = retry_settings or RetrySettings()
+        self.metrics = RPCMetrics()
+        self._limiter = _AdaptiveLimiter(pool_size)
+
+        self._transient_errors: tuple = (requests.ConnectionError, requests.Timeout)
 
         # declare app name to frame.sh
-        self._session.headers["Origin"] = "Titanoboa"
+        headers = {"Origin": "Titanoboa", "Content-Type": "application/json"}
+
+        if http2:
+            try:
+                import httpx
+            except ImportError as e:  # pragma: no cover
+                msg = "http2=True requires httpx! (`pip install httpx[http2]`)"
+                raise ImportError(msg) from e
+            limits = httpx.Limits(max_connections=pool_size)
+            self._session = httpx.Client(
+                http2=True, limits=limits, headers=headers, timeout=TIMEOUT
+            )
+            self._transient_errors += (httpx.TransportError,)
+            self._post_body_kwarg = "content"
+        else:
+            self._session = requests.Session()
+            self._session.headers.update(headers)
+            self._post_body_kwarg = "data"
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+
+        self._coalescer = None
+        if batch_window is not None:
+            self._coalescer = _BatchCoalescer(self, batch_window)
 
     @property
     def identifier(self):
@@ -116,32 +461,245 @@ class EthereumRPC(RPC):
             return f"{partial_ret} (URL partially masked for privacy)"
         return self._rpc_url
 
+    def _post(self, request, methods):
+        body = json.dumps(request).encode("utf-8")
+        kwargs = {self._post_body_kwarg: body, "timeout": TIMEOUT}
+
+        attempt = 0
+        while True:
+            with self._limiter:
+                t0 = time.perf_counter()
+                try:
+                    response = self._session.post(self._rpc_url, **kwargs)
+                    status = response.status_code
+                except self._transient_errors as e:
+                    response, status = None, None
+                    err = e
+                latency = time.perf_counter() - t0
+
+            if response is not None:
+                nbytes = len(response.content)
+                self.metrics.record(methods, latency, len(body), nbytes)
+
+            if status is not None and status not in _RETRYABLE_HTTP_STATUS:
+                break
+
+            if status is not None:
+                msg = f"{status} Error from {self.name}"
+                err = requests.HTTPError(msg, response=response)
+
+            ambiguous = status is None or status in _AMBIGUOUS_HTTP_STATUS
+            if ambiguous and any(m in _NON_IDEMPOTENT_METHODS for m in methods):
+                # the node may have processed the request, don't resend it
+                self.metrics.record_error(methods)
+                raise err
+
+            if status in (429, None):
+                # rate limited, or the connection was dropped (some
+                # providers just close the connection when throttling)
+                self._on_throttle()
+
+            delay = self._retry_delay(attempt, methods, response)
+            if delay is None:
+                self.metrics.record_error(methods)
+                raise err
+            time.sleep(delay)
+            attempt += 1
+
+        if status >= 400:
+            self.metrics.record_error(methods)
+            # raise the same exception type for both requests and httpx.
+            # (also, don't leak the full url into the error message)
+            msg = f"{status} Error from {self.name}"
+            raise requests.HTTPError(msg, response=response)
+
+        self._limiter.on_success()
+        return json.loads(response.text)
+
+    def _on_throttle(self):
+        self._limiter.on_throttle()
+        self.metrics.record_throttle()
+
+    # compute how long to sleep before the next retry, or None if
+    # we are out of retries.
+    def _retry_delay(self, attempt, methods, response=None):
+        if attempt >= self.retry_settings.max_retries:
+            return None
+        self.metrics.record_retry(methods)
+
+        delay = self.retry_settings.backoff(attempt)
+        # respect the server's Retry-After (in seconds) if it is sent
+        # (note a Response with an error status is falsy)
+        retry_after = None
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+        return delay
+
     def fetch(self, method, params):
         # the obvious thing to do here is dispatch into fetch_multi.
         # but some providers (alchemy) can't handle batched requests
         # for certain endpoints (debug_traceTransaction).
+        if self._coalescer is not None and not method.startswith(_UNBATCHABLE_PREFIXES):
+            return self._coalescer.submit(method, params)
+        return self._fetch_single(method, params)
+
+    def _fetch_single(self, method, params):
         req = {"jsonrpc": "2.0", "method": method, "params": params, "id": 0}
-        # print(req)
-        res = self._session.post(self._rpc_url, json=req, timeout=TIMEOUT)
-        res.raise_for_status()
-        res = json.loads(res.text)
-        # print(res)
-        if "error" in res:
-            raise RPCError.from_json(res["error"])
-        return res["result"]
+        attempt = 0
+        while True:
+            res = self._post(req, [method])
+            if "error" not in res:
+                return res["result"]
+
+            err = RPCError.from_json(res["error"])
+            if err.code not in _RETRYABLE_RPC_CODES:
+                self.metrics.record_error([method])
+                raise err
+
+            self._on_throttle()
+            if (delay := self._retry_delay(attempt, [method])) is None:
+                self.metrics.record_error([method])
+                raise err
+            time.sleep(delay)
+            attempt += 1
 
     def fetch_multi(self, payloads):
-        request = [
-            {"jsonrpc": "2.0", "method": method, "params": params, "id": i}
-            for i, (method, params) in enumerate(payloads)
-        ]
-        response = self._session.post(self._rpc_url, json=request, timeout=TIMEOUT)
-        response.raise_for_status()
-
+        results, errors = self._fetch_multi_results(payloads)
+        if len(errors) > 0:
+            raise errors[min(errors)]
+        return results
+
+    def _fetch_multi_results(self, payloads):
+        results = []
+        errors = {}
+        # respect the provider batch size limit
+        n = self.max_batch_size
+        for i in range(0, len(payloads), n):
+            chunk = payloads[i : i + n]
+            chunk_results, chunk_errors = self._fetch_batch_results(chunk)
+            results.extend(chunk_results)
+            errors.update({i + j: err for (j, err) in chunk_errors.items()})
+        return results, errors
+
+    def _fetch_batch(self, payloads):
+        results, errors = self._fetch_batch_results(payloads)
+        if len(errors) > 0:
+            raise errors[min(errors)]
+        return results
+
+    def _fetch_batch_results(self, payloads):
+        """
+        Fetch a batch of requests. Returns the results (None for failed
+        requests) and a dict of request index => error for the requests
+        which failed, so one failing request doesn't fail the others.
+        Errors which affect the whole batch are raised, as is a KeyError
+        if the node left out the response to a request.
+        """
+        if len(payloads) > self.max_batch_size:
+            # max_batch_size went down since the caller split the payloads
+            return self._fetch_multi_results(payloads)
+
+        methods = [method for (method, _) in payloads]
+
+        # ids of the requests which still need a result
+        pending = list(range(len(payloads)))
         results = {}  # keep results in a dict to preserve order
-        for item in json.loads(response.text):
-            if "error" in item:
-                raise RPCError.from_json(item["error"])
-            results[item["id"]] = item["result"]
-
-        return [results[i] for i in range(len(payloads))]
+        errors = {}
+
+        attempt = 0
+        while len(pending) > 0:
+            request = [
+                {
+                    "jsonrpc": "2.0",
+                    "method": payloads[i][0],
+                    "params": payloads[i][1],
+                    "id": i,
+                }
+                for i in pending
+            ]
+            try:
+                response = self._post(request, [methods[i] for i in pending])
+            except requests.HTTPError as e:
+                too_large = e.response is not None and (
+                    e.response.status_code == _PAYLOAD_TOO_LARGE
+                )
+                if not too_large or len(pending) == 1:
+                    raise
+                response = None
+
+            if response is not None and not isinstance(response, list):
+                # the whole batch was rejected
+                err = RPCError.from_json(response["error"])
+                if err.code in _RETRYABLE_RPC_CODES:
+                    # throttled, the batch size is not the problem
+                    pending_methods = [methods[i] for i in pending]
+                    self._on_throttle()
+                    if (delay := self._retry_delay(attempt, pending_methods)) is None:
+                        self.metrics.record_error(pending_methods)
+                        raise err
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                if len(pending) == 1 or not _is_batch_too_large(err):
+                    self.metrics.record_error([methods[i] for i in pending])
+                    raise err
+
+            if not isinstance(response, list):
+                # the batch is too large. split it and learn the new limit.
+                self._on_batch_too_large(len(pending))
+                split_results, split_errors = self._split_fetch(payloads, pending)
+                results.update(split_results)
+                errors.update(split_errors)
+                break
+
+            if len(pending) >= self.max_batch_size:
+                self._on_batch_success()
+
+            retry = {}
+            for item in response:
+                if "error" in item:
+                    err = RPCError.from_json(item["error"])
+                    if err.code not in _RETRYABLE_RPC_CODES:
+                        self.metrics.record_error([methods[item["id"]]])
+                        errors[item["id"]] = err
+                        continue
+                    retry[item["id"]] = err
+                    continue
+                results[item["id"]] = item["result"]
+
+            pending = list(retry)
+            if len(pending) > 0:
+                # retry only the items which got throttled
+                self._on_throttle()
+                delay = self._retry_delay(attempt, [methods[i] for i in pending])
+                if delay is None:
+                    errors.update(retry)
+                    break
+                time.sleep(delay)
+                attempt += 1
+
+        ret = [None if i in errors else results[i] for i in range(len(payloads))]
+        return ret, errors
+
+    def _on_batch_too_large(self, batch_size):
+        self._batch_size_ceiling = min(self._batch_size_ceiling, batch_size - 1)
+        self.max_batch_size = max(1, min(self.max_batch_size, batch_size // 2))
+
+    def _on_batch_success(self):
+        # additive increase, so a limit which was learned while the
+        # provider was struggling can recover
+        self.max_batch_size = min(self._batch_size_ceiling, self.max_batch_size + 1)
+
+    def _split_fetch(self, payloads, ids):
+        results = {}
+        errors = {}
+        mid = len(ids) // 2
+        for half in (ids[:mid], ids[mid:]):
+            half_results, half_errors = self._fetch_batch_results(
+                [payloads[i] for i in half]
+            )
+            results.update(zip(half, half_results))
+            errors.update({half[j]: err for (j, err) in half_errors.items()})
+        return results, errors
@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+
+from boa.util.abi import Address
+
+if TYPE_CHECKING:
+    from boa.environment import Env
+
+
+class StateDiff:
+    """
+    The changes made to the state inside an `Env.state_diff()` block.
+    Values are `(before, after)` tuples, and only accounts and slots which
+    actually changed are included.
+
+    Accounts and slots are recorded by the tracers as they are first
+    touched, so the cost is proportional to what was touched rather than
+    to the size of the state.
+    """
+
+    def __init__(self, env: "Env"):
+        self.env = env
+
+        self.balances: dict[Address, tuple[int, int]] = {}
+        self.nonces: dict[Address, tuple[int, int]] = {}
+        self.code: dict[Address, tuple[bytes, bytes]] = {}
+        self.storage: dict[Address, dict[int, tuple[int, int]]] = {}
+
+        # values at first touch
+        self._accounts: dict[bytes, tuple[int, int, bytes]] = {}
+        self._slots: dict[bytes, dict[int, int]] = {}
+
+        # decoded storage, once the env is gone (after unpickling)
+        self._decoded: Optional[dict[Address, dict[Any, tuple[int, int]]]] = None
+
+    def __getstate__(self):
+        # the env can't be sent to another process; decode with it
+        # while we still can.
+        state = self.__dict__.copy()
+        state["_decoded"] = self.decoded_storage()
+        state["env"] = None
+        state["_accounts"] = {}
+        state["_slots"] = {}
+        return state
+
+    @property
+    def _state(self):
+        return self.env.evm.vm.state
+
+    def _record_account(self, account: bytes) -> None:
+        if account in self._accounts:
+            return
+        state = self._state
+        self._accounts[account] = (
+            state.get_balance(account),
+            state.get_nonce(account),
+            state.get_code(account),
+        )
+
+    def _record_slot(self, account: bytes, slot: int) -> None:
+        slots = self._slots.setdefault(account, {})
+        if slot not in slots:
+            slots[slot] = self._state.get_storage(account, slot)
+
+    def _finalize(self) -> None:
+        state = self._state
+        for account, (balance, nonce, code) in self._accounts.items():
+            address = Address(account)
+            if (new_balance := state.get_balance(account)) != balance:
+                self.balances[address] = (balance, new_balance)
+            if (new_nonce := state.get_nonce(account)) != nonce:
+                self.nonces[address] = (nonce, new_nonce)
+            if (new_code := state.get_code(account)) != code:
+                self.code[address] = (code, new_code)
+
+        for account, slots in self._slots.items():
+            changed = {}
+            for slot, value in slots.items():
+                if (new_value := state.get_storage(account, slot)) != value:
+                    changed[slot] = (value, new_value)
+            if len(changed) > 0:
+                self.storage[Address(account)] = changed
+
+    @property
+    def accounts(self) -> set[Address]:
+        """
+        All accounts with any changes.
+        """
+        return set().union(self.balances, self.nonces, self.code, self.storage)
+
+    def decoded_storage(self) -> dict[Address, dict[Any, tuple[int, int]]]:
+        """
+        The storage changes, with slots replaced by variable names (e.g.
+        `balances[0x1234...]`) for contracts whose storage layout is known.
+        Slots which can't be resolved to a variable are left as is.
+        """
+        if self.env is None:
+            assert self._decoded is not None
+            return self._decoded
+
+        ret: dict[Address, dict[Any, tuple[int, int]]] = {}
+        for address, slots in self.storage.items():
+            contract = self.env.lookup_contract(address)
+            get_label = getattr(contract, "_storage_slot_label", None)
+
+            ret[address] = {}
+            for slot, values in slots.items():
+                label = get_label(slot) if get_label is not None else None
+                ret[address][label or slot] = values
+        return ret
+
+    def __repr__(self):
+        lines = []
+        decoded_storage = self.decoded_storage()
+        for address in sorted(self.accounts):
+            lines.append(f"{address}:")
+            if address in self.balances:
+                before, after = self.balances[address]
+                lines.append(f"  balance: {before} -> {after}")
+            if address in self.nonces:
+                before, after = self.nonces[address]
+                lines.append(f"  nonce: {before} -> {after}")
+            if address in self.code:
+                before, after = self.code[address]
+                lines.append(f"  code: {len(before)} bytes -> {len(after)} bytes")
+            storage = decoded_storage.get(address, {})
+            for k, (before, after) in storage.items():
+                k = hex(k) if isinstance(k, int) else k
+                lines.append(f"  {k}: {before} -> {after}")
+
+        if len(lines) == 0:
+            return "<StateDiff: no changes>"
+        return "\n".join(["<StateDiff:", *lines, ">"])
+
+
+@dataclass
+class Exploration:
+    """
+    The outcome of one candidate in `Env.explore()`.
+    """
+
+    result: Any
+    error: Optional[Exception]
+    diff: StateDiff
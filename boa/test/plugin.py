@@ -1,10 +1,15 @@
 import contextlib
+import fnmatch
+import os
+import re
+from pathlib import Path
 from typing import Generator
 
 import hypothesis
 import pytest
 
 import boa
+from boa.interpret import get_cache_stats, precompile_many
 from boa.profiling import get_call_profile_table, get_line_profile_table, global_profile
 from boa.vm.gas_meters import ProfilingGasMeter
 
@@ -34,6 +39,20 @@ def pytest_addoption(parser):
         action="store_true",
         help="Profile gas used by contracts called in tests",
     )
+    parser.addoption(
+        "--cache-stats",
+        action="store_true",
+        help="Report compiler cache statistics at the end of the session",
+    )
+    parser.addoption(
+        "--precompile",
+        nargs="?",
+        const="**/*.vy",
+        default=None,
+        metavar="GLOB",
+        help="Compile the contracts matching GLOB (relative to the rootdir, "
+        "default: all .vy files) in parallel before running the tests",
+    )
 
 
 def pytest_configure(config):
@@ -42,6 +61,49 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "gas_profile: report on gas")
 
 
+def pytest_sessionstart(session):
+    pattern = session.config.getoption("precompile")
+    # with xdist, only precompile in the controller
+    if pattern is None or hasattr(session.config, "workerinput"):
+        return
+
+    config = session.config
+    filenames = _find_contracts(
+        config.rootpath, pattern, config.getini("norecursedirs")
+    )
+    # errors are reported when the tests load the contracts
+    precompile_many(filenames)
+
+
+# the files under `rootpath` matching the glob `pattern`. like pytest's
+# own collection, doesn't descend into `norecursedirs` (by default .git,
+# node_modules, build, venv and the like) or virtualenvs.
+def _find_contracts(rootpath: Path, pattern: str, norecursedirs) -> list[str]:
+    regex = re.compile(_glob_to_regex(pattern))
+
+    ret = []
+    for dirpath, dirnames, files in os.walk(rootpath):
+        dirnames[:] = [
+            d
+            for d in dirnames
+            if not any(fnmatch.fnmatch(d, p) for p in norecursedirs)
+            and not os.path.exists(os.path.join(dirpath, d, "pyvenv.cfg"))
+        ]
+        for f in files:
+            path = Path(dirpath, f)
+            if regex.fullmatch(path.relative_to(rootpath).as_posix()):
+                ret.append(str(path))
+    return sorted(ret)
+
+
+def _glob_to_regex(pattern: str) -> str:
+    # `**/` matches any number of directories, `*` and `?` stay
+    # within a path component
+    tokens = re.split(r"(\*\*/|\*\*|\*|\?)", pattern)
+    special = {"**/": "(?:.*/)?", "**": ".*", "*": "[^/]*", "?": "[^/]"}
+    return "".join(special.get(t, re.escape(t)) for t in tokens)
+
+
 def pytest_collection_modifyitems(config, items):
     if config.getoption("gas_profile"):
         for item in items:
@@ -116,3 +178,11 @@ def pytest_sessionfinish(session, exitstatus):
         console = Console(file=sys.stdout)
         console.print(get_call_profile_table())
         console.print(get_line_profile_table())
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if not config.getoption("cache_stats"):
+        return
+    stats = get_cache_stats()
+    if stats is not None:
+        terminalreporter.write_line(f"titanoboa compiler cache: {stats}")
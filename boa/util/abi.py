@@ -10,18 +10,23 @@ from eth.codecs.abi.parser import Parser
 from eth_typing import Address as PYEVM_Address
 from eth_utils import to_canonical_address, to_checksum_address
 
-from boa.util.lrudict import lrudict
+from boa.util.lrudict import interndict
 
 _parsers: dict[str, ABITypeNode] = {}
 
+# addresses interned per generation, see `interndict`
+MAX_INTERNED_ADDRESSES = 2**15
+
 
 # inherit from `str` so that users can compare with regular hex string
 # addresses
 class Address(str):
     # converting between checksum and canonical addresses is a hotspot;
-    # this class contains both and caches recently seen conversions
+    # this class contains both. addresses are interned by their canonical
+    # address, and by the other representations they were created from,
+    # so each address is only checksummed once while it is in use.
     __slots__ = ("canonical_address",)
-    _cache = lrudict(1024)
+    _table = interndict(MAX_INTERNED_ADDRESSES)
 
     canonical_address: Annotated[PYEVM_Address, "canonical address"]
 
@@ -29,15 +34,17 @@ class Address(str):
         if isinstance(address, Address):
             return address
 
-        try:
-            return cls._cache[address]
-        except KeyError:
-            pass
+        if (self := cls._table.get(address)) is not None:
+            return self
+
+        canonical_address = to_canonical_address(address)
+        if (self := cls._table.get(canonical_address)) is None:
+            self = super().__new__(cls, to_checksum_address(canonical_address))
+            self.canonical_address = canonical_address
+            cls._table[canonical_address] = self
 
-        checksum_address = to_checksum_address(address)
-        self = super().__new__(cls, checksum_address)
-        self.canonical_address = to_canonical_address(address)
-        cls._cache[address] = self
+        if address != canonical_address:
+            cls._table[address] = self
         return self
 
     def __repr__(self):
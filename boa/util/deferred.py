@@ -0,0 +1,50 @@
+# results of calls which are answered later, e.g. view calls made inside
+# NetworkEnv.batch_views(). kept out of boa.network so that contracts can
+# check for them without depending on the network code.
+
+
+class ViewFuture:
+    """
+    The result of a view function called inside `NetworkEnv.batch_views()`.
+    The result is available once the context exits.
+    """
+
+    def __init__(self, call, decode):
+        self._call = call
+        self._decode = decode
+
+    def done(self) -> bool:
+        return self._call.done
+
+    def result(self):
+        call = self._call
+        if not call.done:
+            raise RuntimeError("result not available until batch_views() exits")
+        if call.error is not None:
+            raise call.error
+        return self._decode(call.computation)
+
+
+class DeferredCall:
+    """
+    Returned by `Env.execute_code` in place of a computation, for calls
+    whose result is not available yet.
+    """
+
+    def __init__(self, args, computation):
+        self.args = args
+        self.computation = computation
+        self.done = False
+        self.error = None
+
+    def future(self, decode) -> ViewFuture:
+        # decode is called with the computation once the result is in
+        return ViewFuture(self, decode)
+
+    def resolve(self, computation):
+        self.computation = computation
+        self.done = True
+
+    def fail(self, error):
+        self.error = error
+        self.done = True
@@ -6,6 +6,8 @@ import threading
 import time
 from pathlib import Path
 
+from boa.util.lrudict import lrudict
+
 _ONE_WEEK = 7 * 24 * 3600
 
 
@@ -20,14 +22,46 @@ def _silence_io_errors():
         pass
 
 
+class CacheStats:
+    def __init__(self):
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        # time spent reading and unpickling items from disk
+        self.load_time = 0.0
+        # time spent computing items which were not in the cache
+        self.compute_time = 0.0
+
+    @property
+    def lookups(self) -> int:
+        return self.memory_hits + self.disk_hits + self.misses
+
+    def __repr__(self):
+        return (
+            f"<lookups={self.lookups} memory_hits={self.memory_hits} "
+            f"disk_hits={self.disk_hits} misses={self.misses} "
+            f"read={self.bytes_read}B written={self.bytes_written}B "
+            f"load_time={self.load_time:.3f}s "
+            f"compute_time={self.compute_time:.3f}s>"
+        )
+
+
 class DiskCache:
-    def __init__(self, cache_dir, version_salt, ttl=_ONE_WEEK):
+    def __init__(self, cache_dir, version_salt, ttl=_ONE_WEEK, memory_size=64):
         self.cache_dir = Path(cache_dir).expanduser()
         self.version_salt = version_salt
         self.ttl = ttl
 
         self.last_gc = 0
 
+        # recently used items, so that loading the same item many times
+        # in one process doesn't go to disk every time
+        self._memory: lrudict = lrudict(memory_size)
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
     def gc(self, force=False):
         for root, dirs, files in os.walk(self.cache_dir):
             # delete items older than ttl
@@ -47,6 +81,27 @@ class DiskCache:
 
         self.last_gc = time.time()
 
+    def _maybe_gc(self):
+        gc_interval = self.ttl // 10
+        if time.time() - self.last_gc < gc_interval:
+            return
+        self.last_gc = time.time()
+
+        # the time of the last gc is shared between processes via
+        # the mtime of a marker file, so that not every new process
+        # walks the cache directory.
+        marker = self.cache_dir.joinpath("last_gc")
+        with _silence_io_errors():
+            if time.time() - marker.stat().st_mtime < gc_interval:
+                return
+        with _silence_io_errors():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+
+        # walk the cache directory in the background, not on the
+        # request path
+        threading.Thread(target=self.gc, daemon=True).start()
+
     # content-addressable location
     def cal(self, string):
         preimage = (self.version_salt + string).encode("utf-8")
@@ -55,24 +110,45 @@ class DiskCache:
 
     # look up x in the cal; on a miss, write back to the cache
     def caching_lookup(self, string, func):
-        gc_interval = self.ttl // 10
-        if time.time() - self.last_gc >= gc_interval:
-            self.gc()
+        self._maybe_gc()
 
         p = self.cal(string)
-        p.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            if p in self._memory:
+                self.stats.memory_hits += 1
+                return self._memory[p]
+
+        t0 = time.perf_counter()
         try:
             with p.open("rb") as f:
-                return pickle.loads(f.read())
+                data = f.read()
+            res = pickle.loads(data)
         except OSError:
             pass  # discard the stack trace in case of other errors
+        else:
+            with self._lock:
+                self.stats.disk_hits += 1
+                self.stats.bytes_read += len(data)
+                self.stats.load_time += time.perf_counter() - t0
+                self._memory[p] = res
+            return res
 
+        t0 = time.perf_counter()
         res = func()
+        data = pickle.dumps(res)
+        with self._lock:
+            self.stats.misses += 1
+            self.stats.bytes_written += len(data)
+            self.stats.compute_time += time.perf_counter() - t0
+            self._memory[p] = res
+
+        p.parent.mkdir(parents=True, exist_ok=True)
         # use process ID and thread ID to avoid race conditions
         job_id = f"{os.getpid()}.{threading.get_ident()}"
         tmp_p = p.with_suffix(f".{job_id}.unfinished")
         with tmp_p.open("wb") as f:
-            f.write(pickle.dumps(res))
+            f.write(data)
         # rename is atomic, don't really need to care about fsync
         # because worst case we will just rebuild the item
         tmp_p.rename(p)
@@ -0,0 +1,157 @@
+import ast as python_ast
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from vyper.compiler.input_bundle import (
+    ABIInput,
+    CompilerInput,
+    FileInput,
+    FilesystemInputBundle,
+)
+from vyper.exceptions import VyperException
+from vyper.semantics.types.module import ModuleT
+from vyper.utils import sha256sum
+
+from boa.util.lrudict import lrudict
+
+# fingerprinting from the raw sources mirrors vyper's own import
+# resolution, using helpers which are private to (and move around
+# between versions of) vyper. if they are not available, sources are
+# not fingerprinted and callers fall back to semantic analysis.
+try:
+    from vyper.ast.pre_parser import pre_parse
+    from vyper.semantics.analysis.module import _import_to_path, _is_builtin
+
+    _HAS_IMPORT_HELPERS = True
+except ImportError:  # pragma: no cover
+    _HAS_IMPORT_HELPERS = False
+
+if TYPE_CHECKING:
+    from vyper.semantics.analysis.base import ImportInfo
+
+
+def hash_input(compiler_input: CompilerInput) -> str:
+    if isinstance(compiler_input, FileInput):
+        return compiler_input.sha256sum
+    if isinstance(compiler_input, ABIInput):
+        return sha256sum(str(compiler_input.abi))
+    raise RuntimeError(f"bad compiler input {compiler_input}")
+
+
+# compute a fingerprint for a module which changes if any of its
+# dependencies change
+def get_module_fingerprint(
+    module_t: ModuleT, seen: dict["ImportInfo", str] = None
+) -> str:
+    seen = seen or {}
+    fingerprints = []
+    for stmt in module_t.import_stmts:
+        import_info = stmt._metadata["import_info"]
+        if id(import_info) not in seen:
+            if isinstance(import_info.typ, ModuleT):
+                fingerprint = get_module_fingerprint(import_info.typ, seen)
+            else:
+                fingerprint = hash_input(import_info.compiler_input)
+            seen[id(import_info)] = fingerprint
+        fingerprint = seen[id(import_info)]
+        fingerprints.append(fingerprint)
+    fingerprints.append(module_t._module.source_sha256sum)
+
+    return sha256sum("".join(fingerprints))
+
+
+class _CannotFingerprint(Exception):
+    pass
+
+
+# source sha256 => the imports in that source, as (level, module_str)
+_imports_cache: lrudict = lrudict(4096)
+
+
+def _parse_imports(source_code: str) -> list[tuple[int, str]]:
+    # only the top level of a module can contain imports, so we don't
+    # need the vyper AST, just the python AST of the pre-parsed source.
+    _, _, _, python_source = pre_parse(source_code)
+    ret: list[tuple[int, str]] = []
+    for node in python_ast.parse(python_source).body:
+        if isinstance(node, python_ast.Import):
+            ret.extend((0, alias.name) for alias in node.names)
+        elif isinstance(node, python_ast.ImportFrom):
+            # cf. ModuleAnalyzer.visit_ImportFrom
+            module = node.module + "." if node.module else ""
+            ret.extend((node.level, module + alias.name) for alias in node.names)
+    return ret
+
+
+# cf. ModuleAnalyzer._load_import_helper
+def _resolve_import(
+    input_bundle: FilesystemInputBundle, level: int, module_str: str
+) -> CompilerInput:
+    path = _import_to_path(level, module_str)
+    for suffix in (".vy", ".vyi", ".json"):
+        try:
+            return input_bundle.load_file(path.with_suffix(suffix))
+        except FileNotFoundError:
+            continue
+    raise _CannotFingerprint(module_str)
+
+
+def _fingerprint(
+    compiler_input: CompilerInput,
+    input_bundle: FilesystemInputBundle,
+    seen: dict[Path, Optional[str]],
+) -> str:
+    if not isinstance(compiler_input, FileInput):
+        return hash_input(compiler_input)
+
+    resolved_path = compiler_input.resolved_path
+    if resolved_path in seen:
+        if seen[resolved_path] is None:
+            # import cycle, let the compiler report it
+            raise _CannotFingerprint(resolved_path)
+        return seen[resolved_path]  # type: ignore
+    seen[resolved_path] = None
+
+    source_sha256sum = compiler_input.sha256sum
+    imports = _imports_cache.setdefault_lambda(
+        source_sha256sum, lambda _: _parse_imports(compiler_input.source_code)
+    )
+
+    fingerprints = []
+    # imports are resolved relative to the importing module
+    with input_bundle.poke_search_path(Path(resolved_path).parent):
+        for level, module_str in imports:
+            if _is_builtin(module_str):
+                # builtins are versioned together with the compiler
+                fingerprints.append(sha256sum(module_str))
+                continue
+            dep = _resolve_import(input_bundle, level, module_str)
+            fingerprints.append(_fingerprint(dep, input_bundle, seen))
+    fingerprints.append(source_sha256sum)
+
+    ret = sha256sum("".join(fingerprints))
+    seen[resolved_path] = ret
+    return ret
+
+
+def get_source_fingerprint(
+    file_input: FileInput, search_paths: list[Path]
+) -> Optional[str]:
+    """
+    Compute a fingerprint for a module which changes if the module or any
+    of its (transitive) imports change, like `get_module_fingerprint`, but
+    from the raw sources, without running semantic analysis.
+    Returns None if the imports cannot be resolved (the caller should
+    fall back to analysis, which will produce a proper error message),
+    or if the installed vyper version is not supported.
+    """
+    if not _HAS_IMPORT_HELPERS:  # pragma: no cover
+        return None
+
+    # use a separate input bundle, so we don't affect the source ids
+    # handed out by the one used for compilation
+    input_bundle = FilesystemInputBundle(list(search_paths))
+    try:
+        return _fingerprint(file_input, input_bundle, {})
+    except (_CannotFingerprint, SyntaxError, VyperException):
+        return None
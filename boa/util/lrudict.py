@@ -21,3 +21,51 @@ class lrudict(dict):
         except KeyError:
             self[k] = (ret := fn(k))
             return ret
+
+
+class interndict:
+    """
+    A bounded dict for interning objects, for when lookups are much more
+    common than inserts. Unlike `lrudict`, a hit is a single dict lookup
+    and doesn't reorder anything.
+
+    Entries are kept in two generations of up to `n` entries each. New
+    entries go into the young generation; when it is full, the old
+    generation is dropped and the young one takes its place. Entries
+    found in the old generation are copied back into the young one, so
+    entries which are in use survive (an approximate LRU).
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self._young: dict = {}
+        self._old: dict = {}
+
+    def get(self, k, default=None):
+        try:
+            return self._young[k]
+        except KeyError:
+            pass
+        try:
+            val = self._old[k]
+        except KeyError:
+            return default
+        self[k] = val
+        return val
+
+    def __setitem__(self, k, val):
+        if len(self._young) >= self.n:
+            self._old = self._young
+            self._young = {}
+        self._young[k] = val
+
+    def __contains__(self, k):
+        return k in self._young or k in self._old
+
+    def items(self):
+        # doesn't refresh anything
+        return ({**self._old, **self._young}).items()
+
+    def clear(self):
+        self._young.clear()
+        self._old.clear()
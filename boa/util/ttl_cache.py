@@ -0,0 +1,104 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    A small key-value store whose entries expire after `ttl` seconds.
+    Values must be JSON-serializable. If `path` is given, entries are
+    persisted there so that they can be shared across processes. Writes
+    merge with the entries other processes have written in the meantime.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path).expanduser() if path is not None else None
+        self._entries: Optional[dict[str, tuple[float, Any, bool]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, tuple[float, Any, bool]]:
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = {
+            key: (expiry, value, True) for key, (expiry, value) in self._read().items()
+        }
+        return self._entries
+
+    def _read(self) -> dict[str, tuple[float, Any]]:
+        if self.path is None:
+            return {}
+        with contextlib.suppress(OSError, ValueError):
+            with self.path.open() as f:
+                return {
+                    k: (expiry, value) for k, (expiry, value) in json.load(f).items()
+                }
+        return {}
+
+    def _save(
+        self,
+        updates: Optional[dict[str, tuple[float, Any]]] = None,
+        removed_prefix: Optional[str] = None,
+    ) -> None:
+        if self.path is None:
+            return
+        now = time.time()
+        # re-read the file, so we don't clobber what other processes
+        # wrote since we loaded it
+        data = {k: v for k, v in self._read().items() if v[0] > now}
+        if removed_prefix is not None:
+            data = {k: v for k, v in data.items() if not k.startswith(removed_prefix)}
+        data.update(updates or {})
+        # write to a tmp file and rename, so that concurrent readers
+        # never see a partially written file
+        tmp = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with contextlib.suppress(OSError):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tmp.open("w") as f:
+                json.dump(data, f)
+            tmp.replace(self.path)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entries = self._load()
+            item = entries.get(key)
+            if item is None:
+                return default
+            expiry, value, _ = item
+            if expiry <= time.time():
+                del entries[key]
+                return default
+            return value
+
+    def set(self, key: str, value: Any, ttl: float, persist: bool = True) -> None:
+        # `persist=False` keeps the entry in memory only, useful for
+        # short-lived data which is not worth a disk write
+        with self._lock:
+            entries = self._load()
+            expiry = time.time() + ttl
+            entries[key] = (expiry, value, persist)
+            if persist:
+                self._save(updates={key: (expiry, value)})
+
+    def get_or_compute(
+        self, key: str, ttl: float, fn: Callable[[], Any], persist: bool = True
+    ) -> Any:
+        # note: if `fn` raises, nothing is cached
+        ret = self.get(key, _MISSING)
+        if ret is _MISSING:
+            ret = fn()
+            self.set(key, ret, ttl, persist=persist)
+        return ret
+
+    def invalidate(self, prefix: str = "") -> None:
+        with self._lock:
+            entries = self._load()
+            for key in [k for k in entries if k.startswith(prefix)]:
+                del entries[key]
+            self._save(removed_prefix=prefix)
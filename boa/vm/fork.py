@@ -1,5 +1,7 @@
+import contextlib
 import os
 import sys
+from functools import cached_property
 from typing import Any, Type
 
 import rlp
@@ -26,6 +28,18 @@ _PREDEFINED_BLOCKS = {"safe", "latest", "finalized", "pending", "earliest"}
 _EMPTY = b""  # empty rlp stuff
 _HAS_KEY = b"\x01"  # could be anything
 
+# storage prefetching. once a contract reads cold slots with a constant
+# stride (e.g. walking an array, or reading the fields of a struct), we
+# fetch the next slots along the stride ahead of time in a single batch.
+# the prefetch depth doubles while the pattern holds.
+PREFETCH_MIN_DEPTH = 8
+PREFETCH_MAX_DEPTH = 128
+PREFETCH_MAX_STRIDE = 64
+
+# number of entries to request with debug_storageRangeAt. if a contract's
+# whole storage fits, we never have to fetch a slot for it again.
+STORAGE_RANGE_LIMIT = 256
+
 
 class CachingRPC(RPC):
     def __init__(self, rpc: RPC, cache_file: str = DEFAULT_CACHE_DIR):
@@ -39,9 +53,10 @@ class CachingRPC(RPC):
     # reduces fork time after the first fork.
     _loaded: dict[tuple[str, str], "CachingRPC"] = {}
     _pid: int = os.getpid()  # so we can detect if our fds are bad
+    _is_fork: bool = False  # forked children don't use the leveldb
 
     def _init_db(self):
-        if self._cache_file is not None:
+        if self._cache_file is not None and not self._is_fork:
             try:
                 from boa.util.leveldb import LevelDB
 
@@ -74,8 +89,7 @@ class CachingRPC(RPC):
 
         if os.getpid() != cls._pid:
             # we are in a fork. reload everything so that fds are not corrupted
-            cls._loaded = {}
-            cls._pid = os.getpid()
+            cls._after_fork()
 
         if (rpc.identifier, cache_file) in cls._loaded:
             return cls._loaded[(rpc.identifier, cache_file)]
@@ -85,6 +99,18 @@ class CachingRPC(RPC):
         cls._loaded[(rpc.identifier, cache_file)] = ret
         return ret
 
+    @classmethod
+    def _after_fork(cls):
+        # file descriptors are shared with the parent process, and the
+        # leveldb can't be used from two processes. switch instances
+        # which are already in use (e.g. by a forked env) to an
+        # in-memory db, and reload everything else.
+        cls._is_fork = True
+        for rpc in cls._loaded.values():
+            rpc._init_db()
+        cls._loaded = {}
+        cls._pid = os.getpid()
+
     # a stupid key for the kv store
     def _mk_key(self, method: str, params: Any) -> Any:
         return json.dumps({"method": method, "params": params}).encode("utf-8")
@@ -126,9 +152,51 @@ class CachingRPC(RPC):
         return [ret[i] for i in range(len(ret))]
 
 
+# tracks cold storage reads for a single contract, to detect
+# sequential or strided access patterns
+class _StorageAccessPattern:
+    __slots__ = ("last_slot", "stride", "depth")
+
+    def __init__(self):
+        self.last_slot = None
+        self.stride = None
+        self.depth = PREFETCH_MIN_DEPTH
+
+    # record a cold access, and return the stride to prefetch along (if
+    # any). note that after a prefetch, `last_slot` is the end of the
+    # prefetched range, so the pattern continues at the next cold read.
+    def record(self, slot):
+        if self.last_slot is None:
+            self.last_slot = slot
+            return None
+
+        stride = slot - self.last_slot
+        self.last_slot = slot
+
+        if stride == 0 or abs(stride) > PREFETCH_MAX_STRIDE:
+            self.stride = None
+            self.depth = PREFETCH_MIN_DEPTH
+            return None
+
+        # contiguous access is common enough (structs, arrays of words)
+        # to prefetch on the first hit, others need to be seen twice.
+        if stride == self.stride or stride == 1:
+            if stride == self.stride:
+                self.depth = min(self.depth * 2, PREFETCH_MAX_DEPTH)
+            self.stride = stride
+            return stride
+
+        self.stride = stride
+        self.depth = PREFETCH_MIN_DEPTH
+        return None
+
+
 # AccountDB which dispatches to an RPC when we don't have the
 # data locally
 class AccountDBFork(AccountDB):
+    # try to fetch whole contract storage with debug_storageRangeAt
+    storage_range_enabled = True
+
     @classmethod
     def class_from_rpc(
         cls, rpc: RPC, block_identifier: str, **kwargs
@@ -147,13 +215,75 @@ class AccountDBFork(AccountDB):
 
         self._rpc = rpc
 
+        # per-contract storage access patterns, for prefetching
+        self._storage_access: dict[bytes, _StorageAccessPattern] = {}
+        # contracts whose whole storage we have fetched (so any slot
+        # we haven't seen is zero)
+        self._complete_storage: set[bytes] = set()
+        # contracts we have already tried debug_storageRangeAt on
+        self._storage_range_tried: set[bytes] = set()
+
+        # accounts written locally since the fork was (re-)pinned. these
+        # get evicted on repin.
+        self._written_accounts: set[bytes] = set()
+        # bumped when an account is evicted, to invalidate its _dontfetch
+        # entries (which can't be enumerated per account)
+        self._storage_epochs: dict[bytes, int] = {}
+        # set while writing state fetched from the RPC, which doesn't
+        # count as a local write
+        self._populating = False
+
+        self._set_block(self._fetch_block_info(block_identifier))
+
+    def _fetch_block_info(self, block_identifier):
         if block_identifier not in _PREDEFINED_BLOCKS:
             block_identifier = to_hex(block_identifier)
 
-        self._block_info = self._rpc.fetch_uncached(
+        return self._rpc.fetch_uncached(
             "eth_getBlockByNumber", [block_identifier, False]
         )
-        self._block_number = to_int(self._block_info["number"])
+
+    def _set_block(self, block_info):
+        self._block_info = block_info
+        self._block_number = to_int(block_info["number"])
+
+        # these depend on the block
+        self.__dict__.pop("_storage_range_at", None)
+        self.__dict__.pop("_has_storage_range", None)
+
+    def repin(self, block_identifier, touched_addresses=()):
+        """
+        Move the fork to a new block. State fetched from the RPC is kept,
+        except for accounts which were written locally since the last pin
+        (or are in `touched_addresses`), which are evicted and refetched
+        from the new block on next access.
+        Returns the new block info.
+        """
+        block_info = self._fetch_block_info(block_identifier)
+
+        evict = self._written_accounts
+        evict.update(touched_addresses)
+        for address in evict:
+            self._evict_account(address)
+        self._written_accounts = set()
+
+        self._set_block(block_info)
+        return block_info
+
+    def _evict_account(self, address):
+        # deleting from the journal makes the account look missing, so
+        # it will get refetched from the RPC
+        if address in self._journaltrie:
+            del self._journaltrie[address]
+        self._account_cache.pop(address, None)
+
+        self._account_stores.pop(address, None)
+        self._dirty_accounts.discard(address)
+        self._storage_epochs[address] = self._storage_epochs.get(address, 0) + 1
+
+        self._storage_access.pop(address, None)
+        self._complete_storage.discard(address)
+        self._storage_range_tried.discard(address)
 
     @property
     def _block_id(self):
@@ -221,13 +351,21 @@ class AccountDBFork(AccountDB):
 
         snapshot = self.record()
 
+        with self._populate():
+            if not self._populate_prestate(trace):
+                # the trace we have been given is invalid, roll back changes
+                self.discard(snapshot)
+                return
+
+        # the prefetch is lost on later reverts, however the RPC calls are cached
+        self.commit(snapshot)
+
+    def _populate_prestate(self, trace):
         for address, account_dict in trace.items():
             try:
                 address = to_canonical_address(address)
             except ValueError:
-                # the trace we have been given is invalid, roll back changes
-                self.discard(snapshot)
-                return
+                return False
 
             # set account if we don't already have it
             if self._get_account_helper(address) is None:
@@ -248,8 +386,7 @@ class AccountDBFork(AccountDB):
                 if not self._helper_have_storage(address, slot):
                     self.set_storage(address, slot, value)
 
-        # the prefetch is lost on later reverts, however the RPC calls are cached
-        self.commit(snapshot)
+        return True
 
     def get_code(self, address):
         try:
@@ -259,12 +396,17 @@ class AccountDBFork(AccountDB):
 
         code_args = [to_checksum_address(address), self._block_id]
         code = to_bytes(self._rpc.fetch("eth_getCode", code_args))
-        self.set_code(address, code)
+        with self._populate():
+            self.set_code(address, code)
         return code
 
     def discard(self, checkpoint):
         super().discard(checkpoint)
         self._dontfetch.discard(checkpoint)
+        # prefetched storage may have been rolled back. the RPC calls
+        # are cached, so it is cheap to redo them.
+        self._complete_storage.clear()
+        self._storage_range_tried.clear()
 
     def commit(self, checkpoint):
         super().commit(checkpoint)
@@ -283,27 +425,186 @@ class AccountDBFork(AccountDB):
             key = int_to_big_endian(slot)
             return db.get(key, _EMPTY) != _EMPTY
 
-        key = self._get_storage_tracker_key(address, slot)
+        key = self._dontfetch_key(address, slot)
         return self._dontfetch.get(key) == _HAS_KEY
 
+    def _dontfetch_key(self, address, slot):
+        epoch = self._storage_epochs.get(address, 0)
+        return address + epoch.to_bytes(4, "big") + int_to_big_endian(slot)
+
     def get_storage(self, address, slot, from_journal=True):
         # call super for address warming semantics
         val = super().get_storage(address, slot, from_journal)
         if self._helper_have_storage(address, slot, from_journal=from_journal):
             return val
 
-        fetch_args = [to_checksum_address(address), to_hex(slot), self._block_id]
-        val = to_int(self._rpc.fetch("eth_getStorageAt", fetch_args))
-        if from_journal:
+        if not from_journal:
             # when not from journal, don't override changes
+            return self._fetch_storage(address, slot)
+
+        if self._try_storage_range(address) and self._helper_have_storage(
+            address, slot
+        ):
+            return super().get_storage(address, slot)
+
+        if address in self._complete_storage:
+            val = 0
+        elif (stride := self._record_storage_access(address, slot)) is not None:
+            val = self._prefetch_storage(address, slot, stride)
+        else:
+            val = self._fetch_storage(address, slot)
+
+        with self._populate():
             self.set_storage(address, slot, val)
         return val
 
+    def _fetch_storage(self, address, slot):
+        fetch_args = [to_checksum_address(address), to_hex(slot), self._block_id]
+        return to_int(self._rpc.fetch("eth_getStorageAt", fetch_args))
+
+    def _record_storage_access(self, address, slot):
+        pattern = self._storage_access.get(address)
+        if pattern is None:
+            pattern = self._storage_access[address] = _StorageAccessPattern()
+        return pattern.record(slot)
+
+    # fetch `slot` along with the next slots along `stride` in one batch.
+    # returns the value at `slot`.
+    def _prefetch_storage(self, address, slot, stride):
+        pattern = self._storage_access[address]
+        slots = [slot]
+        for i in range(1, pattern.depth + 1):
+            s = slot + i * stride
+            if not 0 <= s < 2**256:
+                break
+            pattern.last_slot = s
+            if not self._helper_have_storage(address, s):
+                slots.append(s)
+
+        checksum_address = to_checksum_address(address)
+        reqs = [
+            ("eth_getStorageAt", [checksum_address, to_hex(s), self._block_id])
+            for s in slots
+        ]
+        values = [to_int(v) for v in self._rpc.fetch_multi(reqs)]
+
+        # the first slot gets set by the caller
+        with self._populate():
+            for s, v in zip(slots[1:], values[1:]):
+                self.set_storage(address, s, v)
+        return values[0]
+
+    # fetch all of `slots` which are not available locally in one batch.
+    def prefetch_storage(self, address, slots):
+        if address in self._complete_storage:
+            return
+        self._try_storage_range(address)
+
+        slots = [s for s in slots if not self._helper_have_storage(address, s)]
+        if len(slots) < 2:
+            # not worth a batch, leave it to get_storage()
+            return
+
+        checksum_address = to_checksum_address(address)
+        reqs = [
+            ("eth_getStorageAt", [checksum_address, to_hex(s), self._block_id])
+            for s in slots
+        ]
+        values = [to_int(v) for v in self._rpc.fetch_multi(reqs)]
+
+        with self._populate():
+            for s, v in zip(slots, values):
+                self.set_storage(address, s, v)
+
+    # on the first cold storage read of a contract, try to pull its whole
+    # storage with debug_storageRangeAt. returns True if any slots were
+    # fetched.
+    def _try_storage_range(self, address):
+        if address in self._storage_range_tried:
+            return False
+        self._storage_range_tried.add(address)
+
+        if not self._has_storage_range:
+            return False
+
+        block_hash, tx_index = self._storage_range_at
+        zero_key = "0x" + "00" * 32
+        args = [
+            block_hash,
+            tx_index,
+            to_checksum_address(address),
+            zero_key,
+            STORAGE_RANGE_LIMIT,
+        ]
+        try:
+            res = self._rpc.fetch("debug_storageRangeAt", args)
+        except (RPCError, HTTPError):
+            # don't try again for this fork
+            self.storage_range_enabled = False
+            self._has_storage_range = False
+            return False
+
+        entries = res["storage"].values()
+        # the node only returns the slot (preimage of the storage trie key)
+        # if it has preimages, otherwise we can't use the entry.
+        all_keys_known = all(entry.get("key") is not None for entry in entries)
+
+        with self._populate():
+            for entry in entries:
+                if entry.get("key") is None:
+                    continue
+                slot = to_int(entry["key"])
+                if not self._helper_have_storage(address, slot):
+                    self.set_storage(address, slot, to_int(entry["value"]))
+
+        if res.get("nextKey") is None and all_keys_known:
+            self._complete_storage.add(address)
+
+        return len(entries) > 0
+
+    @cached_property
+    def _storage_range_at(self):
+        # debug_storageRangeAt gives the state *before* the transaction at
+        # the given index. the state at the end of our block is the state
+        # before the first transaction of the next block.
+        block_hash = self._block_info["hash"]
+        if len(self._block_info.get("transactions", [])) == 0:
+            return block_hash, 0
+
+        next_block_id = to_hex(self._block_number + 1)
+        next_block = self._rpc.fetch_uncached(
+            "eth_getBlockByNumber", [next_block_id, False]
+        )
+        if next_block is None or next_block["parentHash"] != block_hash:
+            return None
+        return next_block["hash"], 0
+
+    @cached_property
+    def _has_storage_range(self):
+        return self.storage_range_enabled and self._storage_range_at is not None
+
     def set_storage(self, address, slot, value):
         super().set_storage(address, slot, value)
         # mark don't fetch
-        key = self._get_storage_tracker_key(address, slot)
+        key = self._dontfetch_key(address, slot)
         self._dontfetch[key] = _HAS_KEY
+        if not self._populating:
+            self._written_accounts.add(address)
+
+    def _set_account(self, address, account):
+        super()._set_account(address, account)
+        if not self._populating:
+            self._written_accounts.add(address)
+
+    # write state which was fetched from the RPC
+    @contextlib.contextmanager
+    def _populate(self):
+        tmp = self._populating
+        self._populating = True
+        try:
+            yield
+        finally:
+            self._populating = tmp
 
     def account_exists(self, address):
         if super().account_exists(address):
@@ -30,6 +30,7 @@ from boa.contracts.call_trace import TraceFrame
 from boa.rpc import RPC
 from boa.util.abi import Address, abi_decode
 from boa.util.eip1167 import extract_eip1167_address, is_eip1167_contract
+from boa.util.lrudict import lrudict
 from boa.vm.fast_accountdb import patch_pyevm_state_object, unpatch_pyevm_state_object
 from boa.vm.fork import AccountDBFork
 from boa.vm.gas_meters import GasMeter
@@ -83,21 +84,25 @@ class VMPatcher:
         patchable_keys = [k for p, _ in self._patchables for k in p]
         return dir(super()) + patchable_keys
 
-    # save and restore patch values
-    @contextlib.contextmanager
-    def anchor(self):
+    def snapshot(self) -> dict[str, Any]:
         snap = {}
         for s, _ in self._patchables:
             for attr in s:
                 snap[attr] = getattr(self, attr)
+        return snap
 
+    def restore(self, snap: dict[str, Any]) -> None:
+        for attr, value in snap.items():
+            setattr(self, attr, value)
+
+    # save and restore patch values
+    @contextlib.contextmanager
+    def anchor(self):
+        snap = self.snapshot()
         try:
             yield
-
         finally:
-            for s, _ in self._patchables:
-                for attr in s:
-                    setattr(self, attr, snap[attr])
+            self.restore(snap)
 
 
 _opcode_overrides = {}
@@ -150,6 +155,13 @@ CONSOLE_ADDRESS = bytes.fromhex("000000000000000000636F6E736F6C652E6C6F67")
 register_raw_precompile(CONSOLE_ADDRESS, console_log)
 
 
+# jumpdest analysis by bytecode. the analysis only depends on the code,
+# so computations running the same code share it. code looked up through
+# `PyEVM.get_code()` is the same bytes object on every call, so hashing
+# it is cheap after the first time.
+_code_analysis: lrudict = lrudict(1024)
+
+
 # a code stream which keeps a trace of opcodes it has executed
 class TracingCodeStream(CodeStream):
     __slots__ = [
@@ -163,6 +175,13 @@ class TracingCodeStream(CodeStream):
 
     def __init__(self, *args, start_pc=0, fake_codesize=None, contract=None, **kwargs):
         super().__init__(*args, **kwargs)
+
+        code = self._raw_code_bytes
+        if (analysis := _code_analysis.get(code)) is None:
+            analysis = (self.valid_positions, self.invalid_positions)
+            _code_analysis[code] = analysis
+        self.valid_positions, self.invalid_positions = analysis
+
         self._trace = []  # trace of opcodes that were run
         self.program_counter = start_pc  # configurable start PC
         self._fake_codesize = fake_codesize  # what CODESIZE returns
@@ -208,7 +227,7 @@ class Sha3PreimageTracer:
         value = computation._stack.values[-1]
         image = to_bytes(value)
 
-        self.env.sha3_trace[preimage] = image
+        self.env._trace_sha3_preimage(preimage, image)
 
 
 class SstoreTracer:
@@ -225,12 +244,30 @@ class SstoreTracer:
         # we don't want to deal with snapshots/commits/reverts, so just
         # register that the slot was touched and downstream can filter
         # zero entries.
-        self.env.sstore_trace.setdefault(account, set()).add(slot)
+        self.env._trace_sstore(account, slot)
 
         # dispatch into py-evm
         self.sstore(computation)
 
 
+class SelfdestructTracer:
+    mnemonic = "SELFDESTRUCT"
+
+    def __init__(self, selfdestruct_op, env):
+        self.env = env
+        self.selfdestruct = selfdestruct_op
+
+    def __call__(self, computation):
+        # the beneficiary may not be touched otherwise
+        beneficiary = to_bytes(computation._stack.values[-1])[-20:]
+        self.env._trace_account(beneficiary)
+
+        # dispatch into py-evm
+        self.selfdestruct(computation)
+
+        self.env.evm.touch_code(computation.msg.storage_address)
+
+
 # ### End section: sha3 tracing
 
 
@@ -268,6 +305,8 @@ class titanoboa_computation:
 
         self._child_pcs = []
         self._contract_repr_before_revert = None
+        self._sstore_count_at_start = self.env.evm._sstore_count
+        self._code_writes_at_start = self.env.evm._code_writes
 
     @property
     def net_gas_used(self):
@@ -278,18 +317,27 @@ class titanoboa_computation:
         # track PCs of child calls for profiling purposes
         self._child_pcs.append(self.code.program_counter)
 
+    @classmethod
+    def apply_message(cls, state, msg, tx_ctx, **kwargs):
+        # record the accounts before value is transferred
+        cls.env._trace_message(msg)
+        return super().apply_message(state, msg, tx_ctx, **kwargs)
+
     # hijack creations to automatically generate blueprints
     @classmethod
     def apply_create_message(cls, state, msg, tx_ctx, **kwargs):
+        # record the new account before its nonce is set
+        cls.env._trace_message(msg)
         computation = super().apply_create_message(state, msg, tx_ctx, **kwargs)
 
         bytecode = msg.code
         # cf. eth/vm/logic/system/Create* opcodes
         contract_address = msg.storage_address
+        cls.env.evm.touch_code(contract_address)
 
         if is_eip1167_contract(bytecode):
             contract_address = extract_eip1167_address(bytecode)
-            bytecode = cls.env.evm.vm.state.get_code(contract_address)
+            bytecode = cls.env.evm._get_code(contract_address)
 
         if bytecode in cls.env._code_registry:
             target = cls.env._code_registry[bytecode].deployer.at(contract_address)
@@ -309,6 +357,12 @@ class titanoboa_computation:
                 # reverted. Before the revert, save the contract repr for the
                 # error message
                 c._contract_repr_before_revert = repr(contract)
+                if c._sstore_count_at_start != cls.env.evm._sstore_count:
+                    # storage written during this computation is about
+                    # to be rolled back
+                    cls.env.evm.invalidate_storage()
+                if c._code_writes_at_start != cls.env.evm._code_writes:
+                    cls.env.evm.invalidate_code()
             return c
 
         if contract is None or not cls.env.evm._fast_mode_enabled:
@@ -378,9 +432,22 @@ class PyEVM:
         self.env = env
         self._fast_mode_enabled = fast_mode_enabled
         self._fork_try_prefetch_state = fork_try_prefetch_state
+
+        # counters which let callers cache data derived from storage.
+        # see `storage_generation()`.
+        self._storage_generation = 0
+        self._sstore_count = 0
+        self._account_generations: dict[bytes, int] = {}
+
+        # runtime code by canonical address. see `get_code()`.
+        self._code_cache: dict[bytes, bytes] = {}
+        self._code_writes = 0
+
         self._init_vm()
 
     def _init_vm(self, account_db_class=AccountDB):
+        self.invalidate_storage()
+        self.invalidate_code()
         self.vm = self.chain.get_vm()
         self.vm.__class__._state_class.account_db_class = account_db_class
 
@@ -400,6 +467,7 @@ class PyEVM:
         # patch in tracing opcodes
         c.opcodes[0x20] = Sha3PreimageTracer(c.opcodes[0x20], self.env)
         c.opcodes[0x55] = SstoreTracer(c.opcodes[0x55], self.env)
+        c.opcodes[0xFF] = SelfdestructTracer(c.opcodes[0xFF], self.env)
 
     def enable_fast_mode(self, flag: bool = True):
         if flag:
@@ -412,9 +480,27 @@ class PyEVM:
         self._init_vm(account_db_class)
         block_info = self.vm.state._account_db._block_info
 
+        self._patch_block_info(block_info)
+        self.patch.chain_id = int(rpc.fetch("eth_chainId", []), 16)
+
+        self.vm.state._account_db._rpc._init_db()
+
+    def repin_fork(self, block_identifier: str, touched_addresses=()):
+        """
+        Move an existing fork to a new block, keeping the VM and all
+        fetched state which was not written locally since the last pin.
+        :param block_identifier: Block identifier to move the fork to
+        :param touched_addresses: Additional addresses to refetch
+        """
+        account_db = self.vm.state._account_db
+        block_info = account_db.repin(block_identifier, touched_addresses)
+        self.invalidate_storage()
+        self.invalidate_code()
+        self._patch_block_info(block_info)
+
+    def _patch_block_info(self, block_info):
         self.patch.timestamp = int(block_info["timestamp"], 16)
         self.patch.block_number = int(block_info["number"], 16)
-        self.patch.chain_id = int(rpc.fetch("eth_chainId", []), 16)
 
         # placeholder not to fetch all prev hashes
         # (NOTE: we should document this)
@@ -424,8 +510,6 @@ class PyEVM:
             block_info["parentHash"].removeprefix("0x")
         )
 
-        self.vm.state._account_db._rpc._init_db()
-
     @property
     def is_forked(self):
         return issubclass(
@@ -450,16 +534,56 @@ class PyEVM:
         self.vm.state.set_balance(address.canonical_address, value)
 
     def get_code(self, address: Address) -> bytes:
-        return self.vm.state.get_code(address.canonical_address)
+        return self._get_code(address.canonical_address)
+
+    def _get_code(self, address: bytes) -> bytes:
+        # cached, since going through the state means an account lookup
+        # and a code db lookup on every call
+        try:
+            return self._code_cache[address]
+        except KeyError:
+            pass
+        code = self.vm.state.get_code(address)
+        self._code_cache[address] = code
+        return code
 
     def set_code(self, address: Address, code: bytes) -> None:
         self.vm.state.set_code(address.canonical_address, code)
+        self.touch_code(address.canonical_address)
+
+    def touch_code(self, address: bytes) -> None:
+        # record a change to the code of a single account
+        self._code_writes += 1
+        self._code_cache.pop(address, None)
+
+    def invalidate_code(self) -> None:
+        # record a change which may affect the code of any account
+        self._code_writes += 1
+        self._code_cache.clear()
 
     def get_storage(self, address: Address, slot: int) -> int:
         return self.vm.state.get_storage(address.canonical_address, slot)
 
     def set_storage(self, address: Address, slot: int, value: int) -> None:
         self.vm.state.set_storage(address.canonical_address, slot, value)
+        self.touch_storage(address.canonical_address)
+
+    def touch_storage(self, address: bytes) -> None:
+        # record a write to the storage of a single account
+        self._sstore_count += 1
+        self._account_generations[address] = self._sstore_count
+
+    def invalidate_storage(self) -> None:
+        # record a change which may affect the storage of any account
+        self._storage_generation += 1
+
+    def storage_generation(self, address: Address) -> tuple[int, int]:
+        """
+        A token which changes whenever the storage of `address` may have
+        changed. Data derived from storage can be cached until it does.
+        """
+        account_generation = self._account_generations.get(address.canonical_address, 0)
+        return self._storage_generation, account_generation
 
     def get_gas_limit(self):
         return self.vm.state.gas_limit
@@ -473,6 +597,8 @@ class PyEVM:
 
     def revert(self, snapshot_id: Any) -> None:
         self.vm.state.revert(snapshot_id)
+        self.invalidate_storage()
+        self.invalidate_code()
 
     def generate_create_address(self, sender: Address):
         nonce = self.vm.state.get_nonce(sender.canonical_address)
@@ -552,6 +678,19 @@ class PyEVM:
         data = self.vm.state._account_db.get_storage(address.canonical_address, slot)
         return data.to_bytes(32, "big")
 
+    def get_storage_slots(self, address: Address, slot: int, n: int) -> bytearray:
+        # read `n` consecutive slots starting at `slot` into one buffer
+        account_db = self.vm.state._account_db
+        canonical_address = address.canonical_address
+        if self.is_forked:
+            account_db.prefetch_storage(canonical_address, range(slot, slot + n))
+
+        ret = bytearray(32 * n)
+        for i in range(n):
+            data = account_db.get_storage(canonical_address, slot + i)
+            ret[32 * i : 32 * i + 32] = data.to_bytes(32, "big")
+        return ret
+
 
 GENESIS_PARAMS = {"difficulty": constants.GENESIS_DIFFICULTY, "gas_limit": int(1e8)}
 
@@ -0,0 +1,126 @@
+import warnings
+from typing import Optional
+
+from boa.util.lrudict import interndict, lrudict
+
+# preimages are only needed until the keys derived from them are written,
+# which is usually within the same call, so only recent ones are kept.
+MAX_PREIMAGES = 2**16
+
+# storage keys indexed per account
+MAX_KEYS_PER_ACCOUNT = 2**20
+
+# accounts indexed (per generation, see `interndict`). the index of an
+# account which hasn't been written to in a while is dropped.
+MAX_ACCOUNTS = 2**12
+
+
+class _AccountIndex:
+    def __init__(self):
+        # root slot => storage key => path
+        self.roots: dict[int, dict[int, tuple[bytes, ...]]] = {}
+        self.seen: set[int] = set()
+        self.full = False  # we warned about it
+
+
+class StorageIndex:
+    """
+    Index of the storage keys written to each account, by the root slot
+    and the sequence of HashMap keys ("path") they were derived from.
+    Maintained by the SHA3 and SSTORE tracers: each key is unwrapped once,
+    when it is first written. Preimages, keys per account and accounts
+    are all bounded.
+    """
+
+    def __init__(
+        self,
+        max_preimages=MAX_PREIMAGES,
+        max_keys_per_account=MAX_KEYS_PER_ACCOUNT,
+        max_accounts=MAX_ACCOUNTS,
+    ):
+        # image => 64 byte preimage of sha3
+        self.preimages: lrudict = lrudict(max_preimages)
+        self.max_keys_per_account = max_keys_per_account
+
+        # account => _AccountIndex
+        self._accounts = interndict(max_accounts)
+
+    def record_sha3(self, preimage: bytes, image: bytes) -> None:
+        self.preimages[image] = preimage
+
+    def record_sstore(self, account: bytes, slot: int) -> None:
+        index = self._accounts.get(account)
+        if index is None:
+            index = self._accounts[account] = _AccountIndex()
+
+        seen = index.seen
+        if slot in seen:
+            return
+
+        if len(seen) >= self.max_keys_per_account:
+            if not index.full:
+                index.full = True
+                warnings.warn(
+                    f"storage index for 0x{account.hex()} is full, "
+                    "new keys will not be indexed",
+                    stacklevel=2,
+                )
+            return
+
+        seen.add(slot)
+        root, path = self.unwrap(slot)
+        index.roots.setdefault(root, {})[slot] = path
+
+    def unwrap(self, slot: int) -> tuple[int, tuple[bytes, ...]]:
+        """
+        Undo the hashes which gave us a storage key, returning the root
+        slot and the path of keys which were hashed into it.
+        """
+        path = []
+        k = slot.to_bytes(32, "big")
+        # note: dict.get does not update recency in lrudict
+        while (preimage := self.preimages.get(k)) is not None:
+            k, key = preimage[:32], preimage[32:]
+            path.append(key)
+        path.reverse()
+        return int.from_bytes(k, "big"), tuple(path)
+
+    def keys_of(self, account: bytes, root_slot: int) -> dict[int, tuple[bytes, ...]]:
+        """
+        The storage keys written to `account` which were derived from
+        `root_slot`, and their paths.
+        """
+        index = self._accounts.get(account)
+        if index is None:
+            return {}
+        return index.roots.get(root_slot, {})
+
+    def path_of(
+        self, account: bytes, slot: int
+    ) -> Optional[tuple[int, tuple[bytes, ...]]]:
+        """
+        The root slot and path of a storage key written to `account`, if
+        it was indexed.
+        """
+        index = self._accounts.get(account)
+        if index is None:
+            return None
+        for root, keys in index.roots.items():
+            if slot in keys:
+                return root, keys[slot]
+        return None
+
+    def touched_slots(self, account: bytes) -> set[int]:
+        """
+        All storage keys written to `account`.
+        """
+        index = self._accounts.get(account)
+        if index is None:
+            return set()
+        return index.seen
+
+    def touched_accounts(self) -> dict[bytes, set[int]]:
+        """
+        All storage keys written, per account.
+        """
+        return {account: set(index.seen) for account, index in self._accounts.items()}
@@ -9,7 +9,7 @@ import boa
 import boa.test.strategies as vy
 from boa.deployments import _CREATE_CMD, DeploymentsDB, set_deployments_db
 from boa.network import NetworkEnv
-from boa.rpc import to_bytes
+from boa.rpc import RPCError, to_bytes
 from boa.util.abi import Address
 
 code = """
@@ -74,6 +74,58 @@ def test_failed_transaction():
     assert error.startswith("txn failed:")
 
 
+@pytest.mark.parametrize("simulation", ["on_estimate_failure", "trace_only"])
+def test_simulation_policy(simulation):
+    boa.env.tx_settings.simulation = simulation
+    try:
+        contract = boa.loads(code, STARTING_SUPPLY)
+        contract.update_total_supply(5)
+        assert contract.totalSupply() == STARTING_SUPPLY + 5
+
+        if simulation == "trace_only":
+            with pytest.raises(RPCError):
+                contract.raise_exception(1)
+        else:
+            # falls back to local simulation for the stack trace
+            with boa.reverts("oh no!"):
+                contract.raise_exception(1)
+    finally:
+        boa.env.tx_settings.simulation = "full"
+
+
+def test_batch_views(simple_contract):
+    expected = simple_contract.totalSupply()
+    with boa.env.batch_views():
+        futures = [simple_contract.totalSupply() for _ in range(10)]
+        assert not any(f.done() for f in futures)
+
+    assert [f.result() for f in futures] == [expected] * 10
+
+
+def test_pipeline():
+    with set_deployments_db(DeploymentsDB(":memory:")) as db:
+        with boa.env.pipeline():
+            contracts = [boa.loads(code, i) for i in range(5)]
+            for c in contracts:
+                c.update_total_supply(1)
+            # answered from local state while the transactions are in flight
+            assert [c.totalSupply() for c in contracts] == [1, 2, 3, 4, 5]
+
+        assert len(list(db.get_deployments())) == 5
+
+    # the node agrees after the receipts are in
+    for i, c in enumerate(contracts):
+        assert c.totalSupply() == i + 1
+
+
+def test_pipeline_failed_transaction():
+    with pytest.raises(Exception) as ctx:
+        with boa.env.pipeline():
+            boa.loads(code, STARTING_SUPPLY, gas=149377)
+    error = str(ctx.value)
+    assert error.startswith("txn failed:")
+
+
 # XXX: probably want to test deployment revert behavior
 
 
@@ -63,6 +63,51 @@ def __init__():
     assert boa.loads(code)._storage.point.get() == [1, 2]
 
 
+def test_decode_hashmap():
+    code = """
+balances: HashMap[address, uint256]
+allowances: HashMap[address, HashMap[address, uint256]]
+
+@external
+def set(a: address, b: address, x: uint256):
+    self.balances[a] = x
+    self.allowances[a][b] = x + 1
+"""
+    c = boa.loads(code)
+    a, b = boa.env.generate_address(), boa.env.generate_address()
+    c.set(a, b, 5)
+    assert c._storage.balances.get() == {a: 5}
+    assert c._storage.allowances.get() == {a: {b: 6}}
+
+    # cached results are invalidated by writes and by reverts
+    with boa.env.anchor():
+        c.set(a, b, 7)
+        assert c._storage.balances.get() == {a: 7}
+    assert c._storage.balances.get() == {a: 5}
+
+    # the cache hands out copies
+    c._storage.balances.get()[b] = 1
+    assert c._storage.balances.get() == {a: 5}
+
+
+def test_decode_hashmap_alias():
+    code = """
+balances: HashMap[address, uint256]
+
+@external
+def set(a: address, x: uint256):
+    self.balances[a] = x
+"""
+    c = boa.loads(code)
+    a = boa.env.generate_address()
+    c.set(a, 5)
+    assert c._storage.balances.get() == {a: 5}
+
+    # keys are dealiased, a new alias invalidates the cached value
+    boa.env.alias(a, "alice")
+    assert c._storage.balances.get() == {"alice": 5}
+
+
 def test_self_destruct():
     code = """
 @external
@@ -150,3 +195,68 @@ def bar() -> bool:
     # the bytecode at the original contract has been stomped :scream:
     assert c.foo() == 12345
     assert c.bar() is False
+
+
+def test_call_plan():
+    code = """
+@external
+def foo(a: uint256, b: uint256 = 10) -> uint256:
+    return a + b
+
+@external
+def bar(x: address) -> address:
+    return x
+
+@internal
+def _baz(a: uint256) -> uint256:
+    return a * 2
+    """
+    c = boa.loads(code)
+
+    # the plan is built once and reused
+    assert c.foo(1) == 11
+    plan = c.foo._call_plan
+    assert c.foo(1, 2) == 3
+    assert c.foo._call_plan is plan
+    assert len(plan.signatures) == 2
+
+    # contracts are passed by their address
+    assert c.bar(c) == c.address
+
+    # internal functions run with their own bytecode and source map
+    assert c.internal._baz(4) == 8
+    assert c.internal._baz._call_plan.override_bytecode is not None
+
+
+def test_call_plan_follows_address():
+    code = """
+@external
+def foo() -> address:
+    return self
+    """
+    c = boa.loads(code)
+    other = boa.loads(code)
+    plan = c.foo._call_plan
+    assert plan.to_address == c.address
+
+    # point the contract object at another deployment
+    c._address = other.address
+    assert c.foo() == other.address
+    assert c.foo._call_plan is not plan
+
+
+def test_contract_arguments():
+    code = """
+@external
+def foo(x: address, ys: DynArray[address, 2], z: address = empty(address)) -> address:
+    assert x == ys[0]
+    assert x == ys[1]
+    return z
+    """
+    c = boa.loads(code)
+    other = boa.loads(code)
+
+    # contracts are converted to their address by the encoder, anywhere
+    # in the arguments
+    assert c.foo(other, [other, other.address], other) == other.address
+    assert c.foo(other.address, [other, other]) == "0x" + "00" * 20
@@ -19,3 +19,22 @@ def test_env_mgr_with_ctx():
 
     assert boa.env is s
     assert boa.env is not t
+
+
+def test_env_traces_compat():
+    c = boa.loads(
+        """
+balances: HashMap[address, uint256]
+
+@external
+def set(x: uint256):
+    self.balances[msg.sender] = x
+"""
+    )
+    c.set(1)
+
+    account = c.address.canonical_address
+    assert len(boa.env.sstore_trace[account]) == 1
+    (slot,) = boa.env.sstore_trace[account]
+    # preimage => image
+    assert slot.to_bytes(32, "big") in boa.env.sha3_trace.values()
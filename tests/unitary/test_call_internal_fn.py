@@ -136,3 +136,19 @@ def test_isqrt(contract, a):
 @given(a=strategy("string", max_size=32, alphabet=characters(codec="ascii")))
 def test_keccak(contract, a):
     assert contract.internal._keccak256(a) == keccak(a.encode())
+
+
+def test_runtime_assembly_is_reused(monkeypatch):
+    # with a disk cache hit, the wrappers don't go through the linker
+    monkeypatch.setattr(boa.interpret, "_disk_cache", None)
+
+    c = boa.loads(source_code)
+    assert c.internal._test_call_internal()
+    runtime_assembly = c._linker.runtime_assembly
+
+    assert c.internal._sort([1, 3, 2]) == [3, 2, 1]
+    assert c.eval("self._test_bool(1, True)")
+
+    # the rest of the contract was only compiled once
+    assert c._linker.runtime_assembly is runtime_assembly
+    assert len(c._linker._functions) > 0
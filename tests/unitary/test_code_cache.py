@@ -0,0 +1,48 @@
+import boa
+
+code1 = """
+@external
+def foo() -> uint256:
+    return 1
+"""
+
+code2 = """
+@external
+def foo() -> uint256:
+    return 2
+"""
+
+
+def test_code_cache_set_code():
+    c = boa.loads(code1)
+    assert c.foo() == 1
+    assert c.address.canonical_address in boa.env.evm._code_cache
+
+    # the new code is picked up on the next call
+    bytecode = boa.loads_partial(code2).compiler_data.bytecode_runtime
+    boa.env.set_code(c.address, bytecode)
+    assert c.foo() == 2
+
+
+def test_code_cache_revert():
+    with boa.env.anchor():
+        c = boa.loads(code1)
+        assert c.foo() == 1
+        address = c.address
+
+    assert boa.env.get_code(address) == b""
+
+    # a deploy to the same address is picked up
+    with boa.env.anchor():
+        c = boa.loads(code2)
+        assert c.address == address
+        assert c.foo() == 2
+
+
+def test_code_analysis_shared():
+    c = boa.loads(code1)
+    c.foo()
+    computation = c._computation
+
+    c.foo()
+    assert c._computation.code.valid_positions is computation.code.valid_positions
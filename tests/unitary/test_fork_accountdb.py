@@ -0,0 +1,166 @@
+from eth.db.atomic import AtomicDB
+from eth_utils import to_canonical_address
+
+from boa.rpc import RPC, RPCError, to_hex, to_int
+from boa.vm.fork import PREFETCH_MIN_DEPTH, AccountDBFork, CachingRPC
+
+ADDRESS = to_canonical_address("0x" + "ab" * 20)
+OTHER_ADDRESS = to_canonical_address("0x" + "cd" * 20)
+
+
+class _FakeRPC(RPC):
+    # serves storage where each slot holds its own index + 1 (plus 1000
+    # for every block after 0x10), and counts the requests per method
+    def __init__(self, storage_range=None):
+        self.calls = []
+        self.batches = 0
+        self.storage_range = storage_range
+        self.block = 0x10
+
+    @property
+    def identifier(self):
+        return f"fake-{id(self)}"
+
+    @property
+    def name(self):
+        return "fake"
+
+    def fetch(self, method, params):
+        self.calls.append(method)
+        if method == "eth_getBlockByNumber":
+            block = self.block if params[0] == "latest" else to_int(params[0])
+            return {
+                "number": to_hex(block),
+                "hash": "0x" + "11" * 32,
+                "parentHash": "0x" + "00" * 32,
+                "timestamp": "0x1",
+                "transactions": [],
+            }
+        if method == "eth_getBalance":
+            return params[-1]  # the block number
+        if method == "eth_getTransactionCount":
+            return "0x1"
+        if method == "eth_getCode":
+            return "0x"
+        if method == "eth_getStorageAt":
+            block = to_int(params[-1])
+            return to_hex(to_int(params[1]) + 1 + (block - 0x10) * 1000)
+        if method == "debug_storageRangeAt":
+            if self.storage_range is None:
+                raise RPCError("method not found", -32601)
+            return self.storage_range
+        raise ValueError(method)
+
+    def fetch_multi(self, payloads):
+        self.batches += 1
+        return [self.fetch(method, params) for method, params in payloads]
+
+
+def _account_db(rpc):
+    return AccountDBFork(CachingRPC(rpc, cache_file=None), "latest", AtomicDB())
+
+
+def test_sequential_reads_prefetch():
+    rpc = _FakeRPC()
+    db = _account_db(rpc)
+
+    n = 50
+    for slot in range(n):
+        assert db.get_storage(ADDRESS, slot) == slot + 1
+
+    # the slots were fetched in a few round trips, with growing batches
+    assert rpc.batches < 6
+    assert db._storage_access[ADDRESS].depth > PREFETCH_MIN_DEPTH
+    # storage range is not supported, we only tried it once
+    assert rpc.calls.count("debug_storageRangeAt") == 1
+
+
+def test_random_reads_no_prefetch():
+    rpc = _FakeRPC()
+    db = _account_db(rpc)
+
+    slots = [5, 1000, 3, 77777, 12]
+    for slot in slots:
+        assert db.get_storage(ADDRESS, slot) == slot + 1
+
+    assert rpc.calls.count("eth_getStorageAt") == len(slots)
+
+
+def test_storage_range_complete():
+    storage = {
+        "0x" + "aa" * 32: {"key": to_hex(1), "value": to_hex(10)},
+        "0x" + "bb" * 32: {"key": to_hex(7), "value": to_hex(70)},
+    }
+    rpc = _FakeRPC(storage_range={"storage": storage, "nextKey": None})
+    db = _account_db(rpc)
+
+    assert db.get_storage(ADDRESS, 1) == 10
+    assert db.get_storage(ADDRESS, 7) == 70
+    # not in the range result, so it must be empty
+    assert db.get_storage(ADDRESS, 2) == 0
+    assert db.get_storage(ADDRESS, 12345) == 0
+
+    assert rpc.calls.count("eth_getStorageAt") == 0
+
+
+def test_storage_range_incomplete():
+    storage = {"0x" + "aa" * 32: {"key": to_hex(1), "value": to_hex(10)}}
+    rpc = _FakeRPC(storage_range={"storage": storage, "nextKey": "0x" + "cc" * 32})
+    db = _account_db(rpc)
+
+    assert db.get_storage(ADDRESS, 1) == 10
+    # have to ask the node for slots past the range
+    assert db.get_storage(ADDRESS, 100) == 101
+    assert rpc.calls.count("eth_getStorageAt") == 1
+
+
+def test_repin_evicts_written_accounts():
+    rpc = _FakeRPC()
+    db = _account_db(rpc)
+
+    assert db.get_storage(ADDRESS, 100) == 101
+    assert db.get_storage(OTHER_ADDRESS, 100) == 101
+    assert db.get_balance(ADDRESS) == 0x10
+    assert db.get_balance(OTHER_ADDRESS) == 0x10
+
+    # a local write
+    db.set_storage(ADDRESS, 100, 5)
+
+    rpc.block = 0x11
+    block_info = db.repin("latest")
+    assert block_info["number"] == "0x11"
+    assert db._block_number == 0x11
+
+    calls = len(rpc.calls)
+    # not written locally, so kept from the old block
+    assert db.get_storage(OTHER_ADDRESS, 100) == 101
+    assert db.get_balance(OTHER_ADDRESS) == 0x10
+    assert len(rpc.calls) == calls
+
+    # written locally, so refetched from the new block
+    assert db.get_storage(ADDRESS, 100) == 1101
+    assert db.get_balance(ADDRESS) == 0x11
+
+
+def test_repin_touched_addresses():
+    rpc = _FakeRPC()
+    db = _account_db(rpc)
+
+    assert db.get_storage(OTHER_ADDRESS, 100) == 101
+
+    rpc.block = 0x11
+    db.repin("latest", touched_addresses=[OTHER_ADDRESS])
+
+    assert db.get_storage(OTHER_ADDRESS, 100) == 1101
+    assert db.get_balance(OTHER_ADDRESS) == 0x11
+
+
+def test_fetched_state_is_not_a_write():
+    rpc = _FakeRPC()
+    db = _account_db(rpc)
+
+    for slot in range(20):
+        db.get_storage(ADDRESS, slot)
+    db.get_code(ADDRESS)
+
+    assert db._written_accounts == set()
@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from boa.network import NetworkEnv, TransactionSettings, _PendingTxn
+
+
+# a NetworkEnv which doesn't fork anything, enough to drive pipeline()
+def _network_env(rpc):
+    env = NetworkEnv.__new__(NetworkEnv)
+    env._rpc = rpc
+    env._pipeline = None
+    env.tx_settings = TransactionSettings()
+    return env
+
+
+def _broadcast(env, tx_hash):
+    env._pipeline.pending.append(_PendingTxn(tx_hash, {}))
+
+
+def test_pipeline_error_not_hidden_by_flush():
+    rpc = MagicMock()
+    rpc.wait_for_tx_receipts.side_effect = TimeoutError("receipts timed out")
+    env = _network_env(rpc)
+
+    with pytest.warns(UserWarning, match="receipts timed out"):
+        with pytest.raises(ValueError, match="boom"):
+            with env.pipeline():
+                _broadcast(env, "0x01")
+                raise ValueError("boom")
+
+    # the transactions in flight were still waited for
+    rpc.wait_for_tx_receipts.assert_called_once()
+    assert env._pipeline is None
+
+
+def test_pipeline_flush_error_raised():
+    rpc = MagicMock()
+    rpc.wait_for_tx_receipts.side_effect = TimeoutError("receipts timed out")
+    env = _network_env(rpc)
+
+    with pytest.raises(TimeoutError, match="receipts timed out"):
+        with env.pipeline():
+            _broadcast(env, "0x01")
+
+    assert env._pipeline is None
+
+
+def test_pipeline_interrupt_skips_flush():
+    rpc = MagicMock()
+    env = _network_env(rpc)
+
+    with pytest.raises(KeyboardInterrupt):
+        with env.pipeline():
+            _broadcast(env, "0x01")
+            raise KeyboardInterrupt
+
+    rpc.wait_for_tx_receipts.assert_not_called()
+    assert env._pipeline is None
@@ -0,0 +1,81 @@
+from unittest.mock import MagicMock
+
+from boa.network import NetworkEnv, TransactionSettings
+from boa.rpc import RPCError
+from boa.util.abi import Address
+
+sender = "0x0000000000000000000000000000000000000001"
+target = "0x0000000000000000000000000000000000000002"
+# changed by an internal call which didn't emit a log
+inner = "0x0000000000000000000000000000000000000003"
+
+receipt = {"from": sender, "to": target, "blockNumber": "0x10", "logs": []}
+
+
+# a NetworkEnv which doesn't fork anything, enough to drive repinning
+def _network_env(rpc):
+    env = NetworkEnv.__new__(NetworkEnv)
+    env._rpc = rpc
+    env.tx_settings = TransactionSettings(incremental_repin=True)
+    env.__dict__["_tracer"] = {}
+    env.evm = MagicMock()
+    env._reset_fork = MagicMock()
+    return env
+
+
+def _repinned(env):
+    ((block_number, touched), _) = env.evm.repin_fork.call_args
+    assert block_number == "0x10"
+    return set(touched)
+
+
+def test_repin_after_simulated_txn():
+    rpc = MagicMock()
+    env = _network_env(rpc)
+
+    env._repin_after_txn("0x01", receipt, simulated=True)
+
+    # local writes are tracked by the fork, the receipt is enough
+    rpc.fetch_uncached.assert_not_called()
+    assert _repinned(env) == {
+        Address(sender).canonical_address,
+        Address(target).canonical_address,
+    }
+
+
+def test_repin_after_node_only_txn():
+    rpc = MagicMock()
+    rpc.fetch_uncached.return_value = {
+        "pre": {target: {}, inner: {}},
+        "post": {target: {}, inner: {}},
+    }
+    env = _network_env(rpc)
+
+    env._repin_after_txn("0x01", receipt, simulated=False)
+
+    assert Address(inner).canonical_address in _repinned(env)
+    env._reset_fork.assert_not_called()
+
+
+def test_refork_without_state_diff():
+    rpc = MagicMock()
+    rpc.fetch_uncached.side_effect = RPCError("unsupported tracer", -32601)
+    env = _network_env(rpc)
+
+    env._repin_after_txn("0x01", receipt, simulated=False)
+
+    env._reset_fork.assert_called_once_with("0x10")
+    env.evm.repin_fork.assert_not_called()
+
+
+def test_refork_by_default():
+    rpc = MagicMock()
+    env = _network_env(rpc)
+    env.tx_settings = TransactionSettings()
+
+    env._repin_after_txn("0x01", receipt, simulated=False)
+
+    # no need for the state diff
+    rpc.fetch_uncached.assert_not_called()
+    env._reset_fork.assert_called_once_with("0x10")
+    env.evm.repin_fork.assert_not_called()
@@ -0,0 +1,70 @@
+import os
+import threading
+
+import pytest
+
+import boa
+
+code = """
+counter: public(uint256)
+
+@external
+def bump(x: uint256) -> uint256:
+    assert x != 13, "unlucky"
+    self.counter += x
+    return self.counter
+"""
+
+
+def test_parallel_map():
+    c = boa.loads(code)
+
+    # each worker runs against its own copy of the env
+    results = list(boa.parallel.map(lambda x: c.bump(x), [1, 1, 1, 1], workers=1))
+    assert results == [1, 2, 3, 4]
+
+    results = list(boa.parallel.map(lambda x: (x, os.getpid()), range(20), workers=3))
+    assert [x for x, _ in results] == list(range(20))
+    assert os.getpid() not in {pid for _, pid in results}
+
+    # nothing persists in the parent
+    assert c.counter() == 0
+
+
+def test_parallel_map_unordered():
+    results = boa.parallel.map(lambda x: x * 2, range(10), workers=4, ordered=False)
+    assert sorted(results) == list(range(0, 20, 2))
+
+
+def test_parallel_map_error():
+    c = boa.loads(code)
+
+    with pytest.raises(boa.BoaError, match="unlucky"):
+        list(boa.parallel.map(c.bump, [1, 13, 2], workers=2))
+
+    with pytest.raises(ValueError, match="bad input"):
+        list(boa.parallel.map(_check, [1, -1], workers=2))
+
+
+def _check(x):
+    if x < 0:
+        raise ValueError("bad input")
+    return x
+
+
+def test_parallel_map_with_threads():
+    c = boa.loads(code)
+
+    # forking while another thread runs is unsafe, runs in-process instead
+    stop = threading.Event()
+    t = threading.Thread(target=stop.wait, name="busy")
+    t.start()
+    try:
+        with pytest.warns(UserWarning, match="busy"):
+            results = list(boa.parallel.map(lambda x: (c.bump(x), os.getpid()), [1, 2]))
+    finally:
+        stop.set()
+        t.join()
+
+    assert results == [(1, os.getpid()), (3, os.getpid())]
+    assert c.counter() == 0
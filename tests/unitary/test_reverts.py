@@ -1,9 +1,11 @@
 import contextlib
+import pickle
 
 import pytest
 
 import boa
 from boa import BoaError
+from boa.util.lrudict import lrudict
 
 source_code = """
 @external
@@ -154,6 +156,85 @@ def foo(x: uint8):
     assert len(frame.frame_detail["uninitialized"]) == 8
 
 
+def test_boa_error_pickle():
+    c = boa.loads(
+        """
+@external
+def foo(x: uint256):
+    y: uint256 = x + 1
+    assert x == 0, "x is not 0"
+"""
+    )
+    with pytest.raises(BoaError) as context:
+        c.foo(1)
+
+    err = context.value
+    unpickled = pickle.loads(pickle.dumps(err))
+
+    assert type(unpickled) is BoaError
+    assert str(unpickled) == str(err)
+    frame = unpickled.args[1].last_frame
+    assert frame.frame_detail["y"] == 2
+
+
+def test_traces_built_lazily():
+    c = boa.loads(source_code)
+    with pytest.raises(BoaError) as context:
+        c.foo(2)
+
+    error = context.value
+    assert "stack_trace" not in error.__dict__
+    assert "call_trace" not in error.__dict__
+
+    boa.check_boa_error_matches(error, "x is not 4")
+    # matching reads the stack trace, but not the call tree
+    assert "stack_trace" in error.__dict__
+    assert "call_trace" not in error.__dict__
+    # frame locals are only decoded when needed
+    assert "frame_detail" not in error.stack_trace.last_frame.__dict__
+
+    assert "x is not 4" in str(error)
+    assert "call_trace" in error.__dict__
+
+
+def test_eval_revert_uses_eval_source_map():
+    c = boa.loads(source_code)
+    with pytest.raises(BoaError) as context:
+        # note: must fail at runtime, not be folded at compile time
+        c.eval("assert msg.sender == empty(address)  # dev: eval failed")
+
+    # the trace is built after eval() returns, but must still be
+    # resolved against the eval source map
+    assert context.value.stack_trace.dev_reason.reason_str == "eval failed"
+
+
+def test_revert_table_shared(monkeypatch):
+    from boa.contracts.vyper import vyper_contract
+
+    c = boa.loads(source_code)
+    d = c.deployer.at(c.address)
+
+    calls = []
+    at_source_location = vyper_contract.DevReason.at_source_location.__func__
+
+    def counting(cls, *args):
+        calls.append(args)
+        return at_source_location(cls, *args)
+
+    monkeypatch.setattr(
+        vyper_contract.DevReason, "at_source_location", classmethod(counting)
+    )
+    # start from an empty cache, the source map may be shared with other tests
+    monkeypatch.setattr(vyper_contract, "_revert_tables", lrudict(256))
+
+    for contract in (c, d, c):
+        with boa.reverts("x is 1"):
+            contract.foo(1)
+
+    # dev reasons are extracted once per source location
+    assert len(calls) == 1
+
+
 def test_revert_check_storage():
     c = boa.loads(
         """
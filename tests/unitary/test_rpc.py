@@ -0,0 +1,342 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from boa.rpc import DEFAULT_MAX_BATCH_SIZE, EthereumRPC, RetrySettings, RPCError
+
+# don't actually wait around in tests
+_FAST_RETRIES = RetrySettings(max_retries=3, base_backoff=0.001)
+
+
+class _FakeNode(BaseHTTPRequestHandler):
+    # a tiny JSON-RPC "node": `eth_echo` returns its params,
+    # `eth_fail` returns an error, `eth_throttled` is rate limited
+    # `server.throttle` times before it succeeds. receipts are available
+    # for the transaction hashes in `server.mined`. batch responses leave
+    # out the ids in `server.dropped`.
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body)
+
+        if self.server.http_throttle > 0:
+            self.server.http_throttle -= 1
+            self._respond({}, status=429)
+            return
+
+        if isinstance(body, list):
+            if self.server.batch_throttle > 0:
+                self.server.batch_throttle -= 1
+                error = {"code": -32005, "message": "limit exceeded"}
+                response = {"jsonrpc": "2.0", "id": None, "error": error}
+            elif len(body) > self.server.max_batch:
+                error = {"code": -32600, "message": "batch too large"}
+                response = {"jsonrpc": "2.0", "id": None, "error": error}
+            else:
+                response = [
+                    self._handle(item)
+                    for item in body
+                    if item["id"] not in self.server.dropped
+                ]
+        else:
+            response = self._handle(body)
+
+        self._respond(response)
+
+    def _respond(self, response, status=200):
+        payload = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self, item):
+        ret = {"jsonrpc": "2.0", "id": item["id"]}
+        if item["method"] == "eth_fail":
+            ret["error"] = {"code": -32000, "message": "failed"}
+        elif item["method"] == "eth_getTransactionReceipt":
+            tx_hash = item["params"][0]
+            mined = tx_hash in self.server.mined
+            ret["result"] = {"transactionHash": tx_hash} if mined else None
+        elif item["method"] == "eth_throttled" and self.server.throttle > 0:
+            self.server.throttle -= 1
+            ret["error"] = {"code": -32005, "message": "limit exceeded"}
+        else:
+            ret["result"] = item["params"]
+        return ret
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_node():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeNode)
+    server.requests = []
+    server.throttle = 0
+    server.http_throttle = 0
+    server.batch_throttle = 0
+    server.max_batch = 1000
+    server.mined = set()
+    server.dropped = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _url(server):
+    host, port = server.server_address
+    return f"http://{host}:{port}"
+
+
+def test_fetch(fake_node):
+    rpc = EthereumRPC(_url(fake_node))
+    assert rpc.fetch("eth_echo", [1, 2]) == [1, 2]
+
+    with pytest.raises(RPCError):
+        rpc.fetch("eth_fail", [])
+
+
+def test_fetch_multi_respects_max_batch_size(fake_node):
+    rpc = EthereumRPC(_url(fake_node), max_batch_size=3)
+    payloads = [("eth_echo", [i]) for i in range(8)]
+
+    assert rpc.fetch_multi(payloads) == [[i] for i in range(8)]
+    assert [len(r) for r in fake_node.requests] == [3, 3, 2]
+
+
+def test_coalesce_concurrent_fetches(fake_node):
+    rpc = EthereumRPC(_url(fake_node), batch_window=0.1)
+
+    results = {}
+
+    def work(i):
+        results[i] = rpc.fetch("eth_echo", [i])
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: [i] for i in range(10)}
+    # all the calls arrived within the window, so they should have been
+    # sent as a single batch.
+    assert len(fake_node.requests) == 1
+    assert len(fake_node.requests[0]) == 10
+
+
+def test_coalesce_skips_debug_methods(fake_node):
+    rpc = EthereumRPC(_url(fake_node), batch_window=0.1)
+
+    assert rpc.fetch("debug_traceTransaction", ["0x00"]) == ["0x00"]
+    # sent on its own, not as a batch
+    assert isinstance(fake_node.requests[0], dict)
+
+
+def test_coalesce_error(fake_node):
+    rpc = EthereumRPC(_url(fake_node), batch_window=0.01)
+    with pytest.raises(RPCError):
+        rpc.fetch("eth_fail", [])
+    # the coalescer is still usable after an error
+    assert rpc.fetch("eth_echo", [1]) == [1]
+
+
+def test_coalesce_error_only_fails_its_caller(fake_node):
+    rpc = EthereumRPC(_url(fake_node), batch_window=0.1)
+
+    results = {}
+
+    def work(i):
+        method = "eth_fail" if i == 0 else "eth_echo"
+        try:
+            results[i] = rpc.fetch(method, [i])
+        except RPCError as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # sent as one batch, but only the failing call raised
+    assert len(fake_node.requests) == 1
+    assert isinstance(results.pop(0), RPCError)
+    assert results == {i: [i] for i in range(1, 4)}
+
+
+def test_retry_rate_limited(fake_node):
+    fake_node.throttle = 2
+    rpc = EthereumRPC(_url(fake_node), retry_settings=_FAST_RETRIES)
+
+    assert rpc.fetch("eth_throttled", [1]) == [1]
+    assert len(fake_node.requests) == 3
+    assert rpc.metrics.methods["eth_throttled"].retries == 2
+    assert rpc.metrics.throttled == 2
+
+
+def test_retry_rate_limited_gives_up(fake_node):
+    fake_node.throttle = 10
+    rpc = EthereumRPC(_url(fake_node), retry_settings=_FAST_RETRIES)
+
+    with pytest.raises(RPCError) as e:
+        rpc.fetch("eth_throttled", [1])
+    assert e.value.code == -32005
+    assert len(fake_node.requests) == 4  # 1 try + 3 retries
+    assert rpc.metrics.methods["eth_throttled"].errors == 1
+
+
+def test_retry_after_honored():
+    rpc = EthereumRPC("http://localhost:0", retry_settings=_FAST_RETRIES)
+    response = requests.Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = "5"
+
+    assert rpc._retry_delay(0, ["eth_echo"], response) == 5
+
+
+def test_retry_http_429(fake_node):
+    fake_node.http_throttle = 2
+    rpc = EthereumRPC(_url(fake_node), retry_settings=_FAST_RETRIES)
+
+    assert rpc.fetch("eth_echo", [1]) == [1]
+    assert rpc.metrics.methods["eth_echo"].retries == 2
+    # we got throttled, the limiter should back off
+    assert rpc._limiter.limit < rpc._limiter.max_limit
+
+
+def test_batch_retries_only_throttled_items(fake_node):
+    fake_node.throttle = 1
+    rpc = EthereumRPC(_url(fake_node), retry_settings=_FAST_RETRIES)
+
+    payloads = [("eth_echo", [0]), ("eth_throttled", [1]), ("eth_echo", [2])]
+    assert rpc.fetch_multi(payloads) == [[0], [1], [2]]
+
+    assert len(fake_node.requests) == 2
+    (retried,) = fake_node.requests[1]
+    assert retried["method"] == "eth_throttled"
+
+
+def test_fetch_multi_missing_response(fake_node):
+    fake_node.dropped = {1}
+    rpc = EthereumRPC(_url(fake_node))
+
+    with pytest.raises(KeyError):
+        rpc.fetch_multi([("eth_echo", [0]), ("eth_echo", [1])])
+
+
+def test_batch_error_not_mistaken_for_too_large(fake_node):
+    rpc = EthereumRPC(_url(fake_node))
+    response = {"jsonrpc": "2.0", "id": None}
+    response["error"] = {"code": -32000, "message": "batch processing failed"}
+    rpc._post = lambda request, methods: response
+
+    with pytest.raises(RPCError, match="batch processing failed"):
+        rpc.fetch_multi([("eth_echo", [0]), ("eth_echo", [1])])
+    assert rpc.max_batch_size == DEFAULT_MAX_BATCH_SIZE
+
+
+def test_batch_split_when_too_large(fake_node):
+    fake_node.max_batch = 10
+    rpc = EthereumRPC(_url(fake_node), max_batch_size=40)
+
+    payloads = [("eth_echo", [i]) for i in range(40)]
+    assert rpc.fetch_multi(payloads) == [[i] for i in range(40)]
+    # learned the provider limit
+    assert rpc.max_batch_size <= 10
+
+    # the batch size grows back after successes, probing larger batches
+    # until the limit is pinned down
+    for _ in range(3):
+        assert rpc.fetch_multi(payloads) == [[i] for i in range(40)]
+    assert rpc.max_batch_size == 10
+
+    n_requests = len(fake_node.requests)
+    assert rpc.fetch_multi(payloads) == [[i] for i in range(40)]
+    # no batches got rejected
+    assert [len(r) for r in fake_node.requests[n_requests:]] == [10] * 4
+
+
+def test_batch_throttled_as_a_whole(fake_node):
+    fake_node.batch_throttle = 2
+    rpc = EthereumRPC(_url(fake_node), retry_settings=_FAST_RETRIES)
+
+    payloads = [("eth_echo", [i]) for i in range(20)]
+    assert rpc.fetch_multi(payloads) == [[i] for i in range(20)]
+
+    # retried the same batch, instead of splitting it up
+    assert [len(r) for r in fake_node.requests] == [20, 20, 20]
+    assert rpc.max_batch_size == DEFAULT_MAX_BATCH_SIZE
+    assert rpc.metrics.throttled == 2
+
+
+def test_batch_size_grows_back(fake_node):
+    fake_node.max_batch = 10
+    rpc = EthereumRPC(_url(fake_node), max_batch_size=16)
+
+    payloads = [("eth_echo", [i]) for i in range(16)]
+    assert rpc.fetch_multi(payloads) == [[i] for i in range(16)]
+    assert rpc.max_batch_size < 16
+
+    # the provider accepts larger batches again. the batch size grows
+    # back, but not past the size which was rejected.
+    fake_node.max_batch = 1000
+    for _ in range(10):
+        assert rpc.fetch_multi(payloads) == [[i] for i in range(16)]
+    assert rpc.max_batch_size == 15
+
+
+def test_send_transaction_not_resent():
+    # nothing is listening here, so the connection fails
+    rpc = EthereumRPC("http://127.0.0.1:1", retry_settings=_FAST_RETRIES)
+
+    with pytest.raises(requests.ConnectionError):
+        rpc.fetch("eth_sendRawTransaction", ["0x00"])
+    assert rpc.metrics.methods["eth_sendRawTransaction"].retries == 0
+
+    with pytest.raises(requests.ConnectionError):
+        rpc.fetch("eth_chainId", [])
+    assert rpc.metrics.methods["eth_chainId"].retries == 3
+
+
+def test_metrics(fake_node):
+    rpc = EthereumRPC(_url(fake_node))
+    rpc.fetch("eth_echo", [1])
+    rpc.fetch_multi([("eth_echo", [1]), ("eth_echo", [2])])
+    with pytest.raises(RPCError):
+        rpc.fetch("eth_fail", [])
+
+    stats = rpc.metrics.methods["eth_echo"]
+    assert stats.calls == 3
+    assert stats.bytes_sent > 0 and stats.bytes_received > 0
+    assert sum(stats.latency_histogram) == 3
+    assert rpc.metrics.batches == 1
+    assert rpc.metrics.methods["eth_fail"].errors == 1
+
+
+def test_wait_for_tx_receipts(fake_node):
+    rpc = EthereumRPC(_url(fake_node))
+    fake_node.mined.add("0x01")
+    threading.Timer(0.05, fake_node.mined.add, ["0x02"]).start()
+
+    receipts = rpc.wait_for_tx_receipts(["0x01", "0x02"], 5, poll_latency=0.01)
+    assert [r["transactionHash"] for r in receipts] == ["0x01", "0x02"]
+
+    # each poll is a single batch, and only asks for outstanding receipts
+    assert all(isinstance(r, list) for r in fake_node.requests)
+    assert len(fake_node.requests[0]) == 2
+    assert [item["params"] for item in fake_node.requests[-1]] == [["0x02"]]
+
+
+def test_wait_for_tx_receipts_timeout(fake_node):
+    rpc = EthereumRPC(_url(fake_node))
+    with pytest.raises(ValueError, match="Timed out"):
+        rpc.wait_for_tx_receipts(["0x01"], 0.05, poll_latency=0.01)
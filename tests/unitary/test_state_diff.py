@@ -0,0 +1,98 @@
+import boa
+
+code = """
+counter: public(uint256)
+balances: public(HashMap[address, uint256])
+
+@external
+@payable
+def mint(x: uint256):
+    self.counter += 1
+    self.balances[msg.sender] += x
+
+@external
+def fail(x: uint256):
+    self.counter += x
+    raise "fail"
+"""
+
+
+def test_state_diff_storage():
+    c = boa.loads(code)
+    sender = boa.env.generate_address()
+    boa.env.set_balance(sender, 100)
+
+    with boa.env.anchor(), boa.env.state_diff() as diff:
+        c.mint(5, value=10, sender=sender)
+
+    assert diff.accounts == {c.address, sender}
+    assert diff.balances == {c.address: (0, 10), sender: (100, 90)}
+    assert diff.nonces == {}
+    assert diff.code == {}
+    assert len(diff.storage[c.address]) == 2
+    assert diff.decoded_storage() == {
+        c.address: {"counter": (0, 1), f"balances[{sender}]": (0, 5)}
+    }
+    assert f"balances[{sender}]: 0 -> 5" in repr(diff)
+
+
+def test_state_diff_reverted_changes():
+    c = boa.loads(code)
+
+    with boa.env.state_diff() as diff:
+        with boa.reverts("fail"):
+            c.fail(3)
+
+    assert diff.accounts == set()
+    assert repr(diff) == "<StateDiff: no changes>"
+
+
+def test_state_diff_deploy():
+    with boa.env.state_diff() as diff:
+        c = boa.loads(code)
+
+    assert diff.nonces[boa.env.eoa][1] == diff.nonces[boa.env.eoa][0] + 1
+    assert diff.code[c.address] == (b"", c.bytecode)
+
+
+def _candidates(c):
+    return [lambda x=x: c.mint(x) for x in range(3)] + [lambda: c.fail(1)]
+
+
+def test_explore():
+    c = boa.loads(code)
+    timestamp = boa.env.evm.patch.timestamp
+
+    def time_travel():
+        boa.env.time_travel(seconds=100)
+        return boa.env.evm.patch.timestamp
+
+    explorations = boa.env.explore(_candidates(c) + [time_travel])
+
+    for x, e in enumerate(explorations[:3]):
+        assert e.error is None
+        assert e.diff.decoded_storage()[c.address]["counter"] == (0, 1)
+        # addresses with an alias are labeled by it
+        key = f"balances[{boa.env.lookup_alias(boa.env.eoa)}]"
+        assert e.diff.decoded_storage()[c.address].get(key) == ((0, x) if x else None)
+
+    assert isinstance(explorations[3].error, boa.BoaError)
+    assert explorations[3].diff.accounts == set()
+    assert explorations[4].result == timestamp + 100
+
+    # nothing persists
+    assert c.counter() == 0
+    assert boa.env.evm.patch.timestamp == timestamp
+
+
+def test_explore_processes():
+    c = boa.loads(code)
+
+    explorations = boa.env.explore(_candidates(c), processes=2)
+
+    assert [e.error for e in explorations[:3]] == [None] * 3
+    for e in explorations[:3]:
+        assert e.diff.decoded_storage()[c.address]["counter"] == (0, 1)
+    assert isinstance(explorations[3].error, boa.BoaError)
+    assert "fail" in str(explorations[3].error)
+    assert c.counter() == 0
@@ -0,0 +1,22 @@
+from boa.util.abi import Address
+
+CHECKSUM = "0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045"
+
+
+def test_address_interned():
+    a = Address(CHECKSUM)
+    assert a == CHECKSUM
+    assert a.canonical_address == bytes.fromhex(CHECKSUM[2:])
+
+    # all representations resolve to the same object
+    assert Address(CHECKSUM.lower()) is a
+    assert Address(a.canonical_address) is a
+    assert Address(a) is a
+
+
+def test_address_from_canonical():
+    canonical = bytes.fromhex("ab" * 20)
+    a = Address(canonical)
+    assert a.canonical_address == canonical
+    assert a.lower() == "0x" + "ab" * 20
+    assert Address(str(a)) is a
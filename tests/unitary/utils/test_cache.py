@@ -1,11 +1,21 @@
+import pickle
 from unittest.mock import patch
 
 import pytest
 from packaging.version import Version
-from vyper.compiler import CompilerData
+from vyper.exceptions import ModuleNotFound, VariableDeclarationException
 
+import boa
+from boa.contracts.vyper.compiler_utils import _CachedCompilerData
 from boa.contracts.vyper.vyper_contract import VyperDeployer
-from boa.interpret import _disk_cache, _loads_partial_vvm, compiler_data, set_cache_dir
+from boa.interpret import (
+    _disk_cache,
+    _loads_partial_vvm,
+    compiler_data,
+    precompile_many,
+    set_cache_dir,
+)
+from boa.util.disk_cache import DiskCache
 
 
 @pytest.fixture(autouse=True)
@@ -26,11 +36,206 @@ x: constant(int128) = 1000
     test1 = compiler_data(code, "test1", "test1.vy", VyperDeployer)
     test2 = compiler_data(code, "test2", "test2.vy", VyperDeployer)
     test3 = compiler_data(code, "test1", "test1.vy", VyperDeployer)
-    assert _to_dict(test1) == _to_dict(test3), "Should hit the cache"
-    assert _to_dict(test1) != _to_dict(test2), "Should be different objects"
+    assert test1.bytecode == test3.bytecode
+    assert isinstance(test3, _CachedCompilerData), "Should hit the cache"
+    assert not isinstance(test2, _CachedCompilerData), "Should be different objects"
     assert str(test2.contract_path) == "test2.vy"
 
 
+def test_cache_lazy_analysis(tmp_path):
+    code = """
+x: public(uint256)
+
+@external
+def foo(a: uint256) -> uint256:
+    assert a > 1, "too small"
+    self.x = a
+    return a
+"""
+    compiler_data(code, "test", "test.vy", VyperDeployer)
+    data = compiler_data(code, "test", "test.vy", VyperDeployer)
+    deployer = VyperDeployer(data)
+
+    # creating a deployer doesn't need the analyzed module
+    assert "_analysis" not in data.__dict__
+
+    c = deployer.deploy()
+    assert c.foo(5) == 5 and c.x() == 5
+    with boa.reverts("too small"):
+        c.foo(0)
+
+    # source maps come from the cache, they are not re-assembled
+    assert "assembly_runtime" not in data.__dict__
+
+
+def test_cache_skips_analysis(tmp_path):
+    lib = tmp_path / "lib.vy"
+    lib.write_text(
+        """
+@internal
+def foo() -> uint256:
+    return 1
+"""
+    )
+    main = tmp_path / "main.vy"
+    main.write_text(
+        """
+import lib
+
+@external
+def bar() -> uint256:
+    return lib.foo()
+"""
+    )
+
+    def load():
+        return compiler_data(main.read_text(), "main", main, VyperDeployer)
+
+    bytecode = load().bytecode
+
+    with patch("vyper.compiler.phases.generate_annotated_ast") as analyze:
+        assert load().bytecode == bytecode
+        # the fingerprint is computed from the sources, no analysis needed
+        assert analyze.call_count == 0
+
+    # changing a dependency changes the fingerprint
+    lib.write_text(lib.read_text().replace("return 1", "return 2"))
+    assert load().bytecode != bytecode
+
+
+def test_cache_unresolved_import(tmp_path):
+    main = tmp_path / "main.vy"
+    main.write_text("import lib")
+
+    # falls back to analysis, which reports the error
+    with pytest.raises(ModuleNotFound):
+        compiler_data(main.read_text(), "main", main, VyperDeployer)
+
+    (tmp_path / "lib.vy").write_text("x: uint256")
+    compiler_data(main.read_text(), "main", main, VyperDeployer)
+
+
+def test_cache_wrappers(tmp_path):
+    lib = tmp_path / "lib.vy"
+    lib.write_text(
+        """
+@internal
+def double(x: uint256) -> uint256:
+    return 2 * x
+"""
+    )
+    main = tmp_path / "main.vy"
+    main.write_text(
+        """
+import lib
+
+struct Point:
+    x: uint256
+    y: uint256
+
+@internal
+def _point(x: uint256) -> Point:
+    assert x > 1  # dev: too small
+    return Point(x=x, y=lib.double(x))
+"""
+    )
+
+    def run(c):
+        assert c.internal._point(2) == (2, 4)
+        with boa.reverts(dev="too small"):
+            c.internal._point(1)
+        assert c.eval("self._point(3)") == (3, 6)
+        with boa.reverts(dev="too small"):
+            c.eval("self._point(1)")
+
+    run(boa.load(main))
+
+    target = "boa.contracts.vyper.compiler_utils.compile_vyper_function"
+    with patch(target, side_effect=AssertionError) as compile_vyper_function:
+        # the wrappers come from the cache, including what is needed
+        # to decode the results and report errors
+        run(boa.load(main))
+        assert compile_vyper_function.call_count == 0
+
+
+def test_load_many(tmp_path):
+    filenames = []
+    for i in range(3):
+        filename = tmp_path / f"c{i}.vy"
+        filename.write_text(
+            f"""
+@external
+def foo() -> uint256:
+    return {i}
+"""
+        )
+        filenames.append(filename)
+
+    deployers = boa.load_many(filenames)
+    assert [d.deploy().foo() for d in deployers] == [0, 1, 2]
+
+    # the workers wrote the results to the shared cache
+    with patch("vyper.compiler.phases.generate_annotated_ast") as analyze:
+        assert boa.load(filenames[0]).foo() == 0
+        assert analyze.call_count == 0
+
+
+def test_precompile_many(tmp_path):
+    good = tmp_path / "good.vy"
+    good.write_text("x: uint256")
+    bad = tmp_path / "bad.vy"
+    bad.write_text("x: uint256 = 1")
+
+    # errors are left for the load
+    precompile_many([good, bad])
+
+    with patch("vyper.compiler.phases.generate_annotated_ast") as analyze:
+        boa.load(good)
+        assert analyze.call_count == 0
+
+
+def test_load_many_error(tmp_path):
+    good = tmp_path / "good.vy"
+    good.write_text("x: uint256")
+    bad = tmp_path / "bad.vy"
+    bad.write_text("x: uint256 = 1")
+
+    # the error is raised in the calling process
+    with pytest.raises(VariableDeclarationException):
+        boa.load_many([good, bad])
+
+
+def test_disk_cache_layers(tmp_path):
+    cache = DiskCache(tmp_path, "salt")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [1, 2, 3]
+
+    assert cache.caching_lookup("a", compute) == [1, 2, 3]
+    assert cache.caching_lookup("a", compute) == [1, 2, 3]
+    assert len(calls) == 1
+    assert cache.stats.misses == 1 and cache.stats.memory_hits == 1
+    assert cache.stats.bytes_written > 0
+
+    # a new process (here: a new DiskCache) loads it from disk
+    other = DiskCache(tmp_path, "salt")
+    assert other.caching_lookup("a", compute) == [1, 2, 3]
+    assert len(calls) == 1
+    assert other.stats.disk_hits == 1
+    assert other.stats.bytes_read == cache.stats.bytes_written
+
+
+def test_disk_cache_gc_marker(tmp_path):
+    cache = DiskCache(tmp_path, "salt")
+    with patch("boa.util.disk_cache.threading.Thread") as gc_thread:
+        cache.caching_lookup("a", lambda: 1)
+        # gc only runs once per interval, shared across processes
+        DiskCache(tmp_path, "salt").caching_lookup("a", lambda: 1)
+    assert gc_thread.call_count == 1
+
+
 def test_cache_vvm():
     code = """
 x: constant(int128) = 1000
@@ -67,11 +272,32 @@ x: constant(int128) = 1000
     assert test1.filename == test2.filename
 
 
-def _to_dict(data: CompilerData) -> dict:
-    """
-    Serialize the `CompilerData` object to a dictionary for comparison.
-    """
-    d = data.__dict__.copy()
-    d["input_bundle"] = d["input_bundle"].__dict__.copy()
-    d["input_bundle"]["_cache"] = d["input_bundle"]["_cache"].__dict__.copy()
-    return d
+def test_analysis_cache_not_shared():
+    code = """
+@external
+def foo() -> uint256:
+    return 1
+"""
+    set_cache_dir(None)
+    first = compiler_data(code, "a", "same.vy")
+    second = compiler_data(code, "b", "same.vy")
+
+    # the second one was seeded from the analysis cache, with its own copy
+    # of the annotated AST
+    assert "_annotate" in second.__dict__
+    assert second.vyper_module is not first.vyper_module
+    assert first.bytecode == second.bytecode
+
+
+def test_analysis_cached_once():
+    code = """
+@external
+def foo() -> uint256:
+    return 2
+"""
+    set_cache_dir(None)
+    with patch("boa.interpret.pickle.dumps", wraps=pickle.dumps) as dumps:
+        for _ in range(3):
+            compiler_data(code, "a", "once.vy")
+        # only stored on the first (missing) lookup
+        assert dumps.call_count == 1
@@ -1,4 +1,4 @@
-from boa.util.lrudict import lrudict
+from boa.util.lrudict import interndict, lrudict
 
 
 def test_lru_setdefault():
@@ -15,3 +15,18 @@ def test_lru_set():
         d.setdefault_lambda(x, lambda k: x)
         d[x] = x * 100
     assert d == {k: k * 100 for k in range(10, 20)}
+
+
+def test_interndict():
+    d = interndict(10)
+    for x in range(10):
+        d[x] = x
+
+    # keep 0 alive while the young generation fills up twice
+    for x in range(10, 30):
+        assert d.get(0) == 0
+        d[x] = x
+
+    assert 0 in d
+    assert d.get(1) is None
+    assert all(d.get(x) == x for x in range(20, 30))
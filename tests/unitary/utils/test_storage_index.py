@@ -0,0 +1,69 @@
+import warnings
+
+import pytest
+from eth_utils import keccak
+
+from boa.vm.storage_index import StorageIndex
+
+ACCOUNT = b"\x01" * 20
+
+
+def _hash(index, slot: int, key: bytes) -> int:
+    preimage = slot.to_bytes(32, "big") + key.rjust(32, b"\x00")
+    image = keccak(preimage)
+    index.record_sha3(preimage, image)
+    return int.from_bytes(image, "big")
+
+
+def test_storage_index_paths():
+    index = StorageIndex()
+    a, b = b"\xaa" * 20, b"\xbb" * 20
+
+    k1 = _hash(index, 3, a)
+    k2 = _hash(index, _hash(index, 4, a), b)
+    for k in (k1, k2, 7):
+        index.record_sstore(ACCOUNT, k)
+
+    assert index.keys_of(ACCOUNT, 3) == {k1: (a.rjust(32, b"\x00"),)}
+    assert index.keys_of(ACCOUNT, 4) == {
+        k2: (a.rjust(32, b"\x00"), b.rjust(32, b"\x00"))
+    }
+    assert index.keys_of(ACCOUNT, 7) == {7: ()}
+    assert index.keys_of(b"\x02" * 20, 3) == {}
+    assert index.touched_slots(ACCOUNT) == {k1, k2, 7}
+
+
+def test_storage_index_bounded():
+    index = StorageIndex(max_preimages=4, max_keys_per_account=2)
+    for i in range(8):
+        _hash(index, 0, bytes([i]))
+    assert len(index.preimages) == 4
+
+    index.record_sstore(ACCOUNT, 1)
+    index.record_sstore(ACCOUNT, 2)
+    with pytest.warns(UserWarning, match="is full"):
+        index.record_sstore(ACCOUNT, 3)
+    # only warns once
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        index.record_sstore(ACCOUNT, 4)
+
+    assert index.touched_slots(ACCOUNT) == {1, 2}
+    # other accounts are not affected
+    index.record_sstore(b"\x02" * 20, 3)
+    assert index.touched_slots(b"\x02" * 20) == {3}
+
+
+def test_storage_index_accounts_bounded():
+    index = StorageIndex(max_accounts=2)
+    accounts = [bytes([i]) * 20 for i in range(6)]
+    for account in accounts:
+        index.record_sstore(account, 1)
+        # keep using the first account
+        index.record_sstore(accounts[0], 2)
+
+    touched = index.touched_accounts()
+    assert len(touched) <= 4  # two generations
+    assert touched[accounts[0]] == {1, 2}
+    assert accounts[1] not in touched
+    assert index.keys_of(accounts[1], 1) == {}
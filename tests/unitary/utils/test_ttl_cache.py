@@ -0,0 +1,140 @@
+import time
+
+import pytest
+
+from boa.network import Capabilities, _is_persistable
+from boa.util.ttl_cache import TTLCache
+
+
+def test_ttl_cache_expiry():
+    cache = TTLCache()
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=-1)  # already expired
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("b", "default") == "default"
+
+
+def test_ttl_cache_get_or_compute():
+    cache = TTLCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None  # falsy results are cached too
+
+    assert cache.get_or_compute("a", 60, compute) is None
+    assert cache.get_or_compute("a", 60, compute) is None
+    assert len(calls) == 1
+
+
+def test_ttl_cache_persistence(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = TTLCache(path)
+    cache.set("a", [1, 2], ttl=60)
+    cache.set("b", 2, ttl=60, persist=False)
+    cache.set("c", 3, ttl=-1)
+
+    other = TTLCache(path)
+    assert other.get("a") == [1, 2]
+    assert other.get("b") is None
+    assert other.get("c") is None
+
+    other.invalidate()
+    assert TTLCache(path).get("a") is None
+
+
+def test_ttl_cache_concurrent_writers(tmp_path):
+    path = tmp_path / "cache.json"
+    first, second = TTLCache(path), TTLCache(path)
+    # both have loaded the (empty) file
+    assert first.get("a") is None and second.get("b") is None
+
+    first.set("a", 1, ttl=60)
+    second.set("b", 2, ttl=60)
+
+    # second's write didn't clobber first's entry
+    fresh = TTLCache(path)
+    assert fresh.get("a") == 1
+    assert fresh.get("b") == 2
+
+
+def test_ttl_cache_failure_not_cached():
+    cache = TTLCache()
+
+    def fail():
+        raise ConnectionError("transient")
+
+    with pytest.raises(ConnectionError):
+        cache.get_or_compute("a", 60, fail)
+    assert cache.get_or_compute("a", 60, lambda: 1) == 1
+
+
+def test_ttl_cache_corrupted_file(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text("not json")
+    cache = TTLCache(path)
+    assert cache.get("a") is None
+    cache.set("a", 1, ttl=60)
+    assert TTLCache(path).get("a") == 1
+
+
+class _FakeRPC:
+    identifier = "fake"
+
+    def __init__(self):
+        self.calls = 0
+
+    def fetch(self, method, params):
+        self.calls += 1
+        return "0x"
+
+
+def test_capabilities_shared_cache():
+    cache = TTLCache()
+    rpc = _FakeRPC()
+
+    assert Capabilities(rpc, cache).has_cancun
+    n_calls = rpc.calls
+    assert n_calls == 3
+
+    # a fresh Capabilities object against the same rpc hits the cache
+    assert Capabilities(rpc, cache).describe_capabilities() == "cancun"
+    assert rpc.calls == n_calls
+
+    # expired entries are refetched
+    cache._entries = {k: (time.time() - 1, *v[1:]) for k, v in cache._entries.items()}
+    assert Capabilities(rpc, cache).has_cancun
+    assert rpc.calls == 2 * n_calls
+
+
+@pytest.mark.parametrize(
+    "identifier,persistable",
+    [
+        ("https://eth-mainnet.example.com/v2/key", True),
+        ("wss://8.8.8.8/ws", True),
+        ("http://localhost:8545", False),
+        ("http://node.localhost:8545", False),
+        ("http://127.0.0.1:8545", False),
+        ("http://[::1]:8545", False),
+        ("http://192.168.1.10:8545", False),
+        ("BrowserRPC", False),
+    ],
+)
+def test_persist_only_remote_nodes(identifier, persistable):
+    rpc = _FakeRPC()
+    rpc.identifier = identifier
+    assert _is_persistable(rpc) == persistable
+
+
+def test_capabilities_local_node_not_persisted(tmp_path):
+    path = tmp_path / "cache.json"
+    rpc = _FakeRPC()
+    rpc.identifier = "http://localhost:8545"
+
+    assert Capabilities(rpc, TTLCache(path)).has_cancun
+    n_calls = rpc.calls
+
+    # a restarted node could be a different chain, probe again
+    assert Capabilities(rpc, TTLCache(path)).has_cancun
+    assert rpc.calls == 2 * n_calls